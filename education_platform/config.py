@@ -7,5 +7,16 @@ USER = config['connectdb']['USER']
 PASSWORD = config['connectdb']['PASSWORD']
 HOST = config['connectdb']['HOST']
 PORT = config['connectdb']['PORT']
-
-
+CACHE_BACKEND = config.get('cache', 'BACKEND', fallback='django.core.cache.backends.locmem.LocMemCache')
+CACHE_LOCATION = config.get('cache', 'LOCATION', fallback='')
+CONN_MAX_AGE = config.getint('connectdb', 'CONN_MAX_AGE', fallback=0)
+CONN_HEALTH_CHECKS = config.getboolean('connectdb', 'CONN_HEALTH_CHECKS', fallback=False)
+DB_POOL = config.get('connectdb', 'POOL', fallback='')
+DB_POOL_MIN_SIZE = config.getint('connectdb', 'POOL_MIN_SIZE', fallback=2)
+DB_POOL_MAX_SIZE = config.getint('connectdb', 'POOL_MAX_SIZE', fallback=10)
+DB_POOL_TIMEOUT = config.getfloat('connectdb', 'POOL_TIMEOUT', fallback=10.0)
+DB_REPLICAS = {
+    section: {key: config.get(section, key, fallback=config['connectdb'][key])
+              for key in ('ENGINE', 'NAME', 'USER', 'PASSWORD', 'HOST', 'PORT')}
+    for section in config.sections() if section.startswith('replica')
+}
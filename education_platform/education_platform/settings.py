@@ -10,8 +10,15 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+from importlib.util import find_spec
 from pathlib import Path
-from config import PORT, PASSWORD, ENGINE, USER, HOST, NAME
+
+import django
+from django.core.exceptions import ImproperlyConfigured
+
+from config import PORT, PASSWORD, ENGINE, USER, HOST, NAME, CACHE_BACKEND, CACHE_LOCATION, CONN_MAX_AGE, \
+    CONN_HEALTH_CHECKS, DB_POOL, DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_TIMEOUT, DB_REPLICAS
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -38,6 +45,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'main',
+    'user_api',
     'rest_framework',
     'rest_framework_simplejwt',
     'djoser',
@@ -47,6 +55,7 @@ INSTALLED_APPS = [
 AUTH_USER_MODEL = 'main.User'
 
 MIDDLEWARE = [
+    'main.metrics.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -78,17 +87,53 @@ WSGI_APPLICATION = 'education_platform.wsgi.application'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.BasicAuthentication',
-        'rest_framework.authentication.SessionAuthentication',
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'main.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
-
+    # orjson с откатом на stdlib json; стандартные классы DRF: rest_framework.renderers.JSONRenderer,
+    # rest_framework.parsers.JSONParser
+    'DEFAULT_RENDERER_CLASSES': [
+        'main.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    # скользящее окно на пару (пользователь или IP, маршрут), см. main.throttling
+    'DEFAULT_THROTTLE_CLASSES': ['main.throttling.RouteRateThrottle'],
+    'DEFAULT_THROTTLE_RATES': {
+        'user': '600/min',
+        'anon': '60/min',
+        'register': '10/hour',
+    },
+    'DEFAULT_PARSER_CLASSES': [
+        'main.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
+# MessagePack (Accept/Content-Type: application/msgpack) — только если установлен msgpack
+if find_spec('msgpack') is not None:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].append('main.renderers.MessagePackRenderer')
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'].append('main.renderers.MessagePackParser')
+
+# Keyset-пагинация списков администратора (?cursor=, ?page_size=)
+KEYSET_PAGE_SIZE = 100
+KEYSET_MAX_PAGE_SIZE = 1000
+
+# Размер чанка серверного курсора для потоковой выгрузки
+EXPORT_CHUNK_SIZE = 2000
+
+# Максимум элементов в одном запросе пакетных эндпоинтов
+BULK_MAX_ITEMS = 5000
+
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# В config.ini секция [connectdb] дополнительно принимает:
+# CONN_MAX_AGE = 600, CONN_HEALTH_CHECKS = true — постоянные соединения с проверкой перед запросом;
+# POOL = psycopg (пул psycopg 3, Django 5.1+, POOL_MIN_SIZE/POOL_MAX_SIZE/POOL_TIMEOUT)
+# или POOL = pgbouncer (PgBouncer в режиме transaction перед базой).
+# Секции [replica...] (например [replica1]) — read-реплики; незаданные ключи берутся из [connectdb].
+
 DATABASES = {
     'default': {
         'ENGINE': ENGINE,
@@ -97,9 +142,88 @@ DATABASES = {
         'PASSWORD': PASSWORD,
         'HOST': HOST,
         'PORT': PORT,
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': CONN_HEALTH_CHECKS,
+    }
+}
+
+if DB_POOL == 'pgbouncer':
+    # серверные курсоры (iterator() в выгрузках) не переживают смену соединения между транзакциями
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+elif DB_POOL == 'psycopg':
+    if django.VERSION < (5, 1):
+        raise ImproperlyConfigured('POOL = psycopg требует Django 5.1+ и psycopg 3')
+    # соединениями управляет пул, постоянные соединения Django с ним несовместимы
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {'min_size': DB_POOL_MIN_SIZE, 'max_size': DB_POOL_MAX_SIZE, 'timeout': DB_POOL_TIMEOUT},
+    }
+elif DB_POOL:
+    raise ImproperlyConfigured('Неизвестное значение POOL в config.ini: %s' % DB_POOL)
+
+for alias, replica in DB_REPLICAS.items():
+    DATABASES[alias] = {**DATABASES['default'], **replica, 'TEST': {'MIRROR': 'default'}}
+
+# GET-only представления администратора читают с реплик (main.routers.ReplicaReadMixin)
+DATABASE_REPLICAS = list(DB_REPLICAS)
+DATABASE_ROUTERS = ['main.routers.ReplicaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# В config.ini секция [cache]: BACKEND = django.core.cache.backends.redis.RedisCache
+# (или django.core.cache.backends.memcached.PyMemcacheCache), LOCATION = адрес сервера
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': CACHE_LOCATION,
     }
 }
 
+# Кэш каталога компетенций: алиас из CACHES и время жизни записей в секундах
+CATALOGUE_CACHE_ALIAS = 'default'
+CATALOGUE_CACHE_TIMEOUT = 300
+
+# Кэш principal (id, is_staff, is_superuser, is_active) для JWT-аутентификации
+AUTH_PRINCIPAL_CACHE_ALIAS = 'default'
+AUTH_PRINCIPAL_CACHE_TIMEOUT = 60
+
+# Бюджет запроса для PerformanceMiddleware: сверх него запрос логируется вместе с SQL
+PERF_QUERY_BUDGET = 50
+PERF_LATENCY_BUDGET = 1.0
+PERF_LOGGED_QUERIES = 200
+
+# Счётчики лимитов запросов: алиас из CACHES (в проде — общий Redis, иначе лимит на процесс)
+THROTTLE_ENABLED = True
+THROTTLE_CACHE_ALIAS = 'default'
+
+# Рекомендации компетенций (main.recommendations): веса сигналов, длина списка и кэш ранжирования
+RECOMMENDATION_WEIGHTS = {'cooccurrence': 1.0, 'profession': 0.5, 'rating': 0.25}
+RECOMMENDATION_MAX_RESULTS = 50
+RECOMMENDATION_CACHE_ALIAS = 'default'
+RECOMMENDATION_CACHE_TIMEOUT = 300
+
+# Кабинет пользователя (user_api.dashboard): кэш собранного ответа по пользователю
+DASHBOARD_CACHE_ALIAS = 'default'
+DASHBOARD_CACHE_TIMEOUT = 300
+
+# Журнал изменений каталога (main.changes): размер страницы и параметры потока SSE
+# (выключается CHANGES_STREAM_ENABLED = False). Поток — async-представление: под ASGI подписчик
+# не занимает воркер, под WSGI каждый держит воркер до CHANGES_STREAM_TIMEOUT, поэтому там его лучше выключить
+CHANGES_PAGE_SIZE = 500
+CHANGES_STREAM_ENABLED = True
+CHANGES_STREAM_TIMEOUT = 55
+CHANGES_POLL_INTERVAL = 1
+
+# Схема OpenAPI (main.schema): каталог с готовыми файлами build_schema и версия кода, при смене
+# которой схема строится заново (None — хэш исходников проекта)
+SCHEMA_ROOT = BASE_DIR / 'schema'
+SCHEMA_CODE_VERSION = None
+
+# Базовый прогон benchmark_api, с которым сравниваются новые
+BENCHMARK_BASELINE = BASE_DIR / 'benchmarks' / 'baseline.json'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -137,6 +261,19 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Загрузка файлов материалов по частям: .part-файлы лежат рядом с MEDIA_ROOT,
+# чтобы готовый файл переносился в хранилище переименованием
+MATERIAL_UPLOAD_TMP_DIR = MEDIA_ROOT / 'uploads'
+MATERIAL_UPLOAD_MAX_CHUNK = 16 * 1024 * 1024
+
+# Отдача файлов материалов: None — потоком из Django (FileResponse с Range),
+# 'x-accel' — nginx X-Accel-Redirect на MATERIAL_ACCEL_REDIRECT_PREFIX, 'x-sendfile' — Apache/lighttpd
+MATERIAL_DOWNLOAD_OFFLOAD = None
+MATERIAL_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
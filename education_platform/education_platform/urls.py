@@ -16,12 +16,15 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, re_path, include
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
+from drf_spectacular.views import SpectacularSwaggerView
+
+from main.views import SchemaView
 
 urlpatterns = [
     re_path(r'^api/v1/auth/', include('djoser.urls.jwt')),
-    path('api/v1/schema/', SpectacularAPIView.as_view(), name='schema'),
+    path('api/v1/schema/', SchemaView.as_view(), name='schema'),
     path('api/v1/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='docs'),
     path('api/v1/admin/', include('main.urls')),
+    path('api/v1/', include('user_api.urls')),
 ]
 
@@ -0,0 +1,141 @@
+from contextlib import nullcontext
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views import View
+from rest_framework.exceptions import APIException, Throttled
+from rest_framework.settings import api_settings
+
+from . import changes
+from .authentication import AsyncJWTAuthentication
+from .models import User, Competence, Material
+from .renderers import dumps
+from .routers import read_from_replica
+from .serialaize import sparse_params, UsersSerializer, CompetenceSerializer, MaterialSerializer
+
+
+def json_response(data, status=200):
+    return HttpResponse(dumps(data), status=status, content_type='application/json')
+
+
+class AsyncAdminView(View):
+    """
+    Async-версии read-эндпоинтов администратора для ASGI: запросы к базе идут через
+    async ORM, сериализаторы работают только с уже загруженными (prefetch) данными.
+    """
+    authentication = AsyncJWTAuthentication()
+    throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES
+    throttle_cost = 1
+    replica = True
+
+    async def check_throttles(self, request):
+        # те же лимиты, что у DRF-представлений: RouteRateThrottle синхронно ходит в кэш
+        waits = []
+        for throttle in [throttle_class() for throttle_class in self.throttle_classes]:
+            if not await sync_to_async(throttle.allow_request)(request, self):
+                waits.append(throttle.wait())
+        if waits:
+            raise Throttled(max((wait for wait in waits if wait is not None), default=None))
+
+    async def dispatch(self, request, *args, **kwargs):
+        # все async-представления только читают — обслуживаются репликами, если они есть
+        with read_from_replica() if self.replica else nullcontext():
+            try:
+                result = await self.authentication.aauthenticate(request)
+            except APIException as exc:
+                return json_response({'detail': exc.detail}, status=exc.status_code)
+            if result is None:
+                return json_response({'detail': 'Authentication credentials were not provided.'}, status=401)
+            request.user, request.auth = result
+            if not request.user.is_staff:
+                return json_response({'detail': 'You do not have permission to perform this action.'}, status=403)
+            try:
+                await self.check_throttles(request)
+            except Throttled as exc:
+                response = json_response({'detail': exc.detail}, status=exc.status_code)
+                if exc.wait is not None:
+                    response['Retry-After'] = str(exc.wait)
+                return response
+            return await super().dispatch(request, *args, **kwargs)
+
+
+class AsyncUserList(AsyncAdminView):
+    throttle_cost = 5
+
+    async def get(self, request):
+        params = sparse_params(request)
+        users = [user async for user in UsersSerializer.setup_eager_loading(User.objects.order_by('pk'), **params)]
+        return json_response(UsersSerializer(users, many=True, **params).data)
+
+
+class AsyncUserDetail(AsyncAdminView):
+    async def get(self, request, pk):
+        params = sparse_params(request)
+        try:
+            user = await UsersSerializer.setup_eager_loading(User.objects.all(), **params).aget(pk=pk)
+        except User.DoesNotExist:
+            return json_response({'detail': 'Not found.'}, status=404)
+        return json_response(UsersSerializer(user, **params).data)
+
+
+class AsyncCompetenceAll(AsyncAdminView):
+    throttle_cost = 5
+
+    async def get(self, request):
+        params = sparse_params(request)
+        queryset = CompetenceSerializer.setup_eager_loading(Competence.objects.order_by('pk'), **params)
+        competences = [competence async for competence in queryset]
+        return json_response(CompetenceSerializer(competences, many=True, **params).data)
+
+
+class AsyncCompetenceDetail(AsyncAdminView):
+    async def get(self, request, name):
+        params = sparse_params(request)
+        try:
+            competence = await CompetenceSerializer.setup_eager_loading(
+                Competence.objects.all(), **params).aget(name=name)
+        except Competence.DoesNotExist:
+            return json_response({'detail': 'Not found.'}, status=404)
+        return json_response(CompetenceSerializer(competence, **params).data)
+
+
+class AsyncMaterialDetail(AsyncAdminView):
+    async def get(self, request, competence_name, material_id):
+        params = sparse_params(request)
+        try:
+            material = await MaterialSerializer.narrow(Material.objects.all(), params['fields']).aget(
+                id=material_id, competence__name=competence_name)
+        except Material.DoesNotExist:
+            return json_response({"error": "Competence or material not found"}, status=404)
+        return json_response(MaterialSerializer(material, **params).data)
+
+
+class CatalogueChangeStream(AsyncAdminView):
+    """
+    Поток изменений каталога (Server-Sent Events): события change и checkpoint с токеном в id.
+    Продолжение — с ?since= или заголовком Last-Event-ID; поток закрывается через ?timeout= секунд
+    (не больше CHANGES_STREAM_TIMEOUT). Журнал читается с основной базы (см. changes.sequence).
+    """
+    replica = False
+
+    async def get(self, request):
+        if not settings.CHANGES_STREAM_ENABLED:
+            return json_response({'detail': 'Not found.'}, status=404)
+        since = request.GET.get('since', request.headers.get('Last-Event-ID', '0'))
+        if not since.isdigit():
+            return json_response({"error": "since must be a token returned by this endpoint"}, status=400)
+        try:
+            timeout = min(max(float(request.GET.get('timeout', settings.CHANGES_STREAM_TIMEOUT)), 0),
+                          settings.CHANGES_STREAM_TIMEOUT)
+        except ValueError:
+            return json_response({"error": "timeout must be a number"}, status=400)
+        params = sparse_params(request)
+        response = StreamingHttpResponse(
+            (event.encode() async for event in changes.stream(int(since), timeout, **params)),
+            content_type='text/event-stream',
+        )
+        response['Cache-Control'] = 'no-cache'
+        # nginx не должен буферизовать поток
+        response['X-Accel-Buffering'] = 'no'
+        return response
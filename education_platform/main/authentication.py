@@ -0,0 +1,130 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+
+PRINCIPAL_FIELDS = ('id', 'is_staff', 'is_superuser', 'is_active')
+
+
+class UserPrincipal:
+    """
+    Компактное представление пользователя для request.user: только то, что нужно
+    проверкам прав. Полная модель загружается лениво через get_user().
+    """
+    __slots__ = PRINCIPAL_FIELDS + ('_user',)
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, id, is_staff=False, is_superuser=False, is_active=True):
+        self.id = id
+        self.is_staff = is_staff
+        self.is_superuser = is_superuser
+        self.is_active = is_active
+        self._user = None
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(**{field: getattr(user, field) for field in PRINCIPAL_FIELDS})
+
+    @property
+    def pk(self):
+        return self.id
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in PRINCIPAL_FIELDS}
+
+    def get_user(self):
+        if self._user is None:
+            from .models import User
+            self._user = User.objects.get(pk=self.id)
+        return self._user
+
+    def __eq__(self, other):
+        return getattr(other, 'pk', None) == self.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __str__(self):
+        return 'UserPrincipal(%s)' % self.id
+
+
+def get_cache():
+    return caches[settings.AUTH_PRINCIPAL_CACHE_ALIAS]
+
+
+def principal_key(user_id):
+    return 'auth:principal:%s' % user_id
+
+
+def invalidate_principal(user_id):
+    get_cache().delete(principal_key(user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT без обращения к базе на каждый запрос: после проверки подписи principal
+    берётся из кэша (AUTH_PRINCIPAL_CACHE_TIMEOUT секунд), User читается только при промахе.
+    Запись сбрасывается сигналами при изменении или удалении пользователя.
+    """
+
+    def get_user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+    def load_principal(self, user_id):
+        values = self.user_model.objects.filter(
+            **{api_settings.USER_ID_FIELD: user_id}).values(*PRINCIPAL_FIELDS).first()
+        if values is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        return values
+
+    def check_principal(self, values):
+        if not values['is_active']:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return UserPrincipal(**values)
+
+    def get_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        key = principal_key(user_id)
+        values = get_cache().get(key)
+        if values is None:
+            values = self.load_principal(user_id)
+            get_cache().set(key, values, settings.AUTH_PRINCIPAL_CACHE_TIMEOUT)
+        return self.check_principal(values)
+
+
+class AsyncJWTAuthentication(CachedJWTAuthentication):
+    """
+    JWTAuthentication для async-представлений: разбор и проверка подписи токена
+    синхронные (только CPU), principal берётся из кэша или через async ORM.
+    """
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        key = principal_key(user_id)
+        values = await get_cache().aget(key)
+        if values is None:
+            values = await self.user_model.objects.filter(
+                **{api_settings.USER_ID_FIELD: user_id}).values(*PRINCIPAL_FIELDS).afirst()
+            if values is None:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            await get_cache().aset(key, values, settings.AUTH_PRINCIPAL_CACHE_TIMEOUT)
+        return self.check_principal(values)
@@ -0,0 +1,406 @@
+import json
+import math
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+import warnings
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from django.core.files.base import ContentFile
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.models import Max
+from django.test import Client
+from django.urls import URLResolver
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import changes, urls
+from .models import User, Competence, Material, MaterialUpload, CatalogueChange
+
+PREFIX = '/api/v1/admin/'
+ADMIN_EMAIL = 'benchmark-admin@example.com'
+UPLOAD_BODY = bytes(range(256)) * 256
+
+BenchRequest = namedtuple('BenchRequest', 'method path data content_type headers')
+
+
+def get(path):
+    return BenchRequest('GET', PREFIX + path, None, None, {})
+
+
+def send(method, path, data=None, content_type='application/json', headers=None):
+    if data is not None and content_type == 'application/json':
+        data = json.dumps(data).encode()
+    elif data is not None and content_type == 'application/x-www-form-urlencoded':
+        data = urlencode(data).encode()
+    return BenchRequest(method, PREFIX + path, data, content_type, headers or {})
+
+
+class Scenario:
+    """Один маршрут из main/urls.py и способ построить i-й запрос к нему."""
+
+    def __init__(self, name, route, method, build, status=200):
+        self.name = name
+        self.route = route
+        self.method = method
+        self.build = build
+        self.status = status
+
+
+class Fixtures:
+    """
+    Объекты, с которыми работают сценарии. Создаются в той же базе, что и у сервера;
+    записи сценариев уникальны в пределах прогона (префикс run), поэтому их можно повторять.
+    """
+
+    def __init__(self):
+        self.run = uuid.uuid4().hex[:8]
+        self.admin = User.objects.filter(email=ADMIN_EMAIL).first() or User.objects.create_superuser(
+            email=ADMIN_EMAIL, username='benchmark')
+        self.token = str(AccessToken.for_user(self.admin))
+        self.user = User.objects.exclude(is_staff=True).order_by('pk').first()
+        self.competence = Competence.objects.filter(material__isnull=False).order_by('pk').first()
+        self.competence_ids = list(Competence.objects.order_by('pk').values_list('pk', flat=True)[:5])
+        self.material = self.competence.material_set.order_by('pk').first()
+        self.file_material = self.new_material('file')
+        self.file_material.file.save('benchmark-%s.bin' % self.run, ContentFile(UPLOAD_BODY))
+        self.upload_material = self.new_material('upload')
+        self.upload = self.new_upload()
+        # дельта-синхронизация: окно из последних 200 записей журнала на момент подготовки — одно и то же
+        # при любом --requests, хотя сценарии записи дописывают журнал дальше
+        self.changes_since = max(self.last_change() - 200, 0)
+
+    def last_change(self):
+        changes.sequence()
+        return CatalogueChange.objects.aggregate(last=Max('position'))['last'] or 0
+
+    def new_material(self, title):
+        return Material.objects.create(competence=self.competence, material_type='text',
+                                       title='benchmark-%s-%s' % (self.run, title), content='')
+
+    def new_upload(self):
+        return MaterialUpload.objects.create(material=self.upload_material, filename='benchmark.bin',
+                                             size=len(UPLOAD_BODY))
+
+    def new_user(self, i):
+        return User.objects.create(email='benchmark-%s-mark-%d@example.com' % (self.run, i), username='benchmark')
+
+    def name(self, kind, i, j=0):
+        return 'benchmark-%s-%s-%d-%d' % (self.run, kind, i, j)
+
+    @property
+    def competence_path(self):
+        return 'competence/%s' % self.competence.name
+
+    @property
+    def material_path(self):
+        return 'competence/%s/materials/%d/' % (self.competence.name, self.material.pk)
+
+
+def user_data(user):
+    return {'email': user.email, 'username': user.username, 'profession': user.profession_id,
+            'is_active': user.is_active, 'is_staff': user.is_staff, 'is_superuser': user.is_superuser}
+
+
+def competence_data(fx, kind, i, j=0):
+    return {'name': fx.name(kind, i, j), 'description': 'benchmark', 'difficulty': 'medium', 'is_active': True}
+
+
+def material_data(title):
+    return {'material_type': 'text', 'title': title, 'content': 'benchmark', 'link': 'https://example.com/'}
+
+
+def upload_chunk(fx, i):
+    return send('PUT', 'uploads/%s/' % fx.new_upload().pk, UPLOAD_BODY, 'application/octet-stream',
+                {'Upload-Offset': '0'})
+
+
+def delete_material(fx, i):
+    material = fx.new_material('delete-%d' % i)
+    return send('DELETE', 'competence/%s/materials/%d/' % (fx.competence.name, material.pk))
+
+
+SCENARIOS = [
+    Scenario('register', 'register/', 'POST', lambda fx, i: send('POST', 'register/', {
+        'email': 'benchmark-%s-%d@example.com' % (fx.run, i), 'password': 'benchmark-password',
+        'username': 'benchmark'}), status=201),
+    Scenario('users.list', 'users/', 'GET', lambda fx, i: get('users/')),
+    Scenario('users.detail', 'users/int:<pk>/', 'GET', lambda fx, i: get('users/int:%d/' % fx.user.pk)),
+    Scenario('users.update', 'users/int:<pk>/', 'PUT',
+             lambda fx, i: send('PUT', 'users/int:%d/' % fx.user.pk, user_data(fx.user))),
+    Scenario('users.recommendations', 'users/int:<pk>/recommendations/', 'GET',
+             lambda fx, i: get('users/int:%d/recommendations/' % fx.user.pk)),
+    Scenario('users.export', 'users/export/', 'GET', lambda fx, i: get('users/export/')),
+    Scenario('marked.list', 'users/competence/', 'GET', lambda fx, i: get('users/competence/')),
+    Scenario('marked.bulk', 'users/competence/bulk/', 'POST', lambda fx, i: send('POST', 'users/competence/bulk/', [
+        {'user': user.pk, 'competence': pk} for user in [fx.new_user(i)] for pk in fx.competence_ids]), status=201),
+    Scenario('marked.export', 'users/competence/export/', 'GET', lambda fx, i: get('users/competence/export/')),
+    Scenario('competence.list', 'competence/', 'GET', lambda fx, i: get('competence/')),
+    Scenario('competence.facets', 'competence/', 'GET', lambda fx, i: get(
+        'competence/?is_active=true&difficulty=easy,medium&facets=difficulty,is_active,material_type')),
+    Scenario('competence.export', 'competence/export/', 'GET', lambda fx, i: get('competence/export/')),
+    Scenario('competence.cache', 'competence/cache/', 'GET', lambda fx, i: get('competence/cache/')),
+    Scenario('competence.bulk', 'competence/bulk/', 'POST', lambda fx, i: send('POST', 'competence/bulk/', [
+        competence_data(fx, 'bulk', i, j) for j in range(10)]), status=201),
+    Scenario('search', 'search/', 'GET', lambda fx, i: get('search/?' + urlencode({'q': 'Материал'}))),
+    Scenario('changes', 'changes/', 'GET', lambda fx, i: get('changes/?since=%d&limit=200' % fx.changes_since)),
+    # подписчик, догнавший журнал: поток читает всё до конца, и с окна число страниц росло бы с --requests
+    Scenario('changes.stream', 'changes/stream/', 'GET',
+             lambda fx, i: get('changes/stream/?since=%d&timeout=0' % fx.last_change())),
+    Scenario('metrics', 'metrics/', 'GET', lambda fx, i: get('metrics/')),
+    Scenario('competence.detail', 'competence/<str:name>', 'GET', lambda fx, i: get(fx.competence_path)),
+    Scenario('competence.update', 'competence/<str:name>', 'PUT', lambda fx, i: send('PUT', fx.competence_path, {
+        'name': fx.competence.name, 'description': fx.competence.description,
+        'difficulty': fx.competence.difficulty, 'is_active': fx.competence.is_active})),
+    Scenario('competence.create', 'competence/create/', 'POST',
+             lambda fx, i: send('POST', 'competence/create/', competence_data(fx, 'create', i)), status=201),
+    Scenario('material.add', 'competence/<str:competence_name>/add_material/', 'POST',
+             lambda fx, i: send('POST', 'competence/%s/add_material/' % fx.competence.name,
+                                material_data(fx.name('material', i)), 'application/x-www-form-urlencoded'),
+             status=201),
+    Scenario('material.bulk', 'competence/<str:competence_name>/materials/bulk/', 'POST',
+             lambda fx, i: send('POST', 'competence/%s/materials/bulk/' % fx.competence.name, [
+                 material_data(fx.name('material-bulk', i, j)) for j in range(10)]), status=201),
+    Scenario('upload.start', 'competence/<str:competence_name>/materials/<int:material_id>/upload/', 'POST',
+             lambda fx, i: send('POST', 'competence/%s/materials/%d/upload/' % (
+                 fx.competence.name, fx.upload_material.pk), {'filename': 'benchmark.bin', 'size': 1024}),
+             status=201),
+    Scenario('material.download', 'competence/<str:competence_name>/materials/<int:material_id>/download/', 'GET',
+             lambda fx, i: get('competence/%s/materials/%d/download/' % (fx.competence.name, fx.file_material.pk))),
+    Scenario('upload.status', 'uploads/<uuid:upload_id>/', 'GET', lambda fx, i: get('uploads/%s/' % fx.upload.pk)),
+    Scenario('upload.chunk', 'uploads/<uuid:upload_id>/', 'PUT', upload_chunk),
+    Scenario('upload.cancel', 'uploads/<uuid:upload_id>/', 'DELETE',
+             lambda fx, i: send('DELETE', 'uploads/%s/' % fx.new_upload().pk), status=204),
+    Scenario('material.detail', 'competence/<str:competence_name>/materials/<int:material_id>/', 'GET',
+             lambda fx, i: get(fx.material_path)),
+    Scenario('material.update', 'competence/<str:competence_name>/materials/<int:material_id>/', 'PUT',
+             lambda fx, i: send('PUT', fx.material_path, {
+                 'material_type': fx.material.material_type, 'title': fx.material.title,
+                 'content': fx.material.content, 'link': fx.material.link})),
+    Scenario('material.delete', 'competence/<str:competence_name>/materials/<int:material_id>/', 'DELETE',
+             delete_material, status=204),
+    Scenario('async.users.list', 'async/users/', 'GET', lambda fx, i: get('async/users/')),
+    Scenario('async.users.detail', 'async/users/<int:pk>/', 'GET',
+             lambda fx, i: get('async/users/%d/' % fx.user.pk)),
+    Scenario('async.competence.list', 'async/competence/', 'GET', lambda fx, i: get('async/competence/')),
+    Scenario('async.competence.detail', 'async/competence/<str:name>', 'GET',
+             lambda fx, i: get('async/' + fx.competence_path)),
+    Scenario('async.material.detail', 'async/competence/<str:competence_name>/materials/<int:material_id>/', 'GET',
+             lambda fx, i: get('async/' + fx.material_path)),
+]
+
+
+def url_routes(patterns=None, prefix=''):
+    routes = set()
+    for pattern in urls.urlpatterns if patterns is None else patterns:
+        if isinstance(pattern, URLResolver):
+            routes |= url_routes(pattern.url_patterns, prefix + str(pattern.pattern))
+        else:
+            routes.add(prefix + str(pattern.pattern))
+    return routes
+
+
+def missing_routes(scenarios=SCENARIOS):
+    return url_routes() - {scenario.route for scenario in scenarios}
+
+
+class QueryCounter:
+    """
+    execute_wrapper на всех соединениях процесса, в том числе открытых потоками async-обработчика
+    и при чтении потоковых тел. CaptureQueriesContext не подходит: он видит только соединение
+    текущего потока и перестаёт считать, когда журнал запросов упирается в 9000 записей.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self.lock:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+    def install(self, connection, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+    def __enter__(self):
+        for connection in connections.all():
+            self.install(connection)
+        connection_created.connect(self.install)
+        return self
+
+    def __exit__(self, *exc_info):
+        connection_created.disconnect(self.install)
+        for connection in connections.all():
+            if self in connection.execute_wrappers:
+                connection.execute_wrappers.remove(self)
+
+
+class InProcessRunner:
+    """Django test client в том же процессе; число запросов к базе считается по каждому запросу."""
+    mode = 'in-process'
+
+    def __init__(self, token):
+        self.client = Client()
+        self.headers = {'Authorization': 'Bearer %s' % token}
+        self.queries = QueryCounter()
+
+    def __enter__(self):
+        self.queries.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.queries.__exit__(*exc_info)
+
+    def __call__(self, request):
+        before = self.queries.count
+        started = time.perf_counter()
+        response = self.client.generic(request.method, request.path, request.data or b'',
+                                       content_type=request.content_type or 'application/octet-stream',
+                                       headers={**self.headers, **request.headers})
+        if response.streaming:
+            # iter(response) дочитывает и асинхронные потоки (поток изменений) — с предупреждением Django
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                b''.join(response)
+        elapsed = time.perf_counter() - started
+        return response.status_code, elapsed, self.queries.count - before
+
+    def snapshot(self, scenario):
+        return None
+
+
+class HttpRunner:
+    """
+    Запросы к запущенному серверу. Число SQL-запросов берётся из разницы гистограммы
+    http_request_db_queries эндпоинта metrics/ до и после сценария (точно для одного процесса).
+    """
+    mode = 'http'
+
+    def __init__(self, base_url, token):
+        self.base_url = base_url.rstrip('/')
+        self.headers = {'Authorization': 'Bearer %s' % token}
+
+    def __call__(self, request):
+        headers = {**self.headers, **request.headers}
+        if request.content_type:
+            headers['Content-Type'] = request.content_type
+        http_request = urllib.request.Request(self.base_url + request.path, data=request.data,
+                                              method=request.method, headers=headers)
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(http_request) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as exc:
+            exc.read()
+            status = exc.code
+        return status, time.perf_counter() - started, None
+
+    def snapshot(self, scenario):
+        http_request = urllib.request.Request(self.base_url + PREFIX + 'metrics/', headers=self.headers)
+        try:
+            with urllib.request.urlopen(http_request) as response:
+                body = response.read().decode()
+        except urllib.error.URLError:
+            return None
+        labels = re.escape('{method="%s",route="%s"}' % (scenario.method, PREFIX.lstrip('/') + scenario.route))
+        values = []
+        for suffix in ('sum', 'count'):
+            match = re.search(r'^http_request_db_queries_%s%s (\S+)$' % (suffix, labels), body, re.MULTILINE)
+            values.append(float(match.group(1)) if match else 0.0)
+        return values
+
+
+def percentile(values, p):
+    return values[max(math.ceil(p / 100 * len(values)) - 1, 0)]
+
+
+def run_scenario(runner, scenario, fixtures, requests, warmup=0, concurrency=1):
+    prepared = [scenario.build(fixtures, i) for i in range(warmup + requests)]
+    for request in prepared[:warmup]:
+        runner(request)
+
+    before = runner.snapshot(scenario)
+    started = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(runner, prepared[warmup:]))
+    else:
+        results = [runner(request) for request in prepared[warmup:]]
+    elapsed = time.perf_counter() - started
+    after = runner.snapshot(scenario)
+
+    latencies = sorted(seconds * 1000 for _, seconds, _ in results)
+    counts = [queries for _, _, queries in results if queries is not None]
+    if counts:
+        queries = sum(counts) / len(counts)
+    elif before is not None and after is not None and after[1] > before[1]:
+        queries = (after[0] - before[0]) / (after[1] - before[1])
+    else:
+        queries = None
+    return {
+        'route': scenario.route,
+        'method': scenario.method,
+        'requests': len(results),
+        'errors': sum(1 for status, _, _ in results if status != scenario.status),
+        'rps': round(len(results) / elapsed, 2),
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'queries': None if queries is None else round(queries, 2),
+    }
+
+
+def run(runner, fixtures, requests, warmup=0, concurrency=1, scenarios=SCENARIOS):
+    return {
+        'mode': runner.mode,
+        'requests': requests,
+        'concurrency': concurrency,
+        'scenarios': {
+            scenario.name: run_scenario(runner, scenario, fixtures, requests, warmup, concurrency)
+            for scenario in scenarios
+        },
+    }
+
+
+def query_baseline(report):
+    """Базовый прогон для репозитория: только число SQL-запросов, не зависящее от машины."""
+    return {
+        'mode': report['mode'],
+        'scenarios': {
+            name: {'route': result['route'], 'method': result['method'], 'queries': result['queries']}
+            for name, result in report['scenarios'].items()
+        },
+    }
+
+
+def compare(report, baseline, latency_baseline=None, tolerance=0.25, noise_ms=1.0):
+    """
+    Сравнение с сохранёнными прогонами. Число SQL-запросов на запрос сравнивается строго: любой рост —
+    регрессия. Задержки сравниваются, только если передан latency_baseline — прогон на этой же машине:
+    регрессия — p95 выше его больше чем на долю tolerance (и больше noise_ms).
+    """
+    result = {}
+    for name, current in report['scenarios'].items():
+        base = baseline.get('scenarios', {}).get(name)
+        local = (latency_baseline or {}).get('scenarios', {}).get(name)
+        if base is None and local is None:
+            continue
+        result[name] = {'regressions': []}
+        if base is not None:
+            result[name]['queries'] = [base['queries'], current['queries']]
+            if current['queries'] is not None and base['queries'] is not None \
+                    and current['queries'] > base['queries']:
+                result[name]['regressions'].append('queries')
+        if local is not None:
+            result[name]['p95_ms'] = [local['p95_ms'], current['p95_ms']]
+            if current['p95_ms'] > local['p95_ms'] * (1 + tolerance) and current['p95_ms'] - local['p95_ms'] > noise_ms:
+                result[name]['regressions'].append('p95_ms')
+    return result
@@ -0,0 +1,92 @@
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.settings import api_settings
+
+
+class BulkListSerializer(serializers.ListSerializer):
+    """
+    Список объектов одной пачкой: элементы валидируются по отдельности, затем проверки,
+    требующие базы (уникальность, существование), делаются одним запросом в validate_batch.
+    Ошибки возвращаются списком по позициям входных данных, как у many=True.
+    Элементы с id обновляются через bulk_update, без id — создаются через bulk_create.
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('max_length', getattr(settings, 'BULK_MAX_ITEMS', 5000))
+        kwargs.setdefault('allow_empty', False)
+        super().__init__(*args, **kwargs)
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            raise serializers.ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [self.error_messages['not_a_list'].format(
+                    input_type=type(data).__name__)]
+            }, code='not_a_list')
+        if not data:
+            raise serializers.ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [self.error_messages['empty']]},
+                                              code='empty')
+        if len(data) > self.max_length:
+            raise serializers.ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [self.error_messages['max_length'].format(
+                    max_length=self.max_length)]
+            }, code='max_length')
+
+        items, errors = [], []
+        for item in data:
+            try:
+                items.append(self.child.run_validation(item))
+                errors.append({})
+            except serializers.ValidationError as exc:
+                items.append(None)
+                errors.append(exc.detail)
+
+        self.validate_batch(items, errors)
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return items
+
+    def validate_batch(self, items, errors):
+        self.existing = {}
+        ids = [item['id'] for item in items if item and item.get('id') is not None]
+        if ids:
+            self.existing = self.get_queryset().in_bulk(ids)
+        for index, item in enumerate(items):
+            if item and item.get('id') is not None and item['id'] not in self.existing:
+                errors[index] = {'id': ['Объект с id=%s не найден.' % item['id']]}
+
+    def get_queryset(self):
+        return self.child.Meta.model.objects.all()
+
+    def build_instance(self, item):
+        return self.child.Meta.model(**item)
+
+    def create(self, validated_data):
+        model = self.child.Meta.model
+        now = timezone.now()
+        to_create, to_update, instances = [], [], []
+        for item in validated_data:
+            item = dict(item)
+            pk = item.pop('id', None)
+            if pk is None:
+                instance = self.build_instance(item)
+                to_create.append(instance)
+            else:
+                instance = self.existing[pk]
+                for field, value in item.items():
+                    setattr(instance, field, value)
+                to_update.append(instance)
+            if hasattr(instance, 'updated_at'):
+                # bulk_* не вызывают save(), поэтому auto_now проставляем сами
+                instance.updated_at = now
+            instances.append(instance)
+
+        if to_create:
+            model.objects.bulk_create(to_create)
+        if to_update:
+            fields = [field.source for name, field in self.child.fields.items()
+                      if not field.read_only and name != 'id']
+            if hasattr(model, 'updated_at'):
+                fields.append('updated_at')
+            model.objects.bulk_update(to_update, fields)
+        return instances
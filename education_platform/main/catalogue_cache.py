@@ -0,0 +1,70 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .routers import read_from_primary
+
+VERSION_KEY = 'catalogue:version'
+HITS_KEY = 'catalogue:hits'
+MISSES_KEY = 'catalogue:misses'
+
+_MISSING = object()
+
+
+def get_cache():
+    return caches[getattr(settings, 'CATALOGUE_CACHE_ALIAS', 'default')]
+
+
+def _incr(key, initial=0):
+    cache = get_cache()
+    cache.add(key, initial, timeout=None)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # ключ вытеснили между add и incr
+        cache.set(key, initial + 1, timeout=None)
+        return initial + 1
+
+
+def get_version():
+    cache = get_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # время вместо 1, чтобы после вытеснения счётчика не вернуться к старым ключам
+        cache.add(VERSION_KEY, int(time.time()), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_version():
+    return _incr(VERSION_KEY, initial=int(time.time()))
+
+
+def catalogue_key(kind, ident):
+    digest = hashlib.md5(str(ident).encode()).hexdigest()
+    return 'catalogue:v%s:%s:%s' % (get_version(), kind, digest)
+
+
+def get_or_build(kind, ident, builder):
+    cache = get_cache()
+    key = catalogue_key(kind, ident)
+    data = cache.get(key, _MISSING)
+    if data is _MISSING:
+        _incr(MISSES_KEY)
+        with read_from_primary():
+            data = builder()
+        cache.set(key, data, getattr(settings, 'CATALOGUE_CACHE_TIMEOUT', 300))
+    else:
+        _incr(HITS_KEY)
+    return data
+
+
+def stats():
+    cache = get_cache()
+    return {
+        'version': get_version(),
+        'hits': cache.get(HITS_KEY, 0),
+        'misses': cache.get(MISSES_KEY, 0),
+    }
@@ -0,0 +1,207 @@
+import asyncio
+import time
+from collections import namedtuple
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Max, Min
+from django.utils import timezone
+
+from . import catalogue_cache
+from .models import Competence, Material, CatalogueChange
+from .renderers import dumps
+from .serialaize import CompetenceSerializer, MaterialSerializer, subtree
+
+# Журнал изменений каталога (outbox): запись в CatalogueChange делается в той же транзакции,
+# что и изменение компетенции или материала, поэтому журнал не расходится с данными.
+# Клиент хранит токен (position последней прочитанной записи) и забирает только то, что изменилось после него.
+# id выдаются до коммита, и транзакция, закоммиченная позже соседней, может получить меньший id,
+# поэтому токеном служит position — номер, который sequence присваивает уже закоммиченным записям.
+REVISION_KEY = 'changes:revision'
+SEQUENCE_LOCK = 0x63686e67
+BATCH_SIZE = 1000
+
+Page = namedtuple('Page', 'entries next more')
+
+
+def _notify():
+    # счётчик в кэше, по которому поток SSE узнаёт о новых записях, не опрашивая базу
+    cache = catalogue_cache.get_cache()
+    cache.add(REVISION_KEY, 0, timeout=None)
+    try:
+        cache.incr(REVISION_KEY)
+    except ValueError:
+        cache.set(REVISION_KEY, 1, timeout=None)
+
+
+def record(kind, action, objects):
+    """objects — пары (object_id, competence_id)."""
+    record_many([(kind, action, object_id, competence_id) for object_id, competence_id in objects])
+
+
+def record_many(rows):
+    """rows — четвёрки (kind, action, object_id, competence_id), пишутся одним INSERT."""
+    now = timezone.now()
+    changes = [CatalogueChange(kind=kind, action=action, object_id=object_id, competence_id=competence_id,
+                               created_at=now)
+               for kind, action, object_id, competence_id in rows]
+    if changes:
+        CatalogueChange.objects.bulk_create(changes, batch_size=BATCH_SIZE)
+        transaction.on_commit(sequence)
+        transaction.on_commit(_notify)
+
+
+def record_competences(competences, action):
+    record(CatalogueChange.COMPETENCE, action, [(competence.pk, competence.pk) for competence in competences])
+
+
+def record_materials(materials, action):
+    record(CatalogueChange.MATERIAL, action, [(material.pk, material.competence_id) for material in materials])
+
+
+def record_bulk(kind, instances, items):
+    """Для BulkListSerializer: элементы с id изменены, без id — созданы."""
+    record_many([
+        (kind, CatalogueChange.CREATE if item.get('id') is None else CatalogueChange.UPDATE, instance.pk,
+         instance.pk if kind == CatalogueChange.COMPETENCE else instance.competence_id)
+        for instance, item in zip(instances, items)
+    ])
+
+
+def snapshot(competence_ids, batch_size=BATCH_SIZE):
+    """Записывает create для компетенций competence_ids и их материалов: с since=0 клиент получает их в каталоге."""
+    competence_ids = sorted(competence_ids)
+    rows = []
+    for start in range(0, len(competence_ids), batch_size):
+        ids = competence_ids[start:start + batch_size]
+        rows += [(CatalogueChange.COMPETENCE, CatalogueChange.CREATE, pk, pk) for pk in ids]
+        rows += [(CatalogueChange.MATERIAL, CatalogueChange.CREATE, pk, competence_id)
+                 for pk, competence_id in Material.objects.filter(competence_id__in=ids).order_by('pk').values_list(
+                     'pk', 'competence_id')]
+    record_many(rows)
+    return len(rows)
+
+
+def compact():
+    """
+    Оставляет по одной, последней, записи на объект. Клиент с любым токеном видит то же
+    конечное состояние: более новая запись об объекте всегда лежит после удалённой старой.
+    """
+    sequence()
+    latest = (CatalogueChange.objects.filter(position__isnull=False).values('kind', 'object_id')
+              .annotate(last=Max('position')).values('last'))
+    deleted, _ = CatalogueChange.objects.filter(position__isnull=False).exclude(position__in=latest).delete()
+    return deleted
+
+
+def sequence():
+    """
+    Нумерует закоммиченные записи без position: position = id + сдвиг, больший всех выданных позиций.
+    Нумерация идёт под блокировкой, поэтому запись, закоммиченная позже, всегда получает позицию
+    больше любой уже видимой клиентам. Записи с id меньше первой пронумерованной остаются следующему вызову.
+    """
+    if not CatalogueChange.objects.filter(position__isnull=True).exists():
+        return 0
+    try:
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT pg_advisory_xact_lock(%s)', [SEQUENCE_LOCK])
+            state = CatalogueChange.objects.aggregate(last=Max('position'))
+            state.update(CatalogueChange.objects.filter(position__isnull=True).aggregate(first=Min('id')))
+            if state['first'] is None:
+                return 0
+            offset = max((state['last'] or 0) - state['first'] + 1, 0)
+            return CatalogueChange.objects.filter(position__isnull=True, id__gte=state['first']).update(
+                position=F('id') + offset)
+    except IntegrityError:
+        # без advisory-блокировки (не PostgreSQL) параллельная нумерация может столкнуться
+        # на unique(position); записи пронумерует следующий вызов
+        return 0
+
+
+def read(since, limit):
+    """
+    Страница журнала после токена since, читается с основной базы. По объекту остаётся
+    последняя запись страницы.
+    """
+    sequence()
+    rows = list(CatalogueChange.objects.filter(position__gt=since).order_by('position')[:limit + 1])
+    more = len(rows) > limit
+    rows = rows[:limit]
+    latest = {}
+    for row in rows:
+        latest.pop((row.kind, row.object_id), None)
+        latest[(row.kind, row.object_id)] = row
+    return Page(list(latest.values()), rows[-1].position if rows else since, more)
+
+
+def serialize(entries, fields=None, expand=None):
+    """
+    Записи журнала с текущим состоянием объектов; объект, которого уже нет, отдаётся как delete.
+    Материал отдаётся так же, как в materials компетенции: по ветке materials из fields/expand.
+    """
+    material_fields, material_expand = subtree(fields, 'materials'), subtree(expand, 'materials')
+    alive = [entry for entry in entries if entry.action != CatalogueChange.DELETE]
+    competences = CompetenceSerializer.setup_eager_loading(Competence.objects.all(), fields, expand).in_bulk(
+        [entry.object_id for entry in alive if entry.kind == CatalogueChange.COMPETENCE])
+    materials = MaterialSerializer.narrow(Material.objects.all(), material_fields).in_bulk(
+        [entry.object_id for entry in alive if entry.kind == CatalogueChange.MATERIAL])
+    result = []
+    for entry in entries:
+        if entry.kind == CatalogueChange.COMPETENCE:
+            instance = competences.get(entry.object_id)
+            data = CompetenceSerializer(instance, fields=fields, expand=expand).data if instance else None
+        else:
+            instance = materials.get(entry.object_id)
+            data = MaterialSerializer(instance, fields=material_fields, expand=material_expand).data \
+                if instance else None
+        result.append({
+            'token': str(entry.position),
+            'kind': entry.kind,
+            'id': entry.object_id,
+            'competence': entry.competence_id,
+            'action': entry.action if data is not None else CatalogueChange.DELETE,
+            'data': data,
+        })
+    return result
+
+
+def events(since, fields=None, expand=None):
+    """Страница журнала после since в виде событий SSE: (события, следующий токен, есть ли ещё)."""
+    page = read(since, settings.CHANGES_PAGE_SIZE)
+    lines = ['id: %s\nevent: change\ndata: %s\n\n' % (change['token'], dumps(change).decode())
+             for change in serialize(page.entries, fields, expand)]
+    if page.next != since:
+        lines.append('id: %s\nevent: checkpoint\ndata: %s\n\n' % (page.next, dumps({'next': str(page.next)}).decode()))
+    return lines, page.next, page.more
+
+
+async def stream(since, timeout, fields=None, expand=None):
+    """
+    Server-Sent Events: событие change на каждую запись журнала и checkpoint с токеном после
+    каждой страницы. Асинхронный генератор: между опросами подписчик не занимает ни воркер, ни поток.
+    База опрашивается раз в CHANGES_POLL_INTERVAL и только когда счётчик в кэше показывает
+    новые записи; через timeout секунд поток закрывается, и клиент переподключается с Last-Event-ID.
+    """
+    cache = catalogue_cache.get_cache()
+    interval = settings.CHANGES_POLL_INTERVAL
+    deadline = time.monotonic() + timeout
+    seen, refresh = None, True
+    yield 'retry: %d\n\n' % (interval * 1000)
+    while True:
+        revision = await cache.aget(REVISION_KEY)
+        if refresh or revision is None or revision != seen:
+            seen = revision
+            lines, since, refresh = await sync_to_async(events)(since, fields, expand)
+            for line in lines:
+                yield line
+            # следующую страницу читаем, не дожидаясь счётчика
+            if refresh:
+                continue
+        if time.monotonic() >= deadline:
+            return
+        yield ': keepalive\n\n'
+        await asyncio.sleep(min(interval, max(deadline - time.monotonic(), 0)))
@@ -0,0 +1,129 @@
+import hashlib
+from functools import wraps
+
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, parse_etags, quote_etag
+
+from . import catalogue_cache
+from .models import Competence, Material
+
+
+def _media_type(request):
+    # выбранный content negotiation рендерер: JSON и MessagePack — разные представления
+    return getattr(request, 'accepted_media_type', '') or ''
+
+
+def _digest(*parts):
+    return hashlib.sha1(':'.join(str(part) for part in parts).encode()).hexdigest()[:20]
+
+
+def _revision(request, *parts):
+    # ETag = ревизия объекта + представление (параметры запроса и формат): If-Match сверяет только первую часть
+    return quote_etag('%s-%s' % (_digest(*parts), _digest(request.META.get('QUERY_STRING', ''),
+                                                          _media_type(request))))
+
+
+def _object_revision(etag):
+    return etag.strip('"').split('-')[0]
+
+
+def _if_match_etag(request, etag):
+    # ETag из If-Match, совпавший по ревизии объекта: годится полученный с ?fields= или в другом формате
+    if etag is None:
+        return None
+    for tag in parse_etags(request.META.get('HTTP_IF_MATCH', '')):
+        if not tag.startswith('W/') and _object_revision(tag) == _object_revision(etag):
+            return tag
+    return etag
+
+
+# Функции ревизий возвращают (etag, last_modified, pk). По pk ревизия перечитывается после записи:
+# PUT может переименовать компетенцию или перенести материал, и старые аргументы URL уже не найдут строку.
+
+def competence_list_revision(request, *args, **kwargs):
+    state = Competence.objects.aggregate(last_modified=Max('updated_at'), count=Count('id'))
+    if state['last_modified'] is None:
+        return None, None, None
+    return _revision(request, 'competences', state['count'], state['last_modified'].isoformat()), \
+        state['last_modified'], None
+
+
+def competence_revision(request, name, *args, lock=False, pk=None, **kwargs):
+    competences = Competence.objects.select_for_update() if lock else Competence.objects
+    competences = competences.filter(pk=pk) if pk is not None else competences.filter(name=name)
+    row = competences.values_list('pk', 'updated_at').first()
+    if row is None:
+        return None, None, None
+    return _revision(request, 'competence', row[0], row[1].isoformat()), row[1], row[0]
+
+
+def material_revision(request, competence_name, material_id, *args, lock=False, pk=None, **kwargs):
+    materials = Material.objects.select_for_update(of=('self',)) if lock else Material.objects
+    materials = materials.filter(pk=pk) if pk is not None else materials.filter(
+        id=material_id, competence__name=competence_name)
+    updated_at = materials.values_list('updated_at', flat=True).first()
+    if updated_at is None:
+        return None, None, None
+    return _revision(request, 'material', material_id, updated_at.isoformat()), updated_at, material_id
+
+
+def cached_revision(revision_func, request, *args, **kwargs):
+    # ревизии лежат в кэше каталога и сбрасываются вместе с ним при каждой записи
+    ident = (revision_func.__name__, args, sorted(kwargs.items()), request.META.get('QUERY_STRING', ''),
+             _media_type(request))
+    return catalogue_cache.get_or_build(
+        'revision', ident, lambda: revision_func(request, *args, **kwargs)
+    )
+
+
+def _precondition(request, etag, last_modified):
+    if etag is None:
+        return None
+    return get_conditional_response(request, etag=etag, last_modified=int(last_modified.timestamp()))
+
+
+def _set_validators(response, etag, last_modified):
+    # ETag зависит от Accept, кэши между клиентом и API должны это учитывать
+    patch_vary_headers(response, ['Accept'])
+    if etag is not None and 200 <= response.status_code < 300:
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
+
+
+def conditional(revision_func):
+    """
+    ETag/Last-Modified для метода APIView: на If-None-Match/If-Modified-Since отвечает 304,
+    на несовпавший If-Match — 412, не вызывая сам метод (и сериализатор).
+    Для изменяющих методов ревизия читается мимо кэша под select_for_update, и проверка
+    If-Match и сам метод выполняются в одной транзакции: два PUT с одним ETag не пройдут оба.
+    If-Match сравнивается только по ревизии объекта, без параметров запроса и формата.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            if request.method in ('GET', 'HEAD'):
+                etag, last_modified, _ = cached_revision(revision_func, request, *args, **kwargs)
+                response = _precondition(request, etag, last_modified)
+                if response is not None:
+                    patch_vary_headers(response, ['Accept'])
+                    return response
+                return _set_validators(method(view, request, *args, **kwargs), etag, last_modified)
+
+            with transaction.atomic():
+                etag, last_modified, pk = revision_func(request, *args, lock=True, **kwargs)
+                response = _precondition(request, _if_match_etag(request, etag), last_modified)
+                if response is not None:
+                    return response
+                response = method(view, request, *args, **kwargs)
+                if not 200 <= response.status_code < 300:
+                    return response
+                etag, last_modified, _ = revision_func(request, *args, pk=pk, **kwargs)
+            # метод сбрасывает кэш ещё внутри транзакции; повторный сброс после коммита не даёт
+            # параллельному чтению оставить в кэше состояние до записи
+            catalogue_cache.bump_version()
+            return _set_validators(response, etag, last_modified)
+        return wrapper
+    return decorator
@@ -0,0 +1,22 @@
+from .renderers import dumps
+
+
+def stream_json_lines(rows):
+    for row in rows:
+        yield dumps(row) + b'\n'
+
+
+def stream_json_array(rows):
+    # Массив собирается по одной строке, целиком в памяти не лежит
+    yield b'['
+    separator = b''
+    for row in rows:
+        yield separator + dumps(row)
+        separator = b','
+    yield b']'
+
+
+def serialize_rows(queryset, serializer_class, chunk_size, **serializer_kwargs):
+    # iterator() читает серверным курсором; prefetch_related выполняется на каждый чанк
+    for instance in queryset.iterator(chunk_size=chunk_size):
+        yield serializer_class(instance, **serializer_kwargs).data
@@ -0,0 +1,95 @@
+from django.db.models import Count, Exists, OuterRef, Q
+from rest_framework.exceptions import ValidationError
+
+from . import catalogue_cache
+from .models import Competence, Material, DIFFICULTIES, normalize_difficulty
+
+# Фильтры и счётчики списка компетенций: ?difficulty=easy,hard&is_active=true&material_type=video
+# и ?facets=difficulty,is_active,material_type. Фильтры обслуживают индексы competence_facet_idx
+# и material_competence_type_idx.
+FACETS = ('difficulty', 'is_active', 'material_type')
+BOOLEANS = {'true': True, '1': True, 'false': False, '0': False}
+
+
+def split(value):
+    return [part.strip() for part in value.split(',') if part.strip()]
+
+
+def parse_filters(params):
+    """Фильтры из query-параметров; неизвестные значения — ValidationError (400)."""
+    filters, errors = {}, {}
+    if 'difficulty' in params:
+        values = sorted({normalize_difficulty(value) for value in split(params['difficulty'])})
+        unknown = [value for value in values if value not in dict(DIFFICULTIES)]
+        if unknown:
+            errors['difficulty'] = ['Неизвестные значения: %s.' % ', '.join(unknown)]
+        filters['difficulty'] = values
+    if 'is_active' in params:
+        value = params['is_active'].strip().lower()
+        if value not in BOOLEANS:
+            errors['is_active'] = ['Ожидается true или false.']
+        filters['is_active'] = BOOLEANS.get(value)
+    if 'material_type' in params:
+        values = sorted(set(split(params['material_type'])))
+        unknown = [value for value in values if value not in dict(Material.MATERIAL_TYPES)]
+        if unknown:
+            errors['material_type'] = ['Неизвестные значения: %s.' % ', '.join(unknown)]
+        filters['material_type'] = values
+    if errors:
+        raise ValidationError(errors)
+    return filters
+
+
+def parse_facets(params):
+    """Запрошенные фасеты; None — счётчики не нужны, пустой ?facets= — все."""
+    if 'facets' not in params:
+        return None
+    facets = split(params['facets']) or list(FACETS)
+    unknown = [facet for facet in facets if facet not in FACETS]
+    if unknown:
+        raise ValidationError({'facets': ['Неизвестные фасеты: %s.' % ', '.join(unknown)]})
+    return [facet for facet in FACETS if facet in facets]
+
+
+def filter_competences(queryset, filters):
+    if 'difficulty' in filters:
+        queryset = queryset.filter(difficulty__in=filters['difficulty'])
+    if 'is_active' in filters:
+        queryset = queryset.filter(is_active=filters['is_active'])
+    if 'material_type' in filters:
+        queryset = queryset.filter(Exists(Material.objects.filter(
+            competence=OuterRef('pk'), material_type__in=filters['material_type'])))
+    return queryset
+
+
+def count_facets(filters, facets):
+    """
+    Счётчики всех значений фасетов одним агрегирующим запросом с FILTER по каждому значению.
+    difficulty и is_active считаются в компетенциях, material_type — в их материалах.
+    """
+    # join с материалами повторяет компетенцию по числу её материалов
+    distinct = 'material_type' in facets
+    aggregates = {}
+    if 'difficulty' in facets:
+        for value, _ in DIFFICULTIES:
+            aggregates['difficulty_%s' % value] = Count('id', distinct=distinct, filter=Q(difficulty=value))
+    if 'is_active' in facets:
+        for value in (True, False):
+            aggregates['is_active_%s' % str(value).lower()] = Count('id', distinct=distinct, filter=Q(is_active=value))
+    if 'material_type' in facets:
+        for value, _ in Material.MATERIAL_TYPES:
+            aggregates['material_type_%s' % value] = Count('material', filter=Q(material__material_type=value))
+    row = filter_competences(Competence.objects.order_by(), filters).aggregate(**aggregates)
+
+    values = {
+        'difficulty': [value for value, _ in DIFFICULTIES],
+        'is_active': ['true', 'false'],
+        'material_type': [value for value, _ in Material.MATERIAL_TYPES],
+    }
+    return {facet: {value: row['%s_%s' % (facet, value)] for value in values[facet]} for facet in facets}
+
+
+def facet_counts(filters, facets):
+    """count_facets из кэша каталога: сбрасывается с версией каталога при любой записи."""
+    return catalogue_cache.get_or_build('facets', (sorted(filters.items()), facets),
+                                        lambda: count_facets(filters, facets))
@@ -0,0 +1,329 @@
+import csv
+import json
+from itertools import islice
+
+import django
+from django.apps import apps
+from django.contrib.auth.hashers import make_password
+from django.db import DataError, IntegrityError, transaction
+from django.utils import timezone
+
+from . import changes, recommendations, search
+from .authentication import invalidate_principal
+from .models import User, Profession, Competence, Material, MarkedCompetence, CatalogueChange, DIFFICULTIES, \
+    normalize_difficulty
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 't', 'да'}
+
+
+def read_rows(path, file_format):
+    """Построчно читает CSV (с заголовком) или JSON Lines, не загружая файл целиком."""
+    with open(path, newline='', encoding='utf-8') as file:
+        if file_format == 'csv':
+            yield from csv.DictReader(file)
+        else:
+            for line in file:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def to_bool(value, default=False):
+    if value is None or value == '':
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in TRUE_VALUES
+
+
+def init_hash_worker():
+    # для пула со spawn: дочерний процесс сам поднимает Django
+    if not apps.ready:
+        django.setup()
+
+
+def hash_password(raw_password):
+    return make_password(raw_password)
+
+
+class NaturalKeyMap:
+    """Кэш natural key -> pk в памяти; недостающие ключи добираются одним запросом на пачку."""
+
+    def __init__(self, queryset, field):
+        self.queryset = queryset
+        self.field = field
+        self.ids = {}
+
+    def preload(self):
+        self.ids.update(self.queryset.values_list(self.field, 'pk'))
+        return self
+
+    def resolve(self, keys):
+        missing = {key for key in keys if key and key not in self.ids}
+        if missing:
+            self.ids.update(self.queryset.filter(**{'%s__in' % self.field: missing}).values_list(self.field, 'pk'))
+        return self.ids
+
+    def get(self, key):
+        return self.ids.get(key)
+
+
+class Importer:
+    model = None
+    natural_key = ()
+    update_fields = ()
+
+    def __init__(self, executor=None):
+        self.executor = executor
+        self.touched_ids = []
+
+    def prepare(self, rows):
+        """Разрешение внешних ключей для всей пачки до построения объектов."""
+
+    def build(self, row):
+        raise NotImplementedError
+
+    def key(self, values):
+        return tuple(values[field] for field in self.natural_key)
+
+    def find_existing(self, keys):
+        lookup = {'%s__in' % field: {key[i] for key in keys} for i, field in enumerate(self.natural_key)}
+        existing = {}
+        for instance in self.model.objects.filter(**lookup):
+            existing[self.key(instance.__dict__)] = instance
+        return existing
+
+    def finalize(self, to_create, to_update):
+        pass
+
+    def after_write(self, created, updated):
+        """Вызывается в транзакции пачки: то, что должно закоммититься вместе с данными."""
+
+    def import_chunk(self, numbered_rows):
+        """Возвращает (создано, обновлено, [(номер строки, ошибка)])."""
+        self.prepare([row for _, row in numbered_rows])
+        errors = []
+        values_by_key, numbers = {}, {}
+        for number, row in numbered_rows:
+            try:
+                values = self.build(row)
+            except (KeyError, ValueError) as exc:
+                errors.append((number, str(exc)))
+                continue
+            # повтор ключа внутри пачки: побеждает последняя строка
+            values_by_key[self.key(values)] = values
+            numbers[self.key(values)] = number
+
+        existing = self.find_existing(list(values_by_key))
+        now = timezone.now()
+        to_create, to_update = [], []
+        for key, values in values_by_key.items():
+            instance = existing.get(key)
+            if instance is None:
+                to_create.append(self.model(**values))
+                continue
+            for field, value in values.items():
+                setattr(instance, field, value)
+            to_update.append(instance)
+        for instance in to_create + to_update:
+            if hasattr(instance, 'updated_at'):
+                instance.updated_at = now
+
+        self.finalize(to_create, to_update)
+        try:
+            self.write(to_create, to_update)
+        except (IntegrityError, DataError):
+            # пачку отклонила база (ограничение, длина поля): повтор по строке, каждая в своей транзакции
+            for instance in to_create:
+                instance.pk = None
+                instance._state.adding = True
+            created, updated = [], []
+            for instance in to_create + to_update:
+                is_new = instance._state.adding
+                try:
+                    self.write([instance] if is_new else [], [] if is_new else [instance])
+                except (IntegrityError, DataError) as exc:
+                    errors.append((numbers[self.key(instance.__dict__)], str(exc)))
+                    continue
+                (created if is_new else updated).append(instance)
+            to_create, to_update = created, updated
+            errors.sort()
+        self.touched_ids.extend(instance.pk for instance in to_create + to_update)
+        return len(to_create), len(to_update) if self.update_fields else 0, errors
+
+    def write(self, to_create, to_update):
+        with transaction.atomic():
+            if to_create:
+                self.model.objects.bulk_create(to_create)
+            if to_update and self.update_fields:
+                fields = list(self.update_fields)
+                if hasattr(self.model, 'updated_at'):
+                    fields.append('updated_at')
+                self.model.objects.bulk_update(to_update, fields)
+            self.after_write(to_create, to_update if self.update_fields else [])
+
+
+class ProfessionImporter(Importer):
+    model = Profession
+    natural_key = ('name',)
+
+    def build(self, row):
+        return {'name': row['name'].strip()}
+
+
+class CompetenceImporter(Importer):
+    model = Competence
+    natural_key = ('name',)
+    update_fields = ('description', 'difficulty', 'is_active')
+
+    def build(self, row):
+        difficulty = normalize_difficulty(row.get('difficulty'))
+        if difficulty not in dict(DIFFICULTIES):
+            raise ValueError('Неизвестный difficulty %r' % row.get('difficulty'))
+        return {
+            'name': row['name'].strip(),
+            'description': row.get('description') or '',
+            'difficulty': difficulty,
+            'is_active': to_bool(row.get('is_active')),
+        }
+
+    def after_write(self, created, updated):
+        # журнал изменений (outbox) и индекс поиска пишутся в транзакции пачки: bulk-запись не вызывает сигналы
+        changes.record_competences(created, CatalogueChange.CREATE)
+        changes.record_competences(updated, CatalogueChange.UPDATE)
+        search.index_competence_objects(created + updated)
+
+
+class MaterialImporter(Importer):
+    model = Material
+    natural_key = ('competence_id', 'title')
+    update_fields = ('material_type', 'content', 'link')
+
+    def __init__(self, executor=None):
+        super().__init__(executor)
+        self.competences = NaturalKeyMap(Competence.objects.all(), 'name').preload()
+
+    def build(self, row):
+        competence_id = self.competences.get(row['competence'])
+        if competence_id is None:
+            raise ValueError('Компетенция %r не найдена' % row['competence'])
+        if row['material_type'] not in dict(Material.MATERIAL_TYPES):
+            raise ValueError('Неизвестный material_type %r' % row['material_type'])
+        return {
+            'competence_id': competence_id,
+            'title': row['title'],
+            'material_type': row['material_type'],
+            'content': row.get('content') or None,
+            'link': row.get('link') or None,
+        }
+
+    def after_write(self, created, updated):
+        changes.record_materials(created, CatalogueChange.CREATE)
+        changes.record_materials(updated, CatalogueChange.UPDATE)
+        search.index_material_objects(created + updated)
+        # ревизия компетенции (ETag) покрывает её материалы
+        competence_ids = {material.competence_id for material in created + updated}
+        Competence.objects.filter(pk__in=competence_ids).update(updated_at=timezone.now())
+
+
+class UserImporter(Importer):
+    model = User
+    natural_key = ('email',)
+    update_fields = ('username', 'profession_id', 'is_active', 'is_staff', 'password')
+
+    def __init__(self, executor=None):
+        super().__init__(executor)
+        self.professions = NaturalKeyMap(Profession.objects.all(), 'name').preload()
+        self.unusable_password = make_password(None)
+        self.raw_passwords = {}
+
+    def build(self, row):
+        profession = row.get('profession')
+        profession_id = self.professions.get(profession) if profession else None
+        if profession and profession_id is None:
+            raise ValueError('Профессия %r не найдена' % profession)
+        email = User.objects.normalize_email(row['email'].strip())
+        if not email:
+            raise ValueError('Пустой email')
+        values = {
+            'email': email,
+            'username': row.get('username') or '',
+            'profession_id': profession_id,
+            'is_active': to_bool(row.get('is_active'), default=True),
+            'is_staff': to_bool(row.get('is_staff')),
+        }
+        # готовый хэш из LMS переносится как есть, открытый пароль хэшируется пулом в finalize
+        if row.get('password_hash'):
+            values['password'] = row['password_hash']
+        elif row.get('password'):
+            self.raw_passwords[email] = row['password']
+        return values
+
+    def after_write(self, created, updated):
+        # закэшированный principal (is_active, is_staff) сбрасывается после коммита пачки
+        user_ids = [user.pk for user in updated]
+
+        def invalidate():
+            for user_id in user_ids:
+                invalidate_principal(user_id)
+        transaction.on_commit(invalidate)
+
+    def finalize(self, to_create, to_update):
+        pending = [(user, self.raw_passwords.pop(user.email)) for user in to_create + to_update
+                   if user.email in self.raw_passwords]
+        self.raw_passwords.clear()
+        for user in to_create:
+            if not user.password:
+                user.password = self.unusable_password
+        if not pending:
+            return
+        raw_passwords = [raw_password for _, raw_password in pending]
+        if self.executor is not None:
+            hashes = self.executor.map(hash_password, raw_passwords, chunksize=max(1, len(raw_passwords) // 32))
+        else:
+            hashes = map(hash_password, raw_passwords)
+        for (user, _), hashed in zip(pending, hashes):
+            user.password = hashed
+
+
+class MarkedCompetenceImporter(Importer):
+    model = MarkedCompetence
+    natural_key = ('user_id', 'competence_id')
+
+    def __init__(self, executor=None):
+        super().__init__(executor)
+        self.competences = NaturalKeyMap(Competence.objects.all(), 'name').preload()
+        self.users = NaturalKeyMap(User.objects.all(), 'email')
+
+    def prepare(self, rows):
+        self.users.resolve(User.objects.normalize_email(row.get('user', '').strip()) for row in rows)
+
+    def build(self, row):
+        user_id = self.users.get(User.objects.normalize_email(row['user'].strip()))
+        competence_id = self.competences.get(row['competence'])
+        if user_id is None:
+            raise ValueError('Пользователь %r не найден' % row['user'])
+        if competence_id is None:
+            raise ValueError('Компетенция %r не найдена' % row['competence'])
+        return {'user_id': user_id, 'competence_id': competence_id}
+
+    def after_write(self, created, updated):
+        recommendations.record_marks((mark.user_id, mark.competence_id) for mark in created)
+
+
+IMPORTERS = {
+    'profession': ProfessionImporter,
+    'competence': CompetenceImporter,
+    'material': MaterialImporter,
+    'user': UserImporter,
+    'marked_competence': MarkedCompetenceImporter,
+}
@@ -0,0 +1,112 @@
+import json
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment, override_settings
+
+from main import benchmark
+from main.seed import seed, refresh_derived
+
+
+class Command(BaseCommand):
+    help = ('Прогоняет сценарии по всем маршрутам main/urls.py in-process (тестовый клиент на временной '
+            'базе) или против запущенного сервера (--url) и выводит p50/p95/p99, rps и число SQL-запросов '
+            'в JSON; сравнивает число запросов с базовым прогоном, а задержки — только с --latency-baseline')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='адрес запущенного сервера, например http://127.0.0.1:8000 '
+                                          '(запущенного с THROTTLE_ENABLED = False)')
+        parser.add_argument('--requests', type=int, default=50, help='замеряемых запросов на сценарий')
+        parser.add_argument('--warmup', type=int, default=5, help='прогревочных запросов на сценарий')
+        parser.add_argument('--concurrency', type=int, default=1, help='параллельных запросов (только с --url)')
+        parser.add_argument('--scenario', action='append', help='запустить только указанные сценарии')
+        parser.add_argument('--users', type=int, default=500, help='объём данных для in-process прогона')
+        parser.add_argument('--competences', type=int, default=50)
+        parser.add_argument('--output', help='файл для JSON-отчёта')
+        parser.add_argument('--baseline', default=str(settings.BENCHMARK_BASELINE),
+                            help='базовые числа SQL-запросов (в репозитории)')
+        parser.add_argument('--latency-baseline',
+                            help='прогон на этой же машине для сравнения задержек, например '
+                                 'benchmarks/latency.local.json; без него задержки не сравниваются')
+        parser.add_argument('--save-baseline', action='store_true',
+                            help='записать отчёт как новый базовый (и --latency-baseline, если указан)')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='допустимый рост p95 относительно --latency-baseline (доля)')
+
+    def handle(self, *args, **options):
+        scenarios = benchmark.SCENARIOS
+        if options['scenario']:
+            scenarios = [scenario for scenario in scenarios if scenario.name in options['scenario']]
+            if not scenarios:
+                raise CommandError('Нет сценариев с именами %s' % ', '.join(options['scenario']))
+        missing = benchmark.missing_routes()
+        if missing:
+            self.stderr.write('Маршруты без сценария: %s' % ', '.join(sorted(missing)))
+
+        if options['url']:
+            report = self.run_http(scenarios, options)
+        else:
+            if options['concurrency'] > 1:
+                raise CommandError('--concurrency поддерживается только вместе с --url')
+            report = self.run_in_process(scenarios, options)
+
+        baseline_path, latency_path = options['baseline'], options['latency_baseline']
+        if options['save_baseline']:
+            self.write(baseline_path, benchmark.query_baseline(report))
+            if latency_path:
+                self.write(latency_path, report)
+        else:
+            baseline, latency_baseline = self.read(baseline_path), self.read(latency_path)
+            if baseline is not None or latency_baseline is not None:
+                report['baseline'] = benchmark.compare(report, baseline or {}, latency_baseline,
+                                                       options['tolerance'])
+
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            self.write(options['output'], report)
+        self.stdout.write(output)
+
+        regressions = sorted(name for name, result in report.get('baseline', {}).items() if result['regressions'])
+        if regressions:
+            raise CommandError('Регрессии относительно базового прогона: %s' % ', '.join(
+                '%s (%s)' % (name, ', '.join(report['baseline'][name]['regressions'])) for name in regressions))
+
+    def read(self, path):
+        if not path or not os.path.exists(path):
+            return None
+        with open(path) as file:
+            return json.load(file)
+
+    def write(self, path, report):
+        with open(path, 'w') as file:
+            json.dump({key: value for key, value in report.items() if key != 'baseline'}, file,
+                      indent=2, ensure_ascii=False)
+            file.write('\n')
+
+    def run_http(self, scenarios, options):
+        fixtures = benchmark.Fixtures()
+        runner = benchmark.HttpRunner(options['url'], fixtures.token)
+        return benchmark.run(runner, fixtures, options['requests'], options['warmup'], options['concurrency'],
+                             scenarios)
+
+    def run_in_process(self, scenarios, options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            # лимиты запросов замер бы только исказили, а истечение кэшей посреди прогона добавляло бы
+            # случайные запросы к базе: записи живут до явного сброса
+            with tempfile.TemporaryDirectory() as media, override_settings(
+                    MEDIA_ROOT=media, MATERIAL_UPLOAD_TMP_DIR=os.path.join(media, 'uploads'), THROTTLE_ENABLED=False,
+                    AUTH_PRINCIPAL_CACHE_TIMEOUT=None, CATALOGUE_CACHE_TIMEOUT=None,
+                    RECOMMENDATION_CACHE_TIMEOUT=None, DASHBOARD_CACHE_TIMEOUT=None):
+                _, competence_ids = seed(users=options['users'], competences=options['competences'])
+                refresh_derived(competence_ids)
+                fixtures = benchmark.Fixtures()
+                with benchmark.InProcessRunner(fixtures.token) as runner:
+                    return benchmark.run(runner, fixtures, options['requests'], options['warmup'], 1, scenarios)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
@@ -0,0 +1,97 @@
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, AsyncClient
+from django.test.utils import setup_test_environment, teardown_test_environment
+from rest_framework_simplejwt.tokens import AccessToken
+
+from main.models import User, Competence, Material
+from main.seed import seed
+
+PREFIX = '/api/v1/admin/'
+
+
+class Command(BaseCommand):
+    help = ('Наполняет временную тестовую базу и сравнивает пропускную способность sync-эндпоинтов '
+            '(WSGI-обработчик, пул потоков) и их async-версий (ASGI-обработчик, asyncio) in-process')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='запросов на маршрут')
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--competences', type=int, default=50)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            seed(users=options['users'], competences=options['competences'])
+            admin = User.objects.create_superuser(email='benchmark-admin@example.com')
+            headers = {'Authorization': 'Bearer %s' % AccessToken.for_user(admin)}
+            user = User.objects.exclude(pk=admin.pk).first()
+            competence = Competence.objects.first()
+            material = Material.objects.filter(competence=competence).first()
+            routes = [
+                ('users/', 'async/users/'),
+                ('users/int:%d/' % user.pk, 'async/users/%d/' % user.pk),
+                ('competence/', 'async/competence/'),
+                ('competence/%s' % competence.name, 'async/competence/%s' % competence.name),
+                ('competence/%s/materials/%d/' % (competence.name, material.pk),
+                 'async/competence/%s/materials/%d/' % (competence.name, material.pk)),
+            ]
+            self.stdout.write('%-50s %10s %10s %10s %10s' % ('маршрут', 'sync rps', 'async rps', 'sync p95', 'async p95'))
+            for sync_path, async_path in routes:
+                sync_stats = self.run_sync(PREFIX + sync_path, headers, options['requests'], options['concurrency'])
+                async_stats = asyncio.run(
+                    self.run_async(PREFIX + async_path, headers, options['requests'], options['concurrency'])
+                )
+                self.stdout.write('%-50s %10.1f %10.1f %8.1fms %8.1fms' % (
+                    sync_path[:50], sync_stats['rps'], async_stats['rps'], sync_stats['p95'], async_stats['p95']
+                ))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def summarize(self, latencies, elapsed):
+        latencies = sorted(latencies)
+        return {
+            'rps': len(latencies) / elapsed,
+            'p50': statistics.median(latencies),
+            'p95': latencies[int(len(latencies) * 0.95) - 1] if len(latencies) > 1 else latencies[0],
+        }
+
+    def run_sync(self, path, headers, total, concurrency):
+        local = threading.local()
+
+        def fetch(_):
+            if not hasattr(local, 'client'):
+                local.client = Client()
+            started = time.perf_counter()
+            response = local.client.get(path, headers=headers)
+            assert response.status_code == 200, (path, response.status_code)
+            return (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            latencies = list(executor.map(fetch, range(total)))
+        return self.summarize(latencies, time.perf_counter() - started)
+
+    async def run_async(self, path, headers, total, concurrency):
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch():
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get(path, headers=headers)
+                assert response.status_code == 200, (path, response.status_code)
+                return (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*(fetch() for _ in range(total)))
+        return self.summarize(latencies, time.perf_counter() - started)
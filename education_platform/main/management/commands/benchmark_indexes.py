@@ -0,0 +1,119 @@
+import statistics
+import time
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import connection, migrations
+from django.db.migrations.state import ProjectState
+from django.db.models import Avg, Count
+
+from main.models import User, Competence, Material, Review, MarkedCompetence
+from main.seed import seed
+
+# обратные операции к миграции 0002_hot_path_indexes
+DROP_HOT_PATH_INDEXES = [
+    migrations.RemoveIndex('material', 'material_competence_id_idx'),
+    migrations.RemoveIndex('review', 'review_competence_rating_idx'),
+    migrations.RemoveConstraint('markedcompetence', 'unique_marked_competence'),
+]
+
+
+class Command(BaseCommand):
+    help = ('Наполняет временную тестовую базу и сравнивает EXPLAIN и задержку горячих запросов '
+            'main с индексами из 0002_hot_path_indexes и без них')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=5000)
+        parser.add_argument('--competences', type=int, default=300)
+        parser.add_argument('--materials', type=int, default=5, help='материалов на компетенцию')
+        parser.add_argument('--marks', type=int, default=10, help='отмеченных компетенций на пользователя')
+        parser.add_argument('--reviews', type=int, default=5, help='отзывов на пользователя')
+        parser.add_argument('--repeat', type=int, default=100, help='замеров каждого запроса за раунд')
+        parser.add_argument('--warmup', type=int, default=10, help='прогревочных запусков перед каждым замером')
+        parser.add_argument('--rounds', type=int, default=4,
+                            help='раундов; порядок вариантов (с индексами / без) чередуется')
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            counts = seed(users=options['users'], competences=options['competences'],
+                          materials_per_competence=options['materials'], marks_per_user=options['marks'],
+                          reviews_per_user=options['reviews'])
+            self.stdout.write('Данные: %s' % ', '.join('%s=%d' % item for item in counts.items()))
+            with connection.cursor() as cursor:
+                # свежая статистика для планировщика
+                cursor.execute('ANALYZE')
+
+            queries = self.hot_queries()
+            self.indexed = True
+            # варианты по очереди и с прогревом: первый замер иначе достаётся холодному кэшу,
+            # а второй — прогретому первым
+            timings = {True: {label: [] for label in queries}, False: {label: [] for label in queries}}
+            plans = {}
+            for round_number in range(max(options['rounds'], 1)):
+                order = (True, False) if round_number % 2 == 0 else (False, True)
+                for indexed in order:
+                    self.set_hot_path_indexes(indexed)
+                    plans[indexed] = self.measure(queries, options['repeat'], options['warmup'], timings[indexed])
+            after = {label: (statistics.median(timings[True][label]), plans[True][label]) for label in queries}
+            before = {label: (statistics.median(timings[False][label]), plans[False][label]) for label in queries}
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        for label in queries:
+            self.stdout.write(self.style.MIGRATE_HEADING('\n%s' % label))
+            self.stdout.write('  без индексов: %.3f мс' % before[label][0])
+            self.stdout.write(self.indent(before[label][1]))
+            self.stdout.write('  с индексами:  %.3f мс' % after[label][0])
+            self.stdout.write(self.indent(after[label][1]))
+
+    def hot_queries(self):
+        user = User.objects.order_by('?').first()
+        material = Material.objects.order_by('?').first()
+        competence_ids = list(Competence.objects.order_by('?').values_list('id', flat=True)[:100])
+        user_ids = list(User.objects.order_by('?').values_list('id', flat=True)[:100])
+        return {
+            'UsersSerializer: отметки пользователя': lambda: MarkedCompetence.objects.filter(user=user),
+            'UserList: prefetch отметок': lambda: MarkedCompetence.objects.filter(user_id__in=user_ids),
+            'Проверка отметки (user, competence)': lambda: MarkedCompetence.objects.filter(
+                user=user, competence_id=competence_ids[0]),
+            'MaterialDetailView: материал по (id, competence)': lambda: Material.objects.filter(
+                id=material.id, competence_id=material.competence_id),
+            'CompetenceAll: prefetch материалов': lambda: Material.objects.filter(
+                competence_id__in=competence_ids).order_by('competence_id', 'id'),
+            'Review: рейтинг по компетенциям': lambda: Review.objects.filter(
+                competence_id__in=competence_ids).values('competence').annotate(avg=Avg('rating'), count=Count('id')),
+        }
+
+    def measure(self, queries, repeat, warmup, timings):
+        """Дописывает замеры в timings[label] и возвращает планы запросов."""
+        plans = {}
+        for label, build in queries.items():
+            for _ in range(warmup):
+                list(build())
+            for _ in range(repeat):
+                started = time.perf_counter()
+                list(build())
+                timings[label].append((time.perf_counter() - started) * 1000)
+            plans[label] = build().explain()
+        return plans
+
+    def set_hot_path_indexes(self, present):
+        if self.indexed == present:
+            return
+        states = [ProjectState.from_apps(apps)]
+        for operation in DROP_HOT_PATH_INDEXES:
+            state = states[-1].clone()
+            operation.state_forwards('main', state)
+            states.append(state)
+        with connection.schema_editor() as editor:
+            if present:
+                for i, operation in reversed(list(enumerate(DROP_HOT_PATH_INDEXES))):
+                    operation.database_backwards('main', editor, states[i + 1], states[i])
+            else:
+                for i, operation in enumerate(DROP_HOT_PATH_INDEXES):
+                    operation.database_forwards('main', editor, states[i], states[i + 1])
+        self.indexed = present
+
+    def indent(self, text):
+        return '\n'.join('    ' + line for line in text.splitlines())
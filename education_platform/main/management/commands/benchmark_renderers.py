@@ -0,0 +1,63 @@
+import io
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from main import renderers
+from main.models import User, Competence
+from main.seed import seed
+from main.serialaize import UsersSerializer, CompetenceSerializer
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает скорость рендеринга и разбора ответов CompetenceAll и UserList стандартным '
+            'JSONRenderer/JSONParser DRF, orjson и MessagePack на данных во временной тестовой базе')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--competences', type=int, default=300)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            seed(users=options['users'], competences=options['competences'])
+            payloads = {
+                'competence/': CompetenceSerializer(
+                    CompetenceSerializer.setup_eager_loading(Competence.objects.order_by('pk')), many=True).data,
+                'users/': UsersSerializer(
+                    UsersSerializer.setup_eager_loading(User.objects.order_by('pk')), many=True).data,
+            }
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        formats = [
+            ('json (stdlib)', JSONRenderer(), JSONParser()),
+            ('json (orjson)' if renderers.orjson else 'json (fast, без orjson)',
+             renderers.FastJSONRenderer(), renderers.FastJSONParser()),
+        ]
+        if renderers.msgpack is not None:
+            formats.append(('msgpack', renderers.MessagePackRenderer(), renderers.MessagePackParser()))
+        else:
+            self.stderr.write('msgpack не установлен, MessagePack пропущен')
+
+        self.stdout.write('%-14s %-24s %12s %12s %12s' % ('маршрут', 'формат', 'render, ms', 'parse, ms', 'размер, КБ'))
+        for route, data in payloads.items():
+            for name, renderer, parser in formats:
+                body = renderer.render(data, renderer.media_type, {})
+                render_ms = self.best(lambda: renderer.render(data, renderer.media_type, {}), options['repeat'])
+                parse_ms = self.best(lambda: parser.parse(io.BytesIO(body), parser.media_type, {}),
+                                     options['repeat'])
+                self.stdout.write('%-14s %-24s %12.2f %12.2f %12.1f' % (
+                    route, name, render_ms, parse_ms, len(body) / 1024))
+
+    def best(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        return min(timings)
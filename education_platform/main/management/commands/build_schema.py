@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from main import schema
+
+
+class Command(BaseCommand):
+    help = ('Строит схему OpenAPI для текущей версии кода и сохраняет её (YAML, JSON и сжатые варианты) '
+            'в SCHEMA_ROOT; запускается при деплое, чтобы первый запрос к /api/v1/schema/ её не строил')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-stale', action='store_true', help='Не удалять схемы прошлых версий кода')
+
+    def handle(self, *args, **options):
+        version = schema.code_version()
+        paths = schema.save(schema.build(version))
+        removed = 0 if options['keep_stale'] else schema.remove_stale(version)
+        self.stdout.write(self.style.SUCCESS('Версия кода %s: записано файлов %d, удалено устаревших %d' % (
+            version[:16], len(paths), removed)))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from main import changes
+from main.models import CatalogueChange
+
+
+class Command(BaseCommand):
+    help = ('Сворачивает журнал изменений каталога до последней записи по каждому объекту; '
+            'клиенты с любым токеном после этого получают то же состояние каталога')
+
+    def handle(self, *args, **options):
+        deleted = changes.compact()
+        self.stdout.write(self.style.SUCCESS('Удалено записей: %d, осталось: %d' % (
+            deleted, CatalogueChange.objects.count())))
@@ -0,0 +1,81 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main import catalogue_cache, recommendations
+from main.importer import IMPORTERS, read_rows, chunked, init_hash_worker
+
+
+class Command(BaseCommand):
+    help = ('Потоковый импорт профессий, компетенций, материалов, пользователей и отмеченных компетенций '
+            'из CSV или JSON Lines с upsert по natural key пачками и контрольными точками')
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(IMPORTERS))
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='по умолчанию — по расширению файла')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='процессов для хэширования паролей (0 — в текущем процессе)')
+        parser.add_argument('--checkpoint', help='файл контрольной точки, по умолчанию <path>.checkpoint')
+        parser.add_argument('--resume', action='store_true', help='продолжить с последней контрольной точки')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError('Файл %s не найден' % path)
+        file_format = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        checkpoint_path = options['checkpoint'] or path + '.checkpoint'
+
+        state = {'kind': options['kind'], 'rows': 0, 'created': 0, 'updated': 0, 'errors': 0}
+        if options['resume'] and os.path.exists(checkpoint_path):
+            with open(checkpoint_path) as file:
+                saved = json.load(file)
+            if saved.get('kind') != options['kind']:
+                raise CommandError('Контрольная точка %s относится к импорту %s' % (checkpoint_path, saved.get('kind')))
+            state.update(saved)
+            self.stdout.write('Продолжение с строки %d' % state['rows'])
+
+        executor = None
+        if options['kind'] == 'user' and options['workers'] > 0:
+            executor = ProcessPoolExecutor(max_workers=options['workers'], initializer=init_hash_worker)
+        try:
+            importer = IMPORTERS[options['kind']](executor=executor)
+            # номера строк данных с 1, уже импортированные при --resume пропускаются
+            rows = islice(enumerate(read_rows(path, file_format), start=1), state['rows'], None)
+            for chunk in chunked(rows, options['chunk_size']):
+                created, updated, errors = importer.import_chunk(chunk)
+                for number, message in errors:
+                    self.stderr.write('Строка %d: %s' % (number, message))
+                state['rows'] = chunk[-1][0]
+                state['created'] += created
+                state['updated'] += updated
+                state['errors'] += len(errors)
+                self.save_checkpoint(checkpoint_path, state)
+                if options['verbosity'] > 1:
+                    self.stdout.write('Обработано строк: %d' % state['rows'])
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        # журнал изменений, индекс поиска и матрица рекомендаций пишутся в транзакциях пачек
+        # (Importer.after_write) и переживают --resume; версии кэшей сбрасываются целиком
+        if options['kind'] in ('competence', 'material'):
+            catalogue_cache.bump_version()
+        if options['kind'] == 'marked_competence':
+            recommendations.bump_version()
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        self.stdout.write(self.style.SUCCESS(
+            'Строк: %(rows)d, создано: %(created)d, обновлено: %(updated)d, ошибок: %(errors)d' % state
+        ))
+
+    def save_checkpoint(self, checkpoint_path, state):
+        # запись через временный файл, чтобы прерывание не оставило битую контрольную точку
+        tmp_path = checkpoint_path + '.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump(state, file)
+        os.replace(tmp_path, checkpoint_path)
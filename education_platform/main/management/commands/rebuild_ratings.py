@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from main import catalogue_cache
+from main.ratings import rebuild_ratings
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные агрегаты рейтинга Competence по таблице Review'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            updated = rebuild_ratings(batch_size=options['batch_size'])
+        catalogue_cache.bump_version()
+        self.stdout.write(self.style.SUCCESS('Пересчитано компетенций: %d' % updated))
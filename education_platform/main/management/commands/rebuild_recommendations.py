@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from main import recommendations
+from main.models import CompetenceCooccurrence, MarkedCompetence
+
+
+class Command(BaseCommand):
+    help = ('Пересобирает матрицу совместных отметок компетенций по MarkedCompetence; '
+            'запускается периодически и после массовых изменений отметок в обход сигналов')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            created = recommendations.rebuild(CompetenceCooccurrence, MarkedCompetence,
+                                              batch_size=options['batch_size'])
+        recommendations.bump_version()
+        self.stdout.write(self.style.SUCCESS('Ненулевых ячеек матрицы: %d' % created))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from main import search
+from main.models import SearchDocument
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает документы полнотекстового поиска по компетенциям и материалам'
+
+    def handle(self, *args, **options):
+        search.rebuild()
+        self.stdout.write(self.style.SUCCESS('Документов в индексе: %d' % SearchDocument.objects.count()))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from main import tasks  # noqa: F401 регистрирует задачи
+from main.taskqueue import Worker
+
+
+class Command(BaseCommand):
+    help = 'Запускает воркеры очереди фоновых задач (таблица main.Task)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=2, help='число потоков-воркеров')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='пауза при пустой очереди, секунды')
+        parser.add_argument('--once', action='store_true', help='выполнить готовые задачи и выйти')
+
+    def handle(self, *args, **options):
+        worker = Worker(concurrency=options['concurrency'], poll_interval=options['poll_interval'])
+        if options['once']:
+            processed = worker.run_pending()
+            self.stdout.write('Выполнено задач: %d' % processed)
+            return
+        self.stdout.write('Воркеров: %d, остановка — Ctrl+C' % options['concurrency'])
+        worker.run()
@@ -0,0 +1,28 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from main.seed import seed, refresh_derived
+
+
+class Command(BaseCommand):
+    help = ('Наполняет базу синтетическими пользователями, компетенциями, материалами, отзывами '
+            'и отмеченными компетенциями для нагрузочных прогонов')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--competences', type=int, default=100)
+        parser.add_argument('--materials', type=int, default=5, help='материалов на компетенцию')
+        parser.add_argument('--marks', type=int, default=5, help='отмеченных компетенций на пользователя')
+        parser.add_argument('--reviews', type=int, default=2, help='отзывов на пользователя')
+        parser.add_argument('--professions', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0, help='зерно генератора случайных чисел')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        counts, competence_ids = seed(users=options['users'], competences=options['competences'],
+                      materials_per_competence=options['materials'], marks_per_user=options['marks'],
+                      reviews_per_user=options['reviews'], professions=options['professions'],
+                      random_seed=options['seed'], batch_size=options['batch_size'])
+        refresh_derived(competence_ids, batch_size=options['batch_size'])
+        self.stdout.write(json.dumps(counts, indent=2))
@@ -0,0 +1,222 @@
+import bisect
+import logging
+import threading
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+LABELS = ('method', 'route')
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(pairs):
+    return '{%s}' % ','.join('%s="%s"' % (name, _escape(value)) for name, value in pairs)
+
+
+class Histogram:
+    """
+    Гистограмма в формате Prometheus, накапливается в памяти процесса (у каждого
+    воркера своя, агрегирует сам Prometheus).
+    """
+
+    def __init__(self, name, documentation, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, labels, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def get(self, labels):
+        with self._lock:
+            series = self._series.get(labels)
+            return None if series is None else {'sum': series[1], 'count': series[2]}
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def collect(self):
+        yield '# HELP %s %s' % (self.name, self.documentation)
+        yield '# TYPE %s histogram' % self.name
+        with self._lock:
+            snapshot = sorted((labels, list(s[0]), s[1], s[2]) for labels, s in self._series.items())
+        for labels, counts, total, count in snapshot:
+            pairs = list(zip(LABELS, labels))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += bucket_count
+                yield '%s_bucket%s %d' % (self.name, _format_labels(pairs + [('le', bound)]), cumulative)
+            yield '%s_sum%s %r' % (self.name, _format_labels(pairs), total)
+            yield '%s_count%s %d' % (self.name, _format_labels(pairs), count)
+
+
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'Wall time of the request.', DURATION_BUCKETS)
+DB_QUERIES = Histogram(
+    'http_request_db_queries', 'Number of SQL queries per request.', QUERY_BUCKETS)
+DB_DURATION = Histogram(
+    'http_request_db_duration_seconds', 'Time spent in SQL per request.', DURATION_BUCKETS)
+VIEW_DURATION = Histogram(
+    'http_request_view_seconds',
+    'Time in the view and renderer minus SQL time (serialization estimate, not measured directly).',
+    DURATION_BUCKETS)
+RESPONSE_SIZE = Histogram(
+    'http_response_size_bytes', 'Size of the response body.', SIZE_BUCKETS)
+
+HISTOGRAMS = (REQUEST_DURATION, DB_QUERIES, DB_DURATION, VIEW_DURATION, RESPONSE_SIZE)
+
+
+def render():
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.collect())
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    for histogram in HISTOGRAMS:
+        histogram.reset()
+
+
+class QueryRecorder:
+    """execute_wrapper: считает запросы и их время, запоминает SQL для лога."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.queries = []
+        self.view_start = None
+        self.db_at_view_start = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.duration += duration
+            self.queries.append((sql, duration))
+
+
+def get_route(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.route if match is not None else 'unmatched'
+
+
+class PerformanceMiddleware:
+    """
+    Для каждого маршрута (competence/<str:name>, ...) пишет в гистограммы время запроса,
+    число и время SQL-запросов, время представления и рендера без SQL и размер ответа. Запросы сверх
+    PERF_QUERY_BUDGET или PERF_LATENCY_BUDGET логируются вместе с их SQL.
+    Работает и в синхронной, и в асинхронной цепочке: под ASGI async-представления не уходят в поток.
+    У потоковых ответов время, размер и SQL учитываются, когда тело отдано целиком.
+    Время сериализации не измеряется отдельно: это время представления за вычетом SQL.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        recorder, stack, start = self.begin(request)
+        with stack:
+            response = self.get_response(request)
+            return self.finish(request, response, recorder, stack, start)
+
+    async def __acall__(self, request):
+        recorder, stack, start = self.begin(request)
+        with stack:
+            response = await self.get_response(request)
+            return self.finish(request, response, recorder, stack, start)
+
+    def begin(self, request):
+        recorder = request._perf = QueryRecorder()
+        stack = ExitStack()
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(recorder))
+        return recorder, stack, time.perf_counter()
+
+    def finish(self, request, response, recorder, stack, start):
+        end = time.perf_counter()
+        labels = (request.method, get_route(request))
+        if recorder.view_start is not None:
+            db_in_view = recorder.duration - recorder.db_at_view_start
+            VIEW_DURATION.observe(labels, max(end - recorder.view_start - db_in_view, 0.0))
+        if response.streaming:
+            # Тело потокового ответа тоже ходит в БД: счётчик снимается, когда оно отдано.
+            # Если клиент ушёл до первого куска, генератор не стартует, и обёртки снимает close() ответа.
+            stack = stack.pop_all()
+            measure = self.measure_async if response.is_async else self.measure
+            response.streaming_content = measure(response.streaming_content, request, labels, recorder, stack, start)
+            response._resource_closers.append(stack.close)
+        else:
+            self.observe(request, labels, recorder, time.perf_counter() - start, len(response.content))
+        return response
+
+    def measure(self, chunks, request, labels, recorder, stack, start):
+        size = 0
+        try:
+            for chunk in chunks:
+                size += len(chunk)
+                yield chunk
+        finally:
+            stack.close()
+            self.observe(request, labels, recorder, time.perf_counter() - start, size)
+
+    async def measure_async(self, chunks, request, labels, recorder, stack, start):
+        size = 0
+        try:
+            async for chunk in chunks:
+                size += len(chunk)
+                yield chunk
+        finally:
+            stack.close()
+            self.observe(request, labels, recorder, time.perf_counter() - start, size)
+
+    def observe(self, request, labels, recorder, duration, size):
+        REQUEST_DURATION.observe(labels, duration)
+        RESPONSE_SIZE.observe(labels, size)
+        DB_QUERIES.observe(labels, recorder.count)
+        DB_DURATION.observe(labels, recorder.duration)
+        if recorder.count > settings.PERF_QUERY_BUDGET or duration > settings.PERF_LATENCY_BUDGET:
+            self.log_over_budget(request, labels, duration, recorder)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        recorder = request._perf
+        recorder.view_start = time.perf_counter()
+        recorder.db_at_view_start = recorder.duration
+
+    def log_over_budget(self, request, labels, duration, recorder):
+        queries = recorder.queries[:settings.PERF_LOGGED_QUERIES]
+        logger.warning(
+            '%s %s (%s): %.3fs, %d queries in %.3fs\n%s',
+            request.method, request.get_full_path(), labels[1], duration, recorder.count, recorder.duration,
+            '\n'.join('[%.4fs] %s' % (query_duration, sql) for sql, query_duration in queries),
+        )
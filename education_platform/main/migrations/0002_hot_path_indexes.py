@@ -0,0 +1,33 @@
+# Generated by Django 5.0.3 on 2026-10-18 07:24
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def remove_duplicate_marks(apps, schema_editor):
+    MarkedCompetence = apps.get_model('main', 'MarkedCompetence')
+    keep = MarkedCompetence.objects.values('user', 'competence').annotate(keep_id=Min('id')).values('keep_id')
+    MarkedCompetence.objects.exclude(id__in=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='material',
+            index=models.Index(fields=['competence', 'id'], name='material_competence_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['competence', 'rating'], name='review_competence_rating_idx'),
+        ),
+        migrations.RunPython(remove_duplicate_marks, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='markedcompetence',
+            constraint=models.UniqueConstraint(fields=('user', 'competence'), name='unique_marked_competence'),
+        ),
+    ]
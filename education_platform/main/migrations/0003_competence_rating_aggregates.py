@@ -0,0 +1,82 @@
+# Generated by Django 5.0.3 on 2026-10-18 07:25
+
+import django.core.validators
+from django.db import migrations, models
+from django.db.models import Count, Sum, Q
+
+RATINGS = range(1, 6)
+RATING_FIELDS = ['rating_count', 'rating_sum'] + ['rating_%d_count' % rating for rating in RATINGS]
+BATCH_SIZE = 1000
+
+
+def fill_rating_aggregates(apps, schema_editor):
+    # агрегаты одним групповым запросом по Review, только исторические модели
+    Competence = apps.get_model('main', 'Competence')
+    Review = apps.get_model('main', 'Review')
+    aggregates = {'rating_count': Count('id'), 'rating_sum': Sum('rating')}
+    for rating in RATINGS:
+        aggregates['rating_%d_count' % rating] = Count('id', filter=Q(rating=rating))
+    stats = {row['competence']: row for row in Review.objects.order_by().values('competence').annotate(**aggregates)}
+
+    batch = []
+    for competence in Competence.objects.only('id', *RATING_FIELDS).iterator(chunk_size=BATCH_SIZE):
+        row = stats.get(competence.pk, {})
+        for field in RATING_FIELDS:
+            setattr(competence, field, row.get(field) or 0)
+        batch.append(competence)
+        if len(batch) >= BATCH_SIZE:
+            Competence.objects.bulk_update(batch, RATING_FIELDS)
+            batch = []
+    if batch:
+        Competence.objects.bulk_update(batch, RATING_FIELDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0002_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='competence',
+            name='rating_1_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='competence',
+            name='rating_2_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='competence',
+            name='rating_3_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='competence',
+            name='rating_4_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='competence',
+            name='rating_5_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='competence',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='competence',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='review',
+            name='rating',
+            field=models.IntegerField(validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(5)]),
+        ),
+        migrations.RunPython(fill_rating_aggregates, migrations.RunPython.noop),
+    ]
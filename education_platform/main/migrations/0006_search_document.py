@@ -0,0 +1,93 @@
+# Generated by Django 5.0.3 on 2026-10-18 07:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# полнотекстовый индекс на момент миграции; PostgreSQL — колонка tsvector с GIN, SQLite — FTS5 на триггерах
+FTS_TABLE = 'main_searchdocument_fts'
+CREATE = {
+    'postgresql': [
+        "ALTER TABLE main_searchdocument ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('russian', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('russian', coalesce(body, '')), 'B')) STORED",
+        "CREATE INDEX main_searchdocument_vector_idx ON main_searchdocument USING GIN (search_vector)",
+    ],
+    'sqlite': [
+        "CREATE VIRTUAL TABLE %s USING fts5(title, body, content='main_searchdocument', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2')" % FTS_TABLE,
+        "CREATE TRIGGER main_searchdocument_ai AFTER INSERT ON main_searchdocument BEGIN "
+        "INSERT INTO %(fts)s(rowid, title, body) VALUES (new.id, new.title, new.body); END" % {'fts': FTS_TABLE},
+        "CREATE TRIGGER main_searchdocument_ad AFTER DELETE ON main_searchdocument BEGIN "
+        "INSERT INTO %(fts)s(%(fts)s, rowid, title, body) VALUES ('delete', old.id, old.title, old.body); END"
+        % {'fts': FTS_TABLE},
+        "CREATE TRIGGER main_searchdocument_au AFTER UPDATE ON main_searchdocument BEGIN "
+        "INSERT INTO %(fts)s(%(fts)s, rowid, title, body) VALUES ('delete', old.id, old.title, old.body); "
+        "INSERT INTO %(fts)s(rowid, title, body) VALUES (new.id, new.title, new.body); END" % {'fts': FTS_TABLE},
+    ],
+}
+DROP = {
+    'postgresql': [
+        "DROP INDEX IF EXISTS main_searchdocument_vector_idx",
+        "ALTER TABLE main_searchdocument DROP COLUMN IF EXISTS search_vector",
+    ],
+    'sqlite': [
+        "DROP TRIGGER IF EXISTS main_searchdocument_ai",
+        "DROP TRIGGER IF EXISTS main_searchdocument_ad",
+        "DROP TRIGGER IF EXISTS main_searchdocument_au",
+        "DROP TABLE IF EXISTS %s" % FTS_TABLE,
+    ],
+}
+
+
+def create_index(apps, schema_editor):
+    for sql in CREATE.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def drop_index(apps, schema_editor):
+    for sql in DROP.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def fill_documents(apps, schema_editor):
+    Competence = apps.get_model('main', 'Competence')
+    Material = apps.get_model('main', 'Material')
+    SearchDocument = apps.get_model('main', 'SearchDocument')
+    SearchDocument.objects.bulk_create(
+        SearchDocument(kind='competence', object_id=competence.pk, competence_id=competence.pk,
+                       title=competence.name, body=competence.description)
+        for competence in Competence.objects.iterator()
+    )
+    SearchDocument.objects.bulk_create(
+        SearchDocument(kind='material', object_id=material.pk, competence_id=material.competence_id,
+                       title=material.title,
+                       body='\n'.join(part for part in (material.content, material.extracted_text) if part))
+        for material in Material.objects.iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0005_task_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('competence', 'Competence'), ('material', 'Material')], max_length=20)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('title', models.CharField(max_length=255)),
+                ('body', models.TextField(blank=True)),
+                ('competence', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='main.competence')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='searchdocument',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_search_document'),
+        ),
+        migrations.RunPython(create_index, drop_index),
+        migrations.RunPython(fill_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.0.3 on 2026-10-18 07:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F
+
+BATCH_SIZE = 1000
+
+
+def fill_cooccurrence(apps, schema_editor):
+    # матрица одним групповым self-join по MarkedCompetence, только исторические модели
+    CompetenceCooccurrence = apps.get_model('main', 'CompetenceCooccurrence')
+    MarkedCompetence = apps.get_model('main', 'MarkedCompetence')
+    rows = (MarkedCompetence.objects.order_by()
+            .values('competence', other=F('user__markedcompetence__competence'))
+            .annotate(count=Count('id')))
+    batch = []
+    for row in rows.iterator(chunk_size=BATCH_SIZE):
+        batch.append(CompetenceCooccurrence(competence_id=row['competence'], other_id=row['other'],
+                                            count=row['count']))
+        if len(batch) >= BATCH_SIZE:
+            CompetenceCooccurrence.objects.bulk_create(batch)
+            batch = []
+    CompetenceCooccurrence.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0006_search_document'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompetenceCooccurrence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.IntegerField(default=0)),
+                ('competence', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='main.competence')),
+                ('other', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='main.competence')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='competencecooccurrence',
+            constraint=models.UniqueConstraint(fields=('competence', 'other'), name='unique_competence_cooccurrence'),
+        ),
+        migrations.RunPython(fill_cooccurrence, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.0.3 on 2026-10-18 07:57
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.utils import timezone
+
+BATCH_SIZE = 1000
+
+
+def fill_changes(apps, schema_editor):
+    # снимок каталога: create для всех компетенций и материалов, только исторические модели
+    CatalogueChange = apps.get_model('main', 'CatalogueChange')
+    Competence = apps.get_model('main', 'Competence')
+    Material = apps.get_model('main', 'Material')
+    now = timezone.now()
+    rows = [('competence', pk, pk) for pk in Competence.objects.order_by('pk').values_list('pk', flat=True)]
+    rows += [('material', pk, competence_id)
+             for pk, competence_id in Material.objects.order_by('pk').values_list('pk', 'competence_id')]
+    CatalogueChange.objects.bulk_create([
+        CatalogueChange(kind=kind, object_id=object_id, competence_id=competence_id, action='create', created_at=now)
+        for kind, object_id, competence_id in rows
+    ], batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0007_competence_cooccurrence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogueChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('competence', 'Competence'), ('material', 'Material')], max_length=20)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('competence_id', models.PositiveBigIntegerField()),
+                ('action', models.CharField(choices=[('create', 'Create'), ('update', 'Update'), ('delete', 'Delete')], max_length=10)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'object_id'], name='main_change_object_idx')],
+            },
+        ),
+        migrations.RunPython(fill_changes, migrations.RunPython.noop),
+    ]
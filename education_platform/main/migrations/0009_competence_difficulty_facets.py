@@ -0,0 +1,59 @@
+# Generated by Django 5.0.3 on 2026-10-18 08:01
+
+from django.db import migrations, models
+
+from django.db.models import Count
+
+# коды и написания на момент миграции: последующие правки main.models её не меняют
+DIFFICULTIES = ('easy', 'medium', 'hard')
+DIFFICULTY_ALIASES = {
+    'лёгкий': 'easy', 'легкий': 'easy', 'beginner': 'easy', 'basic': 'easy',
+    'средний': 'medium', 'intermediate': 'medium', 'normal': 'medium',
+    'сложный': 'hard', 'advanced': 'hard', 'difficult': 'hard', 'expert': 'hard',
+}
+
+
+def normalize(value):
+    value = str(value or '').strip().lower()
+    return DIFFICULTY_ALIASES.get(value, value)
+
+
+def normalize_difficulties(apps, schema_editor):
+    # свободный текст -> код; нераспознанные значения не угадываются: миграция останавливается
+    # со списком, чтобы их исправили в базе вручную
+    Competence = apps.get_model('main', 'Competence')
+    rows = Competence.objects.order_by().values('difficulty').annotate(count=Count('id'))
+    unknown = sorted((row['difficulty'], row['count']) for row in rows
+                     if normalize(row['difficulty']) not in DIFFICULTIES)
+    if unknown:
+        raise RuntimeError('Нераспознанные значения Competence.difficulty (значение: число компетенций): %s. '
+                           'Замените их на easy, medium или hard и повторите миграцию.'
+                           % ', '.join('%r: %d' % item for item in unknown))
+    for row in rows:
+        normalized = normalize(row['difficulty'])
+        if normalized != row['difficulty']:
+            Competence.objects.filter(difficulty=row['difficulty']).update(difficulty=normalized)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0008_catalogue_change'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_difficulties, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='competence',
+            name='difficulty',
+            field=models.CharField(choices=[('easy', 'Easy'), ('medium', 'Medium'), ('hard', 'Hard')], max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='competence',
+            index=models.Index(fields=['difficulty', 'is_active', 'id'], name='competence_facet_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='material',
+            index=models.Index(fields=['competence', 'material_type'], name='material_competence_type_idx'),
+        ),
+    ]
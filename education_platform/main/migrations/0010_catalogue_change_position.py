@@ -0,0 +1,26 @@
+# Generated by Django 5.0.3 on 2026-10-18 08:16
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_positions(apps, schema_editor):
+    # выданные до этого токены — id записей, поэтому позиции существующих записей равны id
+    CatalogueChange = apps.get_model('main', 'CatalogueChange')
+    CatalogueChange.objects.update(position=F('id'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0009_competence_difficulty_facets'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cataloguechange',
+            name='position',
+            field=models.PositiveBigIntegerField(null=True, unique=True),
+        ),
+        migrations.RunPython(fill_positions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.0.3 on 2026-10-18 08:31
+
+from django.db import migrations, models
+from django.db.models import Count, Sum, Q
+from django.db.models.functions import Greatest, Least
+
+RATINGS = range(1, 6)
+
+
+def clamp_ratings(apps, schema_editor):
+    # оценки вне 1..5 (сохранённые мимо валидаторов) приводятся к границам, агрегаты
+    # их компетенций пересчитываются: сигнал на таких оценках падал, не обновив их
+    Competence = apps.get_model('main', 'Competence')
+    Review = apps.get_model('main', 'Review')
+    invalid = Review.objects.exclude(rating__range=(RATINGS[0], RATINGS[-1]))
+    competence_ids = set(invalid.values_list('competence_id', flat=True))
+    if not competence_ids:
+        return
+    invalid.update(rating=Least(Greatest('rating', RATINGS[0]), RATINGS[-1]))
+
+    aggregates = {'rating_count': Count('id'), 'rating_sum': Sum('rating')}
+    for rating in RATINGS:
+        aggregates['rating_%d_count' % rating] = Count('id', filter=Q(rating=rating))
+    for competence_id in competence_ids:
+        row = Review.objects.filter(competence_id=competence_id).aggregate(**aggregates)
+        Competence.objects.filter(pk=competence_id).update(**{field: value or 0 for field, value in row.items()})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0010_catalogue_change_position'),
+    ]
+
+    operations = [
+        migrations.RunPython(clamp_ratings, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='review',
+            constraint=models.CheckConstraint(check=models.Q(('rating__range', (1, 5))), name='review_rating_range'),
+        ),
+    ]
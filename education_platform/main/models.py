@@ -1,5 +1,14 @@
+import os
+import uuid
+
+from django.conf import settings
 from django.contrib.auth.base_user import BaseUserManager, AbstractBaseUser
+from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
+from django.db.models import F
+from django.utils import timezone
+
+RATINGS = range(1, 6)
 
 
 class UserManager(BaseUserManager):
@@ -50,15 +59,72 @@ class User(AbstractBaseUser):
         return self.is_staff
 
 
+DIFFICULTIES = (
+    ('easy', 'Easy'),
+    ('medium', 'Medium'),
+    ('hard', 'Hard'),
+)
+# написания, которые встречались в свободном тексте difficulty до нормализации
+DIFFICULTY_ALIASES = {
+    'лёгкий': 'easy', 'легкий': 'easy', 'beginner': 'easy', 'basic': 'easy',
+    'средний': 'medium', 'intermediate': 'medium', 'normal': 'medium',
+    'сложный': 'hard', 'advanced': 'hard', 'difficult': 'hard', 'expert': 'hard',
+}
+
+
+def normalize_difficulty(value):
+    value = str(value or '').strip().lower()
+    return DIFFICULTY_ALIASES.get(value, value)
+
+
 class Competence(models.Model):
     name = models.CharField(max_length=100,  unique=True)
     description = models.TextField()
-    difficulty = models.CharField(max_length=20)
+    difficulty = models.CharField(max_length=10, choices=DIFFICULTIES)
     is_active = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+    # денормализованные агрегаты Review, поддерживаются сигналами и rebuild_ratings
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_1_count = models.PositiveIntegerField(default=0)
+    rating_2_count = models.PositiveIntegerField(default=0)
+    rating_3_count = models.PositiveIntegerField(default=0)
+    rating_4_count = models.PositiveIntegerField(default=0)
+    rating_5_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # фильтры списка компетенций (main.facets) с keyset-пагинацией по id
+            models.Index(fields=['difficulty', 'is_active', 'id'], name='competence_facet_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    @property
+    def rating_average(self):
+        if not self.rating_count:
+            return None
+        return round(self.rating_sum / self.rating_count, 2)
+
+    @property
+    def rating_histogram(self):
+        return {rating: getattr(self, 'rating_%d_count' % rating) for rating in RATINGS}
+
+    @classmethod
+    def apply_rating(cls, competence_id, rating, sign):
+        cls.objects.filter(pk=competence_id).update(**{
+            'rating_count': F('rating_count') + sign,
+            'rating_sum': F('rating_sum') + sign * rating,
+            'rating_%d_count' % rating: F('rating_%d_count' % rating) + sign,
+            'updated_at': timezone.now(),
+        })
+
+    def touch(self):
+        # ревизия компетенции покрывает и её материалы
+        self.updated_at = timezone.now()
+        Competence.objects.filter(pk=self.pk).update(updated_at=self.updated_at)
+
 
 class Material(models.Model):
     competence = models.ForeignKey(Competence, on_delete=models.CASCADE)
@@ -73,26 +139,158 @@ class Material(models.Model):
     content = models.TextField(blank=True, null=True)
     link = models.URLField(blank=True, null=True)
     file = models.FileField(upload_to='materials/', null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # заполняются фоновой задачей process_material
+    file_size = models.PositiveBigIntegerField(null=True, blank=True)
+    file_checksum = models.CharField(max_length=64, blank=True)
+    duration = models.FloatField(null=True, blank=True)
+    extracted_text = models.TextField(blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # prefetch material_set (competence_id IN ...) и выборка материала по (id, competence)
+            models.Index(fields=['competence', 'id'], name='material_competence_id_idx'),
+            # фильтр компетенций по типу материалов (EXISTS по competence_id и material_type)
+            models.Index(fields=['competence', 'material_type'], name='material_competence_type_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
 
+class MaterialUpload(models.Model):
+    # сессия возобновляемой загрузки файла материала по частям
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    material = models.ForeignKey(Material, on_delete=models.CASCADE)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    offset = models.PositiveBigIntegerField(default=0)
+    checksum = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    @property
+    def part_path(self):
+        return os.path.join(settings.MATERIAL_UPLOAD_TMP_DIR, '%s.part' % self.id)
+
+
 class Review(models.Model):
     competence = models.ForeignKey(Competence, on_delete=models.CASCADE)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    rating = models.IntegerField()
+    rating = models.IntegerField(validators=[MinValueValidator(RATINGS[0]), MaxValueValidator(RATINGS[-1])])
     comment = models.TextField()
 
+    class Meta:
+        indexes = [
+            # агрегаты рейтинга по компетенции считаются только по индексу
+            models.Index(fields=['competence', 'rating'], name='review_competence_rating_idx'),
+        ]
+        constraints = [
+            # валидаторы не работают при save(): ORM, админка и импорт проверяются базой
+            models.CheckConstraint(check=models.Q(rating__range=(RATINGS[0], RATINGS[-1])),
+                                   name='review_rating_range'),
+        ]
+
 
 class MarkedCompetence(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     competence = models.ForeignKey(Competence, on_delete=models.CASCADE)
 
+    class Meta:
+        constraints = [
+            # уникальный индекс (user, competence) заодно обслуживает выборку по user
+            models.UniqueConstraint(fields=['user', 'competence'], name='unique_marked_competence'),
+        ]
+
 
+class CompetenceCooccurrence(models.Model):
+    # разреженная симметричная матрица совместных отметок (см. main.recommendations):
+    # сколько пользователей отметили обе компетенции, на диагонали — саму компетенцию
+    competence = models.ForeignKey(Competence, on_delete=models.CASCADE, related_name='+')
+    other = models.ForeignKey(Competence, on_delete=models.CASCADE, related_name='+')
+    count = models.IntegerField(default=0)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['competence', 'other'], name='unique_competence_cooccurrence'),
+        ]
 
 
+class SearchDocument(models.Model):
+    # денормализованный документ полнотекстового индекса (см. main.search)
+    COMPETENCE = 'competence'
+    MATERIAL = 'material'
+    KINDS = (
+        (COMPETENCE, 'Competence'),
+        (MATERIAL, 'Material'),
+    )
+    kind = models.CharField(max_length=20, choices=KINDS)
+    object_id = models.PositiveBigIntegerField()
+    competence = models.ForeignKey(Competence, on_delete=models.CASCADE)
+    title = models.CharField(max_length=255)
+    body = models.TextField(blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='unique_search_document'),
+        ]
 
 
+class CatalogueChange(models.Model):
+    # журнал изменений каталога для дельта-синхронизации (см. main.changes); position — токен since
+    COMPETENCE = 'competence'
+    MATERIAL = 'material'
+    KINDS = (
+        (COMPETENCE, 'Competence'),
+        (MATERIAL, 'Material'),
+    )
+    CREATE = 'create'
+    UPDATE = 'update'
+    DELETE = 'delete'
+    ACTIONS = (
+        (CREATE, 'Create'),
+        (UPDATE, 'Update'),
+        (DELETE, 'Delete'),
+    )
+    kind = models.CharField(max_length=20, choices=KINDS)
+    object_id = models.PositiveBigIntegerField()
+    # не внешний ключ: запись об удалении переживает компетенцию
+    competence_id = models.PositiveBigIntegerField()
+    action = models.CharField(max_length=10, choices=ACTIONS)
+    created_at = models.DateTimeField(default=timezone.now)
+    # порядок фиксации: присваивается уже закоммиченным записям (changes.sequence), в отличие от id
+    position = models.PositiveBigIntegerField(null=True, unique=True)
+
+    class Meta:
+        indexes = [
+            # свёртка журнала до последней записи по объекту (compact_changes)
+            models.Index(fields=['kind', 'object_id'], name='main_change_object_idx'),
+        ]
+
+
+class Task(models.Model):
+    # очередь фоновых задач в базе, обрабатывается manage.py run_workers
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUSES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='task_status_run_after_idx'),
+        ]
@@ -0,0 +1,20 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Keyset-пагинация по первичному ключу: следующая страница выбирается через
+    WHERE pk > <курсор> по индексу, поэтому глубокие страницы стоят столько же, сколько первая.
+    Включается, если в запросе передан ?cursor= или ?page_size=, иначе отдаётся весь список.
+    """
+    ordering = 'pk'
+    page_size = getattr(settings, 'KEYSET_PAGE_SIZE', 100)
+    max_page_size = getattr(settings, 'KEYSET_MAX_PAGE_SIZE', 1000)
+    page_size_query_param = 'page_size'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if (self.cursor_query_param not in request.query_params
+                and self.page_size_query_param not in request.query_params):
+            return None
+        return super().paginate_queryset(queryset, request, view)
@@ -0,0 +1,35 @@
+from django.db.models import Count, Sum, Q
+
+from .models import RATINGS, Competence, Review
+
+RATING_FIELDS = ['rating_count', 'rating_sum'] + ['rating_%d_count' % rating for rating in RATINGS]
+
+
+def rebuild_ratings(batch_size=1000):
+    """
+    Пересчитывает агрегаты рейтинга всех компетенций одним групповым запросом по Review
+    и записывает их через bulk_update.
+    """
+    aggregates = {'rating_count': Count('id'), 'rating_sum': Sum('rating')}
+    for rating in RATINGS:
+        aggregates['rating_%d_count' % rating] = Count('id', filter=Q(rating=rating))
+    stats = {
+        row['competence']: row
+        for row in Review.objects.order_by().values('competence').annotate(**aggregates)
+    }
+
+    batch = []
+    updated = 0
+    for competence in Competence.objects.only('id', *RATING_FIELDS).iterator(chunk_size=batch_size):
+        row = stats.get(competence.pk, {})
+        for field in RATING_FIELDS:
+            setattr(competence, field, row.get(field) or 0)
+        batch.append(competence)
+        if len(batch) >= batch_size:
+            Competence.objects.bulk_update(batch, RATING_FIELDS)
+            updated += len(batch)
+            batch = []
+    if batch:
+        Competence.objects.bulk_update(batch, RATING_FIELDS)
+        updated += len(batch)
+    return updated
@@ -0,0 +1,270 @@
+import math
+import threading
+import time
+from collections import Counter, defaultdict
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.dispatch import Signal
+
+from .models import User, Competence, MarkedCompetence, CompetenceCooccurrence
+from .routers import read_from_primary
+
+# Рекомендации по трём сигналам:
+#   - совместные отметки: косинусная близость отмеченных пользователем компетенций к кандидату
+#     по матрице CompetenceCooccurrence (count(a, b) / sqrt(count(a, a) * count(b, b)));
+#   - профессия: доля пользователей той же профессии, отметивших кандидата;
+#   - рейтинг: байесовское среднее Review, сглаженное к RATING_PRIOR на RATING_PRIOR_WEIGHT отзывах.
+# Матрица хранится в базе по ненулевым ячейкам, обновляется сигналами MarkedCompetence
+# и пересобирается целиком командой rebuild_recommendations.
+RATING_PRIOR = 3.0
+RATING_PRIOR_WEIGHT = 5
+BATCH_SIZE = 1000
+UPDATE_BATCH = 100
+VERSION_KEY = 'recommendations:version'
+
+_local = threading.local()
+
+# отметки, учтённые record_marks, в том числе созданные bulk_create мимо post_save; аргумент user_ids
+marks_recorded = Signal()
+
+
+def get_cache():
+    return caches[settings.RECOMMENDATION_CACHE_ALIAS]
+
+
+def get_version():
+    cache = get_cache()
+    cache.add(VERSION_KEY, int(time.time()), timeout=None)
+    return cache.get(VERSION_KEY)
+
+
+def bump_version():
+    """Сбрасывает все кэшированные ранжирования, например после пересборки матрицы."""
+    cache = get_cache()
+    cache.add(VERSION_KEY, int(time.time()), timeout=None)
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        # ключ вытеснили между add и incr
+        cache.set(VERSION_KEY, int(time.time()), timeout=None)
+        return cache.get(VERSION_KEY)
+
+
+def cache_key(*parts):
+    return 'recommendations:v%s:%s' % (get_version(), ':'.join(str(part) for part in parts))
+
+
+def user_key(user_id):
+    return cache_key('user', user_id)
+
+
+def invalidate(user_ids):
+    get_cache().delete_many([user_key(user_id) for user_id in user_ids])
+
+
+def rebuild(cooccurrence_model, marked_model, batch_size=BATCH_SIZE):
+    """
+    Пересобирает матрицу одним групповым self-join по MarkedCompetence (его копия —
+    в миграции 0007, которая заполняет матрицу впервые).
+    """
+    rows = (marked_model.objects.order_by()
+            .values('competence', other=F('user__markedcompetence__competence'))
+            .annotate(count=Count('id')))
+    cooccurrence_model.objects.all().delete()
+    batch = []
+    created = 0
+    for row in rows.iterator(chunk_size=batch_size):
+        batch.append(cooccurrence_model(competence_id=row['competence'], other_id=row['other'], count=row['count']))
+        if len(batch) >= batch_size:
+            cooccurrence_model.objects.bulk_create(batch)
+            created += len(batch)
+            batch = []
+    if batch:
+        cooccurrence_model.objects.bulk_create(batch)
+        created += len(batch)
+    return created
+
+
+def _changed_pairs(marks, exclude=()):
+    """
+    Ячейки матрицы, которые меняет добавление или удаление отметок marks — пар (user_id, competence_id):
+    для каждой отметки — её строка и столбец по всем текущим отметкам пользователя.
+    Одна ячейка может меняться от нескольких пользователей, поэтому Counter.
+    """
+    changed = defaultdict(set)
+    for user_id, competence_id in marks:
+        changed[user_id].add(competence_id)
+    current = defaultdict(set)
+    for user_id, competence_id in MarkedCompetence.objects.filter(user_id__in=changed).values_list(
+            'user_id', 'competence_id'):
+        if (user_id, competence_id) not in exclude:
+            current[user_id].add(competence_id)
+
+    pairs = Counter()
+    for user_id, competence_ids in changed.items():
+        others = current[user_id] | competence_ids
+        pairs.update({(a, b) for a in competence_ids for b in others} |
+                     {(b, a) for a in competence_ids for b in others})
+    return pairs
+
+
+def _apply(pairs, sign):
+    if not pairs:
+        return
+    if sign > 0:
+        CompetenceCooccurrence.objects.bulk_create(
+            [CompetenceCooccurrence(competence_id=a, other_id=b) for a, b in pairs],
+            ignore_conflicts=True, batch_size=BATCH_SIZE,
+        )
+    # одна UPDATE ... SET count = count ± k на пачку строк матрицы с одинаковым k
+    rows = defaultdict(lambda: defaultdict(list))
+    for (a, b), times in pairs.items():
+        rows[times][a].append(b)
+    for times, columns in rows.items():
+        items = list(columns.items())
+        for start in range(0, len(items), UPDATE_BATCH):
+            condition = reduce(or_, (Q(competence_id=competence_id, other_id__in=other_ids)
+                                     for competence_id, other_ids in items[start:start + UPDATE_BATCH]))
+            CompetenceCooccurrence.objects.filter(condition).update(count=F('count') + sign * times)
+
+
+def _lock_users(user_ids):
+    # отметки одного пользователя учитываются по очереди: вторая транзакция ждёт коммита первой и видит
+    # её отметки, иначе ни одна не увеличила бы ячейку пары из двух одновременно отмеченных компетенций
+    list(User.objects.select_for_update().filter(pk__in=user_ids).order_by('pk').values_list('pk', flat=True))
+
+
+def record_marks(marks):
+    """
+    Учитывает уже сохранённые отметки (в том числе созданные bulk_create, мимо сигналов).
+    Вызывается в транзакции, которая их создала.
+    """
+    marks = list(marks)
+    user_ids = {user_id for user_id, _ in marks}
+    with transaction.atomic(savepoint=False):
+        _lock_users(user_ids)
+        _apply(_changed_pairs(marks), 1)
+    invalidate(user_ids)
+    marks_recorded.send(sender=MarkedCompetence, user_ids=user_ids)
+
+
+def _deleting():
+    # набор привязан к atomic-блоку, в котором Collector.delete() шлёт pre_delete и post_delete:
+    # если удаление упало между ними, следующее начнёт с пустого набора
+    block = transaction.get_connection().atomic_blocks[-1]
+    if getattr(_local, 'block', None) is not block:
+        _local.block, _local.marks = block, set()
+    return _local.marks
+
+
+def begin_unmark(user_id, competence_id):
+    """
+    Вызывается из pre_delete, пока отметка ещё в базе. При каскадном удалении pre_delete
+    приходит для всех отметок до удаления первой из них, поэтому уже учтённые в этом удалении
+    исключаются, иначе пара удаляемых компетенций была бы вычтена дважды.
+    """
+    deleting = _deleting()
+    _lock_users([user_id])
+    _apply(_changed_pairs([(user_id, competence_id)], exclude=deleting), -1)
+    deleting.add((user_id, competence_id))
+
+
+def end_unmark(user_id, competence_id):
+    deleting = _deleting()
+    deleting.discard((user_id, competence_id))
+    if not deleting:
+        _local.block = None
+    invalidate([user_id])
+
+
+def profession_affinity(profession_id):
+    """{competence_id: доля пользователей профессии, отметивших компетенцию}, с кэшем."""
+    if profession_id is None:
+        return {}
+    cache = get_cache()
+    key = cache_key('profession', profession_id)
+    affinity = cache.get(key)
+    if affinity is None:
+        users = User.objects.filter(profession_id=profession_id).count()
+        rows = (MarkedCompetence.objects.filter(user__profession_id=profession_id).order_by()
+                .values('competence_id').annotate(users=Count('id')))
+        affinity = {row['competence_id']: row['users'] / users for row in rows} if users else {}
+        cache.set(key, affinity, settings.RECOMMENDATION_CACHE_TIMEOUT)
+    return affinity
+
+
+def popular():
+    """Самые отмечаемые компетенции — кандидаты для пользователя без отметок и профессии."""
+    cache = get_cache()
+    key = cache_key('popular')
+    competence_ids = cache.get(key)
+    if competence_ids is None:
+        competence_ids = list(CompetenceCooccurrence.objects.filter(competence=F('other'), count__gt=0)
+                              .order_by('-count', 'competence_id')
+                              .values_list('competence_id', flat=True)[:settings.RECOMMENDATION_MAX_RESULTS])
+        cache.set(key, competence_ids, settings.RECOMMENDATION_CACHE_TIMEOUT)
+    return competence_ids
+
+
+def rating_score(rating_count, rating_sum):
+    average = (rating_sum + RATING_PRIOR * RATING_PRIOR_WEIGHT) / (rating_count + RATING_PRIOR_WEIGHT)
+    return (average - 1) / 4
+
+
+def rank(user_id):
+    """Список (competence_id, score) по убыванию score, не длиннее RECOMMENDATION_MAX_RESULTS."""
+    profession_id = User.objects.filter(pk=user_id).values_list('profession_id', flat=True).get()
+    marked = set(MarkedCompetence.objects.filter(user_id=user_id).values_list('competence_id', flat=True))
+
+    marks_count = {}
+    cooccurrence = []
+    for a, b, count in CompetenceCooccurrence.objects.filter(competence_id__in=marked, count__gt=0).values_list(
+            'competence_id', 'other_id', 'count'):
+        if a == b:
+            marks_count[a] = count
+        elif b not in marked:
+            cooccurrence.append((a, b, count))
+    affinity = profession_affinity(profession_id)
+
+    candidates = ({b for _, b, _ in cooccurrence} | set(affinity)) - marked
+    if not candidates:
+        candidates = set(popular()) - marked
+    if not candidates:
+        return []
+    marks_count.update(CompetenceCooccurrence.objects.filter(
+        competence_id__in=candidates, other=F('competence'), count__gt=0
+    ).values_list('competence_id', 'count'))
+
+    similarity = defaultdict(float)
+    for a, b, count in cooccurrence:
+        if marks_count.get(a) and marks_count.get(b):
+            similarity[b] += count / math.sqrt(marks_count[a] * marks_count[b])
+
+    weights = settings.RECOMMENDATION_WEIGHTS
+    scores = []
+    for competence_id, rating_count, rating_sum in Competence.objects.filter(
+            pk__in=candidates, is_active=True).values_list('pk', 'rating_count', 'rating_sum'):
+        score = (weights['cooccurrence'] * similarity[competence_id] / max(len(marked), 1) +
+                 weights['profession'] * affinity.get(competence_id, 0) +
+                 weights['rating'] * rating_score(rating_count, rating_sum))
+        scores.append((competence_id, round(score, 6)))
+    scores.sort(key=lambda item: (-item[1], item[0]))
+    return scores[:settings.RECOMMENDATION_MAX_RESULTS]
+
+
+def recommend(user_id, limit=10):
+    """Топ-limit рекомендаций пользователю; ранжирование кэшируется до изменения его отметок."""
+    cache = get_cache()
+    key = user_key(user_id)
+    ranking = cache.get(key)
+    if ranking is None:
+        # в кэш — только то, что прочитано с основной базы
+        with read_from_primary():
+            ranking = rank(user_id)
+        cache.set(key, ranking, settings.RECOMMENDATION_CACHE_TIMEOUT)
+    return ranking[:limit]
@@ -0,0 +1,83 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.http import FileResponse
+
+# реплика, закреплённая за текущим запросом, или None — чтения идут в default
+_replica = ContextVar('replica', default=None)
+
+
+def replica_aliases():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+@contextmanager
+def read_from_replica(alias=None):
+    """
+    Чтения внутри блока уходят на одну, выбранную при входе реплику (если они настроены):
+    основной запрос и prefetch видят один снимок. Записи — всегда в default.
+    """
+    replicas = replica_aliases()
+    alias = alias or _replica.get() or (random.choice(replicas) if replicas else None)
+    token = _replica.set(alias)
+    try:
+        yield alias
+    finally:
+        _replica.reset(token)
+
+
+@contextmanager
+def read_from_primary():
+    """
+    Чтения внутри блока — из default. Для всего, что кладётся в кэш под текущей версией:
+    отстающая реплика иначе закрепила бы устаревшие данные под новой версией на весь срок записи.
+    """
+    token = _replica.set(None)
+    try:
+        yield
+    finally:
+        _replica.reset(token)
+
+
+def _stream_from_replica(content, alias):
+    with read_from_replica(alias):
+        yield from content
+
+
+class ReplicaRouter:
+    """
+    Роутер для read-реплик из config.ini: по умолчанию всё идёт в default, на реплики —
+    только чтения внутри read_from_replica(), т.е. GET-запросы к представлениям с ReplicaReadMixin.
+    """
+
+    def db_for_read(self, model, **hints):
+        alias = _replica.get()
+        return alias if alias in replica_aliases() else None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in replica_aliases()
+
+
+class ReplicaReadMixin:
+    """
+    Для admin-представлений, у которых есть только GET: запрос целиком, включая
+    аутентификацию и потоковую выдачу ответа, читает из реплики.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return super().dispatch(request, *args, **kwargs)
+        with read_from_replica() as alias:
+            response = super().dispatch(request, *args, **kwargs)
+        # FileResponse читает только файл; обёртка отключила бы wsgi.file_wrapper
+        if response.streaming and not isinstance(response, FileResponse):
+            response.streaming_content = _stream_from_replica(response.streaming_content, alias)
+        return response
@@ -0,0 +1,162 @@
+import gzip
+import hashlib
+import os
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+import drf_spectacular
+from django.conf import settings
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+from drf_spectacular.settings import spectacular_settings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Схема OpenAPI строится один раз на версию кода: командой build_schema при деплое или при первом
+# запросе. Тела (yaml и json, как есть, gzip и, если установлен brotli, br) держатся в памяти процесса
+# и в файлах SCHEMA_ROOT, откуда их подхватывают остальные процессы.
+FORMATS = {
+    'yaml': OpenApiYamlRenderer,
+    'json': OpenApiJsonRenderer,
+}
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+SUFFIXES = {'identity': '', 'gzip': '.gz', 'br': '.br'}
+
+_artifacts = {}
+_lock = threading.Lock()
+
+
+class CachedJWTScheme(SimpleJWTScheme):
+    # JWT-аутентификация представлений описывается в схеме так же, как у JWTAuthentication
+    target_class = 'main.authentication.CachedJWTAuthentication'
+    match_subclasses = True
+
+
+class SchemaArtifact:
+    """Готовая схема в одном формате: тела по кодировкам и ETag каждого из них."""
+
+    def __init__(self, version, fmt, bodies):
+        self.version = version
+        self.format = fmt
+        self.bodies = bodies
+
+    def etag(self, encoding=None):
+        # тела разных кодировок — разные представления, сильный ETag у каждого свой
+        return '"%s-%s-%s"' % (self.version[:16], self.format, encoding or 'identity')
+
+    def negotiate(self, accept_encoding):
+        """Лучшая кодировка из Accept-Encoding клиента: (кодировка или None, тело)."""
+        accepted = {part.split(';')[0].strip() for part in accept_encoding.lower().split(',')}
+        for encoding in ENCODINGS:
+            if encoding in accepted and encoding in self.bodies:
+                return encoding, self.bodies[encoding]
+        return None, self.bodies['identity']
+
+
+@lru_cache(maxsize=None)
+def code_version():
+    """SCHEMA_CODE_VERSION (например, git sha релиза) или хэш исходников проекта и версии drf-spectacular."""
+    if settings.SCHEMA_CODE_VERSION:
+        return hashlib.sha1(str(settings.SCHEMA_CODE_VERSION).encode()).hexdigest()
+    digest = hashlib.sha1(drf_spectacular.__version__.encode())
+    for path in sorted(Path(settings.BASE_DIR).rglob('*.py')):
+        digest.update(str(path.relative_to(settings.BASE_DIR)).encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def generate():
+    """Схема, как её строит SpectacularAPIView, но без запроса."""
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS()
+    return generator.get_schema(request=None, public=True)
+
+
+def compress(body):
+    bodies = {'identity': body, 'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        bodies['br'] = brotli.compress(body, quality=11)
+    return bodies
+
+
+def build(version=None):
+    """{формат: SchemaArtifact} для текущей версии кода."""
+    version = version or code_version()
+    schema = generate()
+    return {
+        fmt: SchemaArtifact(version, fmt, compress(renderer().render(schema, renderer_context={})))
+        for fmt, renderer in FORMATS.items()
+    }
+
+
+def file_path(version, fmt, encoding='identity'):
+    return Path(settings.SCHEMA_ROOT) / ('schema-%s.%s%s' % (version, fmt, SUFFIXES[encoding]))
+
+
+def save(artifacts):
+    """Пишет файлы через временные, чтобы другие процессы не прочитали недописанный."""
+    os.makedirs(settings.SCHEMA_ROOT, exist_ok=True)
+    paths = []
+    for artifact in artifacts.values():
+        for encoding, body in artifact.bodies.items():
+            path = file_path(artifact.version, artifact.format, encoding)
+            tmp_path = path.with_name(path.name + '.tmp')
+            tmp_path.write_bytes(body)
+            os.replace(tmp_path, path)
+            paths.append(path)
+    return paths
+
+
+def remove_stale(version):
+    """Удаляет файлы схем других версий кода."""
+    root = Path(settings.SCHEMA_ROOT)
+    removed = 0
+    if root.is_dir():
+        for path in root.glob('schema-*'):
+            if not path.name.startswith('schema-%s.' % version):
+                path.unlink()
+                removed += 1
+    return removed
+
+
+def load(version):
+    artifacts = {}
+    for fmt in FORMATS:
+        bodies = {}
+        for encoding in ('identity',) + ENCODINGS:
+            path = file_path(version, fmt, encoding)
+            if path.exists():
+                bodies[encoding] = path.read_bytes()
+        if 'identity' not in bodies:
+            return None
+        artifacts[fmt] = SchemaArtifact(version, fmt, bodies)
+    return artifacts
+
+
+def get(fmt='yaml'):
+    """Схема в формате fmt: из памяти, из файла build_schema или построенная при первом запросе."""
+    version = code_version()
+    artifacts = _artifacts.get(version)
+    if artifacts is None:
+        with _lock:
+            artifacts = _artifacts.get(version)
+            if artifacts is None:
+                artifacts = load(version)
+                if artifacts is None:
+                    artifacts = build(version)
+                    try:
+                        save(artifacts)
+                    except OSError:
+                        # каталог только для чтения: схема остаётся в памяти процесса
+                        pass
+                _artifacts.clear()
+                _artifacts[version] = artifacts
+    return artifacts[fmt]
+
+
+def reset():
+    _artifacts.clear()
+    code_version.cache_clear()
@@ -0,0 +1,146 @@
+import html
+import re
+
+from django.db import connection, transaction
+
+from .models import Competence, Material, SearchDocument
+
+# PostgreSQL: генерируемая колонка tsvector с GIN-индексом; SQLite: внешняя таблица FTS5 на триггерах.
+# Обе структуры обновляются самой базой при любой записи в main_searchdocument; создаёт их миграция 0006.
+SEARCH_CONFIG = 'russian'
+HIGHLIGHT_START, HIGHLIGHT_STOP = '<mark>', '</mark>'
+# база оборачивает совпадения в символы из области частного использования, а не в теги:
+# текст документа экранируется целиком, и только после этого они заменяются на <mark></mark>
+MATCH_START, MATCH_STOP = '\ue000', '\ue001'
+FTS_TABLE = 'main_searchdocument_fts'
+BATCH_SIZE = 1000
+
+
+def competence_document(competence):
+    return SearchDocument(kind=SearchDocument.COMPETENCE, object_id=competence.pk, competence_id=competence.pk,
+                          title=competence.name, body=competence.description)
+
+
+def material_document(material):
+    body = '\n'.join(part for part in (material.content, material.extracted_text) if part)
+    return SearchDocument(kind=SearchDocument.MATERIAL, object_id=material.pk,
+                          competence_id=material.competence_id, title=material.title, body=body)
+
+
+def _reindex(kind, queryset, build):
+    batch = []
+    for instance in queryset.iterator(chunk_size=BATCH_SIZE):
+        batch.append(build(instance))
+        if len(batch) >= BATCH_SIZE:
+            _replace(kind, batch)
+            batch = []
+    if batch:
+        _replace(kind, batch)
+
+
+def _replace(kind, documents):
+    if not documents:
+        return
+    with transaction.atomic():
+        SearchDocument.objects.filter(kind=kind, object_id__in=[doc.object_id for doc in documents]).delete()
+        SearchDocument.objects.bulk_create(documents)
+
+
+def index_competences(ids=None):
+    queryset = Competence.objects.only('id', 'name', 'description').order_by('pk')
+    if ids is not None:
+        queryset = queryset.filter(pk__in=ids)
+    _reindex(SearchDocument.COMPETENCE, queryset, competence_document)
+
+
+def index_materials(ids=None):
+    queryset = Material.objects.only('id', 'competence_id', 'title', 'content', 'extracted_text').order_by('pk')
+    if ids is not None:
+        queryset = queryset.filter(pk__in=ids)
+    _reindex(SearchDocument.MATERIAL, queryset, material_document)
+
+
+def index_competence_objects(competences):
+    _replace(SearchDocument.COMPETENCE, [competence_document(competence) for competence in competences])
+
+
+def index_material_objects(materials):
+    _replace(SearchDocument.MATERIAL, [material_document(material) for material in materials])
+
+
+def unindex_material(material_id):
+    SearchDocument.objects.filter(kind=SearchDocument.MATERIAL, object_id=material_id).delete()
+
+
+def rebuild():
+    with transaction.atomic():
+        SearchDocument.objects.all().delete()
+        index_competences()
+        index_materials()
+
+
+def _fts5_query(text):
+    # каждое слово в кавычках (без синтаксиса FTS5 от клиента), последнее — как префикс
+    tokens = re.findall(r'\w+', text)
+    if not tokens:
+        return None
+    return ' '.join('"%s"' % token for token in tokens) + '*'
+
+
+def highlight(snippet):
+    """Экранированный HTML фрагмента: разметка в нём — только <mark></mark> вокруг найденных слов."""
+    return html.escape(snippet or '').replace(MATCH_START, HIGHLIGHT_START).replace(MATCH_STOP, HIGHLIGHT_STOP)
+
+
+def search(text, kind=None, limit=20, offset=0):
+    """
+    Ранжированный поиск по SearchDocument. Возвращает список словарей, отсортированный по
+    убыванию релевантности; snippet — экранированный HTML с найденными словами в <mark></mark>.
+    """
+    vendor = connection.vendor
+    kind_filter = 'AND d.kind = %s' if kind else ''
+    kind_params = [kind] if kind else []
+    if vendor == 'postgresql':
+        sql = (
+            "SELECT d.kind, d.object_id, d.competence_id, c.name, d.title, ts_rank(d.search_vector, q) AS rank, "
+            "ts_headline(%%s::regconfig, d.body, q, %%s) AS snippet "
+            "FROM main_searchdocument d JOIN main_competence c ON c.id = d.competence_id, "
+            "websearch_to_tsquery(%%s::regconfig, %%s) q "
+            "WHERE d.search_vector @@ q %s ORDER BY rank DESC, d.id LIMIT %%s OFFSET %%s" % kind_filter
+        )
+        options = 'StartSel=%s, StopSel=%s, MaxFragments=2, MaxWords=20, MinWords=5' % (
+            MATCH_START, MATCH_STOP)
+        params = [SEARCH_CONFIG, options, SEARCH_CONFIG, text] + kind_params + [limit, offset]
+    elif vendor == 'sqlite':
+        match = _fts5_query(text)
+        if match is None:
+            return []
+        sql = (
+            "SELECT d.kind, d.object_id, d.competence_id, c.name, d.title, "
+            "-bm25(%(fts)s, 10.0, 1.0) AS rank, snippet(%(fts)s, -1, %%s, %%s, '…', 16) AS snippet "
+            "FROM %(fts)s JOIN main_searchdocument d ON d.id = %(fts)s.rowid "
+            "JOIN main_competence c ON c.id = d.competence_id "
+            "WHERE %(fts)s MATCH %%s %(kind)s ORDER BY rank DESC, d.id LIMIT %%s OFFSET %%s"
+            % {'fts': FTS_TABLE, 'kind': kind_filter}
+        )
+        params = [MATCH_START, MATCH_STOP, match] + kind_params + [limit, offset]
+    else:
+        # без полнотекстового индекса: LIKE без ранжирования
+        sql = (
+            "SELECT d.kind, d.object_id, d.competence_id, c.name, d.title, 0 AS rank, substr(d.body, 1, 200) AS snippet "
+            "FROM main_searchdocument d JOIN main_competence c ON c.id = d.competence_id "
+            "WHERE (d.title LIKE %%s ESCAPE '!' OR d.body LIKE %%s ESCAPE '!') %s "
+            "ORDER BY d.id LIMIT %%s OFFSET %%s" % kind_filter
+        )
+        # % и _ из запроса ищутся как обычные символы
+        pattern = '%%%s%%' % re.sub(r'([!%_])', r'!\1', text)
+        params = [pattern, pattern] + kind_params + [limit, offset]
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    return [
+        {'kind': kind, 'id': object_id, 'competence_id': competence_id, 'competence': competence_name,
+         'title': title, 'rank': rank, 'snippet': highlight(snippet)}
+        for kind, object_id, competence_id, competence_name, title, rank, snippet in rows
+    ]
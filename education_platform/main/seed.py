@@ -0,0 +1,79 @@
+import random
+import uuid
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from . import catalogue_cache, changes, recommendations, search
+from .models import User, Profession, Competence, Material, Review, MarkedCompetence, CompetenceCooccurrence
+from .ratings import rebuild_ratings
+
+DIFFICULTIES = ('easy', 'medium', 'hard')
+MATERIAL_TYPES = [material_type for material_type, _ in Material.MATERIAL_TYPES]
+
+
+def seed(users=1000, competences=100, materials_per_competence=5, marks_per_user=5, reviews_per_user=2,
+         professions=10, random_seed=0, batch_size=1000):
+    """
+    Наполняет базу синтетическими данными через bulk_create. Имена получают общий
+    случайный префикс, поэтому повторный запуск не конфликтует с уникальными полями.
+    Пароли не хэшируются: всем пользователям ставится один непригодный пароль.
+    Возвращает счётчики созданного и id новых компетенций для refresh_derived().
+    """
+    rng = random.Random(random_seed)
+    prefix = uuid.uuid4().hex[:8]
+
+    profession_objs = Profession.objects.bulk_create(
+        [Profession(name='%s-profession-%d' % (prefix, i)) for i in range(professions)], batch_size=batch_size
+    )
+    competence_objs = Competence.objects.bulk_create([
+        Competence(name='%s-competence-%d' % (prefix, i), description='Описание компетенции %d' % i,
+                   difficulty=rng.choice(DIFFICULTIES), is_active=rng.random() < 0.8)
+        for i in range(competences)
+    ], batch_size=batch_size)
+    Material.objects.bulk_create([
+        Material(competence=competence, material_type=rng.choice(MATERIAL_TYPES),
+                 title='Материал %d' % i, content='Текст материала %d' % i, link='https://example.com/%d' % i)
+        for competence in competence_objs for i in range(materials_per_competence)
+    ], batch_size=batch_size)
+
+    password = make_password(None)
+    user_objs = User.objects.bulk_create([
+        User(email='%s-user-%d@example.com' % (prefix, i), username='user-%d' % i, password=password,
+             profession=rng.choice(profession_objs) if profession_objs else None)
+        for i in range(users)
+    ], batch_size=batch_size)
+
+    marks, reviews = [], []
+    for user in user_objs:
+        for competence in rng.sample(competence_objs, min(marks_per_user, len(competence_objs))):
+            marks.append(MarkedCompetence(user=user, competence=competence))
+        for competence in rng.sample(competence_objs, min(reviews_per_user, len(competence_objs))):
+            reviews.append(Review(user=user, competence=competence, rating=rng.randint(1, 5), comment='Отзыв'))
+    MarkedCompetence.objects.bulk_create(marks, batch_size=batch_size)
+    Review.objects.bulk_create(reviews, batch_size=batch_size)
+
+    counts = {
+        'professions': len(profession_objs),
+        'competences': len(competence_objs),
+        'materials': len(competence_objs) * materials_per_competence,
+        'users': len(user_objs),
+        'marked_competences': len(marks),
+        'reviews': len(reviews),
+    }
+    return counts, [competence.pk for competence in competence_objs]
+
+
+def refresh_derived(competence_ids, batch_size=1000):
+    """
+    Пересчитывает то, что bulk_create обходит мимо сигналов: агрегаты рейтинга, поисковый индекс,
+    матрицу совместных отметок для рекомендаций и журнал изменений каталога. В журнал попадают
+    только компетенции competence_ids (только что созданные seed()) и их материалы.
+    """
+    with transaction.atomic():
+        rebuild_ratings(batch_size=batch_size)
+        recommendations.rebuild(CompetenceCooccurrence, MarkedCompetence, batch_size=batch_size)
+        changes.snapshot(competence_ids, batch_size=batch_size)
+    search.rebuild()
+    catalogue_cache.bump_version()
+    recommendations.bump_version()
@@ -1,5 +1,102 @@
+import os
+import re
+
 from rest_framework import serializers
-from .models import User, MarkedCompetence, Competence, Material
+from django.core.exceptions import SuspiciousFileOperation
+from django.db.models import Prefetch
+from django.utils.text import get_valid_filename
+
+from .bulk import BulkListSerializer
+from .models import User, MarkedCompetence, Competence, Material, MaterialUpload, DIFFICULTIES, normalize_difficulty
+from .ratings import RATING_FIELDS
+
+
+def parse_fields(value):
+    """'id,materials.title' -> {'id': None, 'materials': {'title': None}}; None — параметр не передан."""
+    if value is None:
+        return None
+    tree = {}
+    for path in value.split(','):
+        parts = [part.strip() for part in path.split('.')]
+        if not all(parts):
+            continue
+        node = tree
+        for part in parts[:-1]:
+            if node.get(part) is None:
+                node[part] = {}
+            node = node[part]
+        node.setdefault(parts[-1], None)
+    return tree
+
+
+def subtree(tree, name):
+    return None if tree is None else tree.get(name)
+
+
+def sparse_params(request):
+    return {'fields': parse_fields(request.GET.get('fields')), 'expand': parse_fields(request.GET.get('expand'))}
+
+
+class SparseFieldsMixin:
+    """
+    ?fields=id,name,materials.title оставляет только перечисленные поля (вложенные — через точку),
+    ?expand=materials задаёт, какие связи встраивать: остальные из collapsed_fields отдаются списком id.
+    Без параметров выдача не меняется. Те же параметры сужают queryset через only() в narrow().
+    """
+    # связь -> фабрика поля со списком id вместо вложенных объектов
+    collapsed_fields = {}
+    # поле сериализатора -> колонки модели, если они не совпадают с его именем
+    field_columns = {}
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        self.selected_fields = fields
+        self.expand = expand
+        super().__init__(*args, **kwargs)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.selected_fields is not None:
+            fields = {name: field for name, field in fields.items() if name in self.selected_fields}
+        if self.expand is not None:
+            for name, factory in self.collapsed_fields.items():
+                if name in fields and name not in self.expand:
+                    fields[name] = factory()
+        for name, field in fields.items():
+            nested = getattr(field, 'child', field)
+            if isinstance(nested, SparseFieldsMixin):
+                nested.selected_fields = subtree(self.selected_fields, name)
+                nested.expand = subtree(self.expand, name)
+        return fields
+
+    @classmethod
+    def columns(cls, fields, *required):
+        """Колонки модели под выбранные поля для only(); None — нужны все."""
+        if fields is None:
+            return None
+        opts = cls.Meta.model._meta
+        concrete = {field.name for field in opts.concrete_fields}
+        columns = {opts.pk.name, *required}
+        for name in fields:
+            if name in cls.field_columns:
+                columns.update(cls.field_columns[name])
+            elif name in concrete:
+                columns.add(name)
+        return sorted(columns)
+
+    @classmethod
+    def narrow(cls, queryset, fields, *required):
+        columns = cls.columns(fields, *required)
+        return queryset if columns is None else queryset.only(*columns)
+
+
+class DifficultyField(serializers.ChoiceField):
+    """Сложность из DIFFICULTIES; на входе принимаются и прежние написания ('Лёгкий', 'Advanced'...)."""
+
+    def __init__(self, **kwargs):
+        super().__init__(DIFFICULTIES, **kwargs)
+
+    def to_internal_value(self, data):
+        return super().to_internal_value(normalize_difficulty(data))
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -13,42 +110,183 @@ class UserSerializer(serializers.ModelSerializer):
         return user
 
 
-class UsersSerializer(serializers.ModelSerializer):
+class CompetenceShortSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Competence
+        fields = ('id', 'name', 'difficulty', 'is_active')
+
+
+class UsersSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     competence = serializers.SerializerMethodField()
+    collapsed_fields = {'competence': lambda: serializers.SerializerMethodField('get_competence_ids')}
+    field_columns = {'competence': ()}
 
     class Meta:
         model = User
         fields = ['id', 'is_active', 'is_staff', 'is_superuser', 'email', 'profession', 'username', 'competence']
 
-    def get_competence(self, user):
-        materials = MarkedCompetence.objects.filter(user=user)
-        return MaterialSerializer(materials, many=True).data
-
+    @classmethod
+    def setup_eager_loading(cls, queryset, fields=None, expand=None):
+        queryset = cls.narrow(queryset, fields)
+        if fields is not None and 'competence' not in fields:
+            return queryset
+        if expand is not None and 'competence' not in expand:
+            marked = MarkedCompetence.objects.only('user', 'competence')
+        else:
+            marked = MarkedCompetence.objects.select_related('competence')
+            columns = CompetenceShortSerializer.columns(subtree(fields, 'competence'))
+            if columns is not None:
+                marked = marked.only('user', 'competence', *('competence__%s' % column for column in columns))
+        return queryset.prefetch_related(Prefetch('markedcompetence_set', queryset=marked))
 
+    def get_competence(self, user):
+        # .all() читает из prefetch_related, если он был сделан
+        competences = [marked.competence for marked in user.markedcompetence_set.all()]
+        return CompetenceShortSerializer(competences, many=True,
+                                         fields=subtree(self.selected_fields, 'competence')).data
 
+    def get_competence_ids(self, user):
+        return [marked.competence_id for marked in user.markedcompetence_set.all()]
 
 
-class MarkedCompetenceSerializer(serializers.ModelSerializer):
+class MarkedCompetenceSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = MarkedCompetence
         fields = ['user', 'competence']
 
 
-class MaterialSerializer(serializers.ModelSerializer):
+class MaterialSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     file = serializers.FileField(required=False)
 
     class Meta:
         model = Material
-        fields = ('id', 'material_type', 'title', 'link', 'content', 'file')
+        fields = ('id', 'material_type', 'title', 'link', 'content', 'file', 'file_size', 'duration', 'processed_at')
+        read_only_fields = ('file_size', 'duration', 'processed_at')
+
 
+class MaterialUploadSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = MaterialUpload
+        fields = ('id', 'filename', 'size', 'offset', 'checksum')
+        read_only_fields = ('id', 'offset')
 
-class CompetenceSerializer(serializers.ModelSerializer):
-    materials = serializers.SerializerMethodField()
+    def validate_filename(self, value):
+        # имя из клиента попадёт в хранилище только в конце загрузки — проверяется сразу
+        try:
+            return get_valid_filename(os.path.basename(value.replace('\\', '/')))
+        except SuspiciousFileOperation:
+            raise serializers.ValidationError('Недопустимое имя файла.')
+
+    def validate_checksum(self, value):
+        if value and not re.fullmatch(r'[0-9a-fA-F]{64}', value):
+            raise serializers.ValidationError('Ожидается sha256 в hex.')
+        return value.lower()
+
+
+class CompetenceSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    difficulty = DifficultyField()
+    materials = MaterialSerializer(source='material_set', many=True, read_only=True)
+    rating = serializers.SerializerMethodField()
+    collapsed_fields = {
+        'materials': lambda: serializers.PrimaryKeyRelatedField(source='material_set', many=True, read_only=True)
+    }
+    field_columns = {'materials': (), 'rating': RATING_FIELDS}
 
     class Meta:
         model = Competence
-        fields = ('id', 'name', 'description', 'difficulty', 'is_active', 'materials',)
+        fields = ('id', 'name', 'description', 'difficulty', 'is_active', 'materials', 'rating',)
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, fields=None, expand=None, material_types=None):
+        queryset = cls.narrow(queryset, fields)
+        if fields is not None and 'materials' not in fields:
+            return queryset
+        if expand is not None and 'materials' not in expand:
+            materials = Material.objects.only('id', 'competence')
+        else:
+            materials = MaterialSerializer.narrow(Material.objects.all(), subtree(fields, 'materials'), 'competence')
+        if material_types:
+            materials = materials.filter(material_type__in=material_types)
+        return queryset.prefetch_related(Prefetch('material_set', queryset=materials))
+
+    def get_rating(self, competence):
+        return {
+            'count': competence.rating_count,
+            'average': competence.rating_average,
+            'histogram': competence.rating_histogram,
+        }
+
+
+class CompetenceBulkListSerializer(BulkListSerializer):
+    def validate_batch(self, items, errors):
+        super().validate_batch(items, errors)
+        # уникальность имён: одна выборка на всю пачку вместо UniqueValidator на каждый элемент
+        names = [item['name'] for item in items if item]
+        taken = dict(Competence.objects.filter(name__in=names).values_list('name', 'id'))
+        seen = set()
+        for index, item in enumerate(items):
+            if not item:
+                continue
+            if item['name'] in seen or taken.get(item['name'], item.get('id')) != item.get('id'):
+                errors[index].setdefault('name', []).append('Компетенция с таким name уже существует.')
+            seen.add(item['name'])
+
+
+class CompetenceBulkSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(required=False)
+    difficulty = DifficultyField()
+
+    class Meta:
+        model = Competence
+        fields = ('id', 'name', 'description', 'difficulty', 'is_active')
+        extra_kwargs = {'name': {'validators': []}}
+        list_serializer_class = CompetenceBulkListSerializer
+
 
-    def get_materials(self, competence):
-        materials = Material.objects.filter(competence=competence)
-        return MaterialSerializer(materials, many=True).data
+class MaterialBulkListSerializer(BulkListSerializer):
+    def get_queryset(self):
+        return Material.objects.filter(competence=self.context['competence'])
+
+    def build_instance(self, item):
+        return Material(competence=self.context['competence'], **item)
+
+
+class MaterialBulkSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(required=False)
+
+    class Meta:
+        model = Material
+        fields = ('id', 'material_type', 'title', 'link', 'content')
+        list_serializer_class = MaterialBulkListSerializer
+
+
+class MarkedCompetenceBulkListSerializer(BulkListSerializer):
+    def validate_batch(self, items, errors):
+        # существование пользователей и компетенций и повторные отметки — по запросу на таблицу
+        user_ids = {item['user_id'] for item in items if item}
+        competence_ids = {item['competence_id'] for item in items if item}
+        users = set(User.objects.filter(pk__in=user_ids).values_list('pk', flat=True))
+        competences = set(Competence.objects.filter(pk__in=competence_ids).values_list('pk', flat=True))
+        marked = set(MarkedCompetence.objects.filter(
+            user_id__in=user_ids, competence_id__in=competence_ids
+        ).values_list('user_id', 'competence_id'))
+        for index, item in enumerate(items):
+            if not item:
+                continue
+            if item['user_id'] not in users:
+                errors[index].setdefault('user', []).append('Пользователь не найден.')
+            if item['competence_id'] not in competences:
+                errors[index].setdefault('competence', []).append('Компетенция не найдена.')
+            pair = (item['user_id'], item['competence_id'])
+            if pair in marked:
+                errors[index].setdefault('non_field_errors', []).append('Компетенция уже отмечена.')
+            marked.add(pair)
+
+
+class MarkedCompetenceBulkSerializer(serializers.Serializer):
+    user = serializers.IntegerField(source='user_id')
+    competence = serializers.IntegerField(source='competence_id')
+
+    class Meta:
+        model = MarkedCompetence
+        list_serializer_class = MarkedCompetenceBulkListSerializer
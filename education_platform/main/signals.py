@@ -0,0 +1,103 @@
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from . import catalogue_cache, changes, recommendations, search
+from .authentication import invalidate_principal
+from .models import User, Competence, Material, MarkedCompetence, Review, CatalogueChange, RATINGS
+
+
+@receiver(pre_save, sender=Review)
+def remember_previous_rating(sender, instance, raw=False, **kwargs):
+    instance._previous_rating = None
+    if instance.pk and not raw:
+        instance._previous_rating = Review.objects.filter(pk=instance.pk).values_list(
+            'competence_id', 'rating').first()
+
+
+@receiver(post_save, sender=Review)
+def add_rating(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    current = (instance.competence_id, instance.rating)
+    previous = getattr(instance, '_previous_rating', None)
+    if previous == current:
+        return
+    # оценка вне RATINGS не попадает в агрегаты (rating_6_count нет); в базу её не пустит review_rating_range
+    if previous is not None and previous[1] in RATINGS:
+        Competence.apply_rating(*previous, sign=-1)
+        changes.record(CatalogueChange.COMPETENCE, CatalogueChange.UPDATE, [(previous[0], previous[0])])
+    if current[1] in RATINGS:
+        Competence.apply_rating(*current, sign=1)
+        changes.record(CatalogueChange.COMPETENCE, CatalogueChange.UPDATE, [(current[0], current[0])])
+    catalogue_cache.bump_version()
+
+
+@receiver(post_delete, sender=Review)
+def remove_rating(sender, instance, **kwargs):
+    if instance.rating not in RATINGS:
+        return
+    Competence.apply_rating(instance.competence_id, instance.rating, sign=-1)
+    changes.record(CatalogueChange.COMPETENCE, CatalogueChange.UPDATE,
+                   [(instance.competence_id, instance.competence_id)])
+    catalogue_cache.bump_version()
+
+
+@receiver(post_save, sender=Competence)
+def index_competence(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_competences([instance.pk])
+
+
+@receiver(post_save, sender=Material)
+def index_material(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_materials([instance.pk])
+
+
+@receiver(post_delete, sender=Material)
+def unindex_material(sender, instance, **kwargs):
+    search.unindex_material(instance.pk)
+
+
+@receiver(post_save, sender=Competence)
+def record_competence_change(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        changes.record_competences([instance], CatalogueChange.CREATE if created else CatalogueChange.UPDATE)
+
+
+@receiver(post_save, sender=Material)
+def record_material_change(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        changes.record_materials([instance], CatalogueChange.CREATE if created else CatalogueChange.UPDATE)
+
+
+@receiver(post_delete, sender=Competence)
+def record_competence_delete(sender, instance, **kwargs):
+    changes.record_competences([instance], CatalogueChange.DELETE)
+
+
+@receiver(post_delete, sender=Material)
+def record_material_delete(sender, instance, **kwargs):
+    changes.record_materials([instance], CatalogueChange.DELETE)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def drop_cached_principal(sender, instance, **kwargs):
+    invalidate_principal(instance.pk)
+
+
+@receiver(post_save, sender=MarkedCompetence)
+def add_cooccurrence(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        recommendations.record_marks([(instance.user_id, instance.competence_id)])
+
+
+@receiver(pre_delete, sender=MarkedCompetence)
+def remove_cooccurrence(sender, instance, **kwargs):
+    recommendations.begin_unmark(instance.user_id, instance.competence_id)
+
+
+@receiver(post_delete, sender=MarkedCompetence)
+def forget_removed_mark(sender, instance, **kwargs):
+    recommendations.end_unmark(instance.user_id, instance.competence_id)
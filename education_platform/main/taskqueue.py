@@ -0,0 +1,145 @@
+import logging
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction, close_old_connections, connection
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+# ключ advisory-блокировки PostgreSQL, под которой проверяется лимит concurrency задачи
+CLAIM_LOCK = 0x7461736b
+
+
+class TaskSpec:
+    def __init__(self, func, name, max_attempts, retry_delay, concurrency):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.concurrency = concurrency
+
+    def delay(self, **kwargs):
+        # строка очереди пишется в той же транзакции, что и запись, которая её породила
+        return Task.objects.create(name=self.name, payload=kwargs)
+
+    def __call__(self, **kwargs):
+        return self.func(**kwargs)
+
+
+def task(name=None, max_attempts=3, retry_delay=30, concurrency=None):
+    """
+    Регистрирует функцию как фоновую задачу: func.delay(**kwargs) ставит её в очередь.
+    concurrency — сколько экземпляров задачи может выполняться одновременно во всех воркерах,
+    retry_delay — начальная задержка повтора в секундах, дальше она удваивается.
+    """
+    def decorator(func):
+        spec = TaskSpec(func, name or '%s.%s' % (func.__module__, func.__name__),
+                        max_attempts, retry_delay, concurrency)
+        registry[spec.name] = spec
+        return spec
+    return decorator
+
+
+class Worker:
+    def __init__(self, concurrency=1, poll_interval=1.0):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.stopping = threading.Event()
+
+    def claim(self):
+        now = timezone.now()
+        lock_timeout = timedelta(seconds=getattr(settings, 'TASK_LOCK_TIMEOUT', 600))
+        with transaction.atomic():
+            # задачи упавших воркеров возвращаются в очередь
+            Task.objects.filter(status=Task.RUNNING, locked_at__lt=now - lock_timeout).update(status=Task.QUEUED)
+            running = dict(Task.objects.filter(status=Task.RUNNING).values('name').annotate(
+                count=Count('id')).values_list('name', 'count'))
+            saturated = {name for name, spec in registry.items()
+                         if spec.concurrency and running.get(name, 0) >= spec.concurrency}
+            while True:
+                task = Task.objects.select_for_update(skip_locked=True).filter(
+                    status=Task.QUEUED, run_after__lte=now
+                ).exclude(name__in=saturated).order_by('run_after', 'id').first()
+                if task is None:
+                    return None
+                spec = registry.get(task.name)
+                if spec is None or not spec.concurrency:
+                    break
+                # счётчик выше прочитан без блокировки, и два воркера могли увидеть один свободный слот:
+                # захваты задач одного имени сериализуются, число выполняющихся перечитывается под блокировкой
+                self.lock_name(task.name)
+                if Task.objects.filter(status=Task.RUNNING, name=task.name).count() < spec.concurrency:
+                    break
+                saturated.add(task.name)
+            task.status = Task.RUNNING
+            task.attempts += 1
+            task.locked_at = now
+            task.save(update_fields=['status', 'attempts', 'locked_at'])
+        return task
+
+    def lock_name(self, name):
+        # держится до конца транзакции захвата; в SQLite запись и так сериализована блокировкой базы
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_xact_lock(%s, hashtext(%s))', [CLAIM_LOCK, name])
+
+    def execute(self, task):
+        spec = registry.get(task.name)
+        try:
+            if spec is None:
+                raise LookupError('Задача %s не зарегистрирована' % task.name)
+            spec.func(**task.payload)
+        except Exception:
+            task.last_error = traceback.format_exc()
+            if spec is not None and task.attempts < spec.max_attempts:
+                task.status = Task.QUEUED
+                task.run_after = timezone.now() + timedelta(seconds=spec.retry_delay * 2 ** (task.attempts - 1))
+            else:
+                task.status = Task.FAILED
+                task.finished_at = timezone.now()
+            logger.warning('Задача %s #%s завершилась ошибкой (попытка %d)', task.name, task.pk, task.attempts)
+        else:
+            task.status = Task.DONE
+            task.finished_at = timezone.now()
+        task.locked_at = None
+        task.save(update_fields=['status', 'run_after', 'last_error', 'finished_at', 'locked_at'])
+
+    def run_pending(self):
+        """Выполняет все готовые задачи в текущем потоке и возвращает их число."""
+        processed = 0
+        while True:
+            task = self.claim()
+            if task is None:
+                return processed
+            self.execute(task)
+            processed += 1
+
+    def loop(self):
+        try:
+            while not self.stopping.is_set():
+                close_old_connections()
+                if not self.run_pending():
+                    self.stopping.wait(self.poll_interval)
+        finally:
+            connection.close()
+
+    def run(self):
+        threads = [threading.Thread(target=self.loop, name='task-worker-%d' % i, daemon=True)
+                   for i in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        try:
+            while any(thread.is_alive() for thread in threads):
+                time.sleep(self.poll_interval)
+        except KeyboardInterrupt:
+            self.stopping.set()
+            for thread in threads:
+                thread.join()
@@ -0,0 +1,95 @@
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.html import strip_tags
+
+from . import catalogue_cache, changes, search
+from .models import Material, CatalogueChange
+from .taskqueue import task
+from .uploads import stream_checksum, STREAM_BLOCK_SIZE
+
+PROCESSED_TYPES = ('video', 'audio', 'text')
+TEXT_EXTENSIONS = {'.txt', '.md', '.csv', '.json', '.xml', '.html', '.htm'}
+EXTRACTED_TEXT_LIMIT = 1024 * 1024
+
+
+def probe_duration(path):
+    # длительность через ffprobe, если он установлен; иначе не определяется
+    ffprobe = shutil.which('ffprobe')
+    if ffprobe is None:
+        return None
+    result = subprocess.run(
+        [ffprobe, '-v', 'error', '-show_entries', 'format=duration', '-of', 'json', path],
+        capture_output=True, timeout=60, check=False,
+    )
+    try:
+        return float(json.loads(result.stdout)['format']['duration'])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def extract_text(name, file):
+    extension = os.path.splitext(name)[1].lower()
+    if extension not in TEXT_EXTENSIONS:
+        return ''
+    text = file.read(EXTRACTED_TEXT_LIMIT).decode('utf-8', errors='replace')
+    return strip_tags(text) if extension in ('.html', '.htm') else text
+
+
+@contextmanager
+def local_path(field_file):
+    """Путь к файлу для внешних программ; хранилище без локальных путей (S3 и т. п.) копируется во временный файл."""
+    try:
+        path = field_file.storage.path(field_file.name)
+    except NotImplementedError:
+        path = None
+    if path is not None:
+        yield path
+        return
+    with tempfile.NamedTemporaryFile(suffix=os.path.splitext(field_file.name)[1]) as local, \
+            field_file.storage.open(field_file.name, 'rb') as file:
+        shutil.copyfileobj(file, local, STREAM_BLOCK_SIZE)
+        local.flush()
+        yield local.name
+
+
+@task(max_attempts=3, retry_delay=30, concurrency=4)
+def process_material(material_id):
+    """Контрольная сумма, размер, длительность и текст файла материала."""
+    material = Material.objects.select_related('competence').filter(pk=material_id).first()
+    if material is None:
+        return
+    metadata = {'file_size': None, 'file_checksum': '', 'duration': None, 'extracted_text': ''}
+    if material.file:
+        # только через API хранилища: путь в файловой системе есть не у всех хранилищ
+        storage, name = material.file.storage, material.file.name
+        metadata['file_size'] = storage.size(name)
+        with storage.open(name, 'rb') as file:
+            metadata['file_checksum'] = stream_checksum(file)
+        if material.material_type in ('video', 'audio'):
+            with local_path(material.file) as path:
+                metadata['duration'] = probe_duration(path)
+        elif material.material_type == 'text':
+            with storage.open(name, 'rb') as file:
+                metadata['extracted_text'] = extract_text(name, file)
+    # update() вместо save(), чтобы не перезаписать поля, изменённые за время обработки;
+    # запись в журнал изменений — в той же транзакции
+    with transaction.atomic():
+        Material.objects.filter(pk=material_id).update(processed_at=timezone.now(), updated_at=timezone.now(),
+                                                       **metadata)
+        changes.record_materials([material], CatalogueChange.UPDATE)
+        material.competence.touch()
+    if metadata['extracted_text'] != material.extracted_text:
+        search.index_materials([material_id])
+    catalogue_cache.bump_version()
+
+
+def schedule_processing(material):
+    if material.material_type in PROCESSED_TYPES:
+        process_material.delay(material_id=material.pk)
@@ -0,0 +1,119 @@
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+DURATIONS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """'600/min' -> (600, 60); None — без ограничения."""
+    if rate is None:
+        return None, None
+    count, period = rate.split('/')
+    return int(count), DURATIONS[period[0]]
+
+
+def get_cache():
+    return caches[settings.THROTTLE_CACHE_ALIAS]
+
+
+class SlidingWindow:
+    """
+    Скользящее окно из двух счётчиков фиксированных окон: текущего и предыдущего с весом
+    оставшейся доли окна. Счётчики меняются только через cache.incr, который атомарен
+    в Redis и memcached (и под блокировкой в LocMemCache — локальной замене для разработки),
+    поэтому все воркеры делят один лимит без гонок.
+    """
+
+    def __init__(self, cache, limit, window):
+        self.cache = cache
+        self.limit = limit
+        self.window = window
+
+    def _incr(self, key, delta):
+        self.cache.add(key, 0, timeout=self.window * 2)
+        try:
+            return self.cache.incr(key, delta)
+        except ValueError:
+            # ключ вытеснили между add и incr
+            self.cache.set(key, delta, timeout=self.window * 2)
+            return delta
+
+    def hit(self, key, cost=1, now=None):
+        """Возвращает (разрешено, через сколько секунд повторить)."""
+        now = time.time() if now is None else now
+        index, elapsed = divmod(now, self.window)
+        current_key = '%s:%d' % (key, index)
+        current = self._incr(current_key, cost)
+        previous = self.cache.get('%s:%d' % (key, index - 1), 0)
+        if previous * (self.window - elapsed) / self.window + current <= self.limit:
+            return True, 0
+        # отказ не должен расходовать лимит
+        current = self._incr(current_key, -cost)
+        return False, self.retry_after(previous, current, elapsed, cost)
+
+    def retry_after(self, previous, current, elapsed, cost):
+        if cost > self.limit:
+            return self.window
+        room = self.limit - cost - current
+        if room >= 0 and previous:
+            # хватит, когда вес предыдущего окна уменьшится до room
+            return max(self.window * (1 - room / previous) - elapsed, 0)
+        # ждать следующего окна, в котором текущее станет предыдущим
+        wait = self.window - elapsed
+        if current:
+            wait += max(self.window * (1 - (self.limit - cost) / current), 0)
+        return wait
+
+
+class RouteRateThrottle(BaseThrottle):
+    """
+    Лимит на пару (клиент, маршрут): клиент — id пользователя или IP для анонимных запросов,
+    маршрут — шаблон из urls.py. Ставки берутся из DEFAULT_THROTTLE_RATES по scope 'user' / 'anon'.
+    Тяжёлые представления расходуют больше одного запроса: атрибут throttle_cost у view.
+    """
+    user_scope = 'user'
+    anon_scope = 'anon'
+
+    def get_scope(self, request):
+        return self.user_scope if request.user and request.user.is_authenticated else self.anon_scope
+
+    def get_client(self, request):
+        if request.user and request.user.is_authenticated:
+            return 'user:%s' % request.user.pk
+        return 'ip:%s' % self.get_ident(request)
+
+    def get_route(self, request):
+        match = getattr(request, 'resolver_match', None)
+        return match.route if match is not None else request.path
+
+    def allow_request(self, request, view):
+        self.wait_seconds = None
+        if not settings.THROTTLE_ENABLED:
+            return True
+        scope = self.get_scope(request)
+        limit, window = parse_rate(api_settings.DEFAULT_THROTTLE_RATES.get(scope))
+        if limit is None:
+            return True
+        key = 'throttle:%s:%s:%s' % (scope, self.get_client(request), self.get_route(request))
+        allowed, wait = SlidingWindow(get_cache(), limit, window).hit(key, getattr(view, 'throttle_cost', 1))
+        if not allowed:
+            self.wait_seconds = wait
+        return allowed
+
+    def wait(self):
+        return None if self.wait_seconds is None else math.ceil(self.wait_seconds)
+
+
+class RegistrationThrottle(RouteRateThrottle):
+    """Регистрация: всегда по IP, со своей, более строгой ставкой 'register'."""
+
+    def get_scope(self, request):
+        return 'register'
+
+    def get_client(self, request):
+        return 'ip:%s' % self.get_ident(request)
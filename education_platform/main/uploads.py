@@ -0,0 +1,177 @@
+import hashlib
+import os
+import re
+import shutil
+import uuid
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+
+STREAM_BLOCK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class UploadError(Exception):
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+class PartFile(File):
+    # FileSystemStorage переносит файл с temporary_file_path() через rename, без копирования
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def receive_chunk(upload, stream, offset, length, checksum=None):
+    """
+    Читает тело запроса блоками по 64 КБ во временный файл рядом с .part-файлом, не блокируя сессию.
+    checksum — необязательный sha256 (hex) этой части. Возвращает путь к временному файлу.
+    """
+    if offset != upload.offset:
+        raise UploadError('Ожидался Upload-Offset %d' % upload.offset, 409)
+    if length > settings.MATERIAL_UPLOAD_MAX_CHUNK:
+        raise UploadError('Часть больше %d байт' % settings.MATERIAL_UPLOAD_MAX_CHUNK, 413)
+    if offset + length > upload.size:
+        raise UploadError('Часть выходит за объявленный размер файла', 400)
+
+    os.makedirs(os.path.dirname(upload.part_path), exist_ok=True)
+    path = '%s.%s' % (upload.part_path, uuid.uuid4().hex)
+    digest = hashlib.sha256()
+    with open(path, 'wb') as chunk:
+        remaining = length
+        while remaining:
+            block = stream.read(min(STREAM_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            digest.update(block)
+            chunk.write(block)
+            remaining -= len(block)
+    if remaining or (checksum and digest.hexdigest() != checksum.lower()):
+        os.remove(path)
+        if remaining:
+            raise UploadError('Тело запроса короче Content-Length', 400)
+        raise UploadError('Контрольная сумма части не совпала', 460)
+    return path
+
+
+def append_chunk(upload, chunk_path, offset, length):
+    """
+    Дописывает принятую часть в .part-файл с позиции offset и сдвигает offset.
+    Вызывается под select_for_update сессии: смещение сверяется ещё раз, параллельная часть могла успеть раньше.
+    """
+    if offset != upload.offset:
+        raise UploadError('Ожидался Upload-Offset %d' % upload.offset, 409)
+    mode = 'r+b' if os.path.exists(upload.part_path) else 'wb'
+    with open(upload.part_path, mode) as part, open(chunk_path, 'rb') as chunk:
+        # хвост от оборванной ранее части отбрасывается
+        part.truncate(offset)
+        part.seek(offset)
+        shutil.copyfileobj(chunk, part, STREAM_BLOCK_SIZE)
+    upload.offset = offset + length
+    upload.save(update_fields=['offset'])
+    return upload.offset
+
+
+def stream_checksum(file):
+    digest = hashlib.sha256()
+    for block in iter(lambda: file.read(STREAM_BLOCK_SIZE), b''):
+        digest.update(block)
+    return digest.hexdigest()
+
+
+def file_checksum(path):
+    with open(path, 'rb') as file:
+        return stream_checksum(file)
+
+
+def complete_upload(upload, on_stored=None):
+    """
+    Сверяет sha256 всего файла. В хранилище поля Material.file файл переносится после коммита:
+    при откате .part-файл и сессия остаются, и загрузку можно завершить повторно.
+    on_stored(material) вызывается в той же транзакции, что и сохранение материала с новым файлом.
+    """
+    if upload.checksum and file_checksum(upload.part_path) != upload.checksum.lower():
+        os.remove(upload.part_path)
+        upload.delete()
+        raise UploadError('Контрольная сумма файла не совпала, загрузку нужно начать заново', 460)
+    transaction.on_commit(lambda: store_upload(upload, on_stored))
+    return upload.material
+
+
+def store_upload(upload, on_stored=None):
+    material = upload.material
+    # старый файл удаляется только после того, как новый сохранён и запись закоммичена
+    old_name, storage = material.file.name, material.file.storage
+    with transaction.atomic():
+        with open(upload.part_path, 'rb') as part:
+            material.file.save(upload.filename, PartFile(part, name=upload.filename), save=False)
+        # сессия уже не заблокирована: остальные поля материала мог изменить параллельный PUT
+        material.save(update_fields=['file', 'updated_at'])
+        upload.delete()
+        if on_stored is not None:
+            on_stored(material)
+    if old_name and old_name != material.file.name:
+        storage.delete(old_name)
+    return material
+
+
+def parse_range(header, size):
+    """Один диапазон bytes=start-end -> (start, end) включительно; None — отдать файл целиком."""
+    match = RANGE_RE.match(header or '')
+    if not match or size == 0:
+        return None
+    start, end = match.groups()
+    if start:
+        start, end = int(start), min(int(end), size - 1) if end else size - 1
+    elif end:
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        return None
+    if start > end:
+        raise UploadError('Диапазон вне файла', 416)
+    return start, end
+
+
+def iter_range(file, start, length):
+    with file:
+        file.seek(start)
+        while length > 0:
+            block = file.read(min(STREAM_BLOCK_SIZE, length))
+            if not block:
+                break
+            length -= len(block)
+            yield block
+
+
+def file_response(request, field_file):
+    """
+    Отдаёт файл потоком с поддержкой Range. При MATERIAL_DOWNLOAD_OFFLOAD отдачу берёт
+    на себя веб-сервер: 'x-accel' (nginx X-Accel-Redirect) или 'x-sendfile' (Apache, lighttpd).
+    """
+    filename = os.path.basename(field_file.name)
+    offload = getattr(settings, 'MATERIAL_DOWNLOAD_OFFLOAD', None)
+    if offload == 'x-accel':
+        response = HttpResponse()
+        response['X-Accel-Redirect'] = settings.MATERIAL_ACCEL_REDIRECT_PREFIX + field_file.name
+    elif offload == 'x-sendfile':
+        response = HttpResponse()
+        response['X-Sendfile'] = field_file.path
+    else:
+        size = field_file.size
+        byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+        if byte_range is None:
+            response = FileResponse(field_file.open('rb'), as_attachment=True, filename=filename)
+        else:
+            start, end = byte_range
+            response = StreamingHttpResponse(iter_range(field_file.open('rb'), start, end - start + 1),
+                                             status=206, content_type='application/octet-stream')
+            response['Content-Length'] = str(end - start + 1)
+            response['Content-Range'] = 'bytes %d-%d/%d' % (start, end, size)
+            response['Content-Disposition'] = 'attachment; filename="%s"' % filename
+        response['Accept-Ranges'] = 'bytes'
+    if 'Content-Disposition' not in response:
+        response['Content-Disposition'] = 'attachment; filename="%s"' % filename
+    return response
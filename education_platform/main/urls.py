@@ -1,17 +1,44 @@
 from django.urls import path
 
+from .async_views import AsyncUserList, AsyncUserDetail, AsyncCompetenceAll, AsyncCompetenceDetail, \
+    AsyncMaterialDetail, CatalogueChangeStream
 from .views import UserRegistrationView, UserList, UserDetail, MarkedCompetenceAll, CompetenceAll, \
-    CompetenceDetail, CompetenceCreate, CompetenceMaterialView
+    CompetenceDetail, CompetenceCreate, CompetenceMaterialView, MaterialDetailView, UserExport, \
+    MarkedCompetenceExport, CompetenceExport, CatalogueCacheStats, CompetenceBulk, MaterialBulk, MarkedCompetenceBulk, \
+    MaterialUploadStart, MaterialUploadChunk, MaterialDownload, CatalogueSearch, MetricsView, \
+    UserRecommendations, CatalogueChanges
 
 urlpatterns = [
     path('register/', UserRegistrationView.as_view(), name='user-registration'),
     path('users/', UserList.as_view()),
     path('users/int:<pk>/', UserDetail.as_view()),
+    path('users/int:<pk>/recommendations/', UserRecommendations.as_view()),
     path('users/competence/', MarkedCompetenceAll.as_view()),
+    path('users/competence/bulk/', MarkedCompetenceBulk.as_view()),
+    path('users/export/', UserExport.as_view()),
+    path('users/competence/export/', MarkedCompetenceExport.as_view()),
     path('competence/', CompetenceAll.as_view()),
+    path('competence/export/', CompetenceExport.as_view()),
+    path('competence/cache/', CatalogueCacheStats.as_view()),
+    path('competence/bulk/', CompetenceBulk.as_view()),
+    path('search/', CatalogueSearch.as_view()),
+    path('changes/', CatalogueChanges.as_view()),
+    path('changes/stream/', CatalogueChangeStream.as_view()),
+    path('metrics/', MetricsView.as_view()),
     path('competence/<str:name>', CompetenceDetail.as_view()),
     path('competence/create/', CompetenceCreate.as_view()),
     path('competence/<str:competence_name>/add_material/', CompetenceMaterialView.as_view(),
          name='add-material-to-competence'),
-    path('competence/<str:competence_name>/materials/<int:material_id>/', CompetenceMaterialView.as_view()),
-]
\ No newline at end of file
+    path('competence/<str:competence_name>/materials/bulk/', MaterialBulk.as_view()),
+    path('competence/<str:competence_name>/materials/<int:material_id>/upload/', MaterialUploadStart.as_view()),
+    path('competence/<str:competence_name>/materials/<int:material_id>/download/', MaterialDownload.as_view()),
+    path('uploads/<uuid:upload_id>/', MaterialUploadChunk.as_view()),
+    path('competence/<str:competence_name>/materials/<int:material_id>/', MaterialDetailView.as_view()),
+
+    # async read-эндпоинты для ASGI
+    path('async/users/', AsyncUserList.as_view()),
+    path('async/users/<int:pk>/', AsyncUserDetail.as_view()),
+    path('async/competence/', AsyncCompetenceAll.as_view()),
+    path('async/competence/<str:name>', AsyncCompetenceDetail.as_view()),
+    path('async/competence/<str:competence_name>/materials/<int:material_id>/', AsyncMaterialDetail.as_view()),
+]
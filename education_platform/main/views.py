@@ -1,5 +1,13 @@
-from django.http import Http404
+import os
 
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+
+from drf_spectacular.renderers import OpenApiYamlRenderer, OpenApiYamlRenderer2, OpenApiJsonRenderer, \
+    OpenApiJsonRenderer2
+from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema
 from rest_framework import generics, status, permissions
 
@@ -7,11 +15,20 @@ from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework_simplejwt.authentication import JWTAuthentication
 
-from .serialaize import UserSerializer, UsersSerializer, MarkedCompetenceSerializer, \
-    CompetenceSerializer, MaterialSerializer
-from .models import User, MarkedCompetence, Competence, Material
+from . import catalogue_cache, changes, facets, metrics, recommendations, schema, search
+from .authentication import CachedJWTAuthentication
+from .conditional import conditional, competence_list_revision, competence_revision, material_revision
+from .export import serialize_rows, stream_json_lines, stream_json_array
+from .pagination import KeysetPagination
+from .routers import ReplicaReadMixin
+from .throttling import RegistrationThrottle
+from .serialaize import sparse_params, UserSerializer, UsersSerializer, MarkedCompetenceSerializer, \
+    CompetenceShortSerializer, CompetenceSerializer, MaterialSerializer, CompetenceBulkSerializer, MaterialBulkSerializer, \
+    MarkedCompetenceBulkSerializer, MaterialUploadSerializer
+from .models import User, MarkedCompetence, Competence, Material, MaterialUpload, SearchDocument, CatalogueChange
+from .tasks import schedule_processing
+from .uploads import UploadError, append_chunk, complete_upload, file_response, receive_chunk
 
 
 @extend_schema(
@@ -22,28 +39,37 @@ class UserRegistrationView(generics.CreateAPIView):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [AllowAny]
+    throttle_classes = [RegistrationThrottle]
 
 
 ##### Для Администратора
-class MarkedCompetenceAll(APIView):
+class MarkedCompetenceAll(ReplicaReadMixin, APIView):
     serializer_class = MarkedCompetenceSerializer
+    throttle_cost = 5
     permission_classes = [permissions.IsAdminUser]
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (CachedJWTAuthentication,)
 
     @extend_schema(
         description="Получение компетенций пользователя",
         summary="Компетенции пользователя"
     )
     def get(self, request, format=None):
-        competence = MarkedCompetence.objects.all()
-        serializer = MarkedCompetenceSerializer(competence, many=True)
+        params = sparse_params(request)
+        competence = MarkedCompetenceSerializer.narrow(MarkedCompetence.objects.order_by('pk'), params['fields'])
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(competence, request, view=self)
+        if page is not None:
+            serializer = MarkedCompetenceSerializer(page, many=True, **params)
+            return paginator.get_paginated_response(serializer.data)
+        serializer = MarkedCompetenceSerializer(competence, many=True, **params)
         return Response(serializer.data)
 
 
-class UserList(APIView):
+class UserList(ReplicaReadMixin, APIView):
     serializer_class = UsersSerializer
+    throttle_cost = 5
     permission_classes = [permissions.IsAdminUser]
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (CachedJWTAuthentication,)
     requires_authentication = True
     required_headers = {
         'Authorization': 'Bearer <токен>',
@@ -55,8 +81,14 @@ class UserList(APIView):
         summary="Все пользователи"
     )
     def get(self, request, format=None):
-        users = User.objects.all()
-        serializer = UsersSerializer(users, many=True)
+        params = sparse_params(request)
+        users = UsersSerializer.setup_eager_loading(User.objects.order_by('pk'), **params)
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(users, request, view=self)
+        if page is not None:
+            serializer = UsersSerializer(page, many=True, **params)
+            return paginator.get_paginated_response(serializer.data)
+        serializer = UsersSerializer(users, many=True, **params)
         return Response(serializer.data)
 
 
@@ -65,9 +97,9 @@ class UserDetail(APIView):
 
     # permission_classes = [permissions.IsAdminUser]
 
-    def get_object(self, pk):
+    def get_object(self, pk, fields=None, expand=None):
         try:
-            return User.objects.get(pk=pk)
+            return UsersSerializer.setup_eager_loading(User.objects.all(), fields, expand).get(pk=pk)
         except:
             raise Http404
 
@@ -76,8 +108,9 @@ class UserDetail(APIView):
         summary="пользователь"
     )
     def get(self, request, pk, format=None):
-        user = self.get_object(pk)
-        serializer = UsersSerializer(user)
+        params = sparse_params(request)
+        user = self.get_object(pk, **params)
+        serializer = UsersSerializer(user, **params)
         return Response(serializer.data)
 
     @extend_schema(
@@ -94,26 +127,55 @@ class UserDetail(APIView):
 
 
 @extend_schema(
-    description="получение всех компетенций",
+    description="получение всех компетенций; фильтры ?difficulty=easy,hard, ?is_active=true|false, "
+                "?material_type=video (компетенции с такими материалами, в materials — только они) "
+                "и счётчики по значениям ?facets=difficulty,is_active,material_type",
     summary="Компетенции"
 )
-class CompetenceAll(generics.ListAPIView):
+class CompetenceAll(ReplicaReadMixin, generics.ListAPIView):
     permission_classes = [permissions.IsAdminUser]
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (CachedJWTAuthentication,)
     requires_authentication = True
     required_headers = {
         'Authorization': 'Bearer <токен>',
         'Content-Type': 'application/json'
     }
     serializer_class = CompetenceSerializer
+    pagination_class = KeysetPagination
+    throttle_cost = 5
+
+    def get_filters(self):
+        if not hasattr(self, '_filters'):
+            self._filters = facets.parse_filters(self.request.query_params)
+        return self._filters
 
     def get_queryset(self):
-        return Competence.objects.prefetch_related('material_set').all()
+        filters = self.get_filters()
+        queryset = CompetenceSerializer.setup_eager_loading(Competence.objects.order_by('pk'),
+                                                            **sparse_params(self.request),
+                                                            material_types=filters.get('material_type'))
+        return facets.filter_competences(queryset, filters)
+
+    def get_serializer(self, *args, **kwargs):
+        return super().get_serializer(*args, **kwargs, **sparse_params(self.request))
+
+    @conditional(competence_list_revision)
+    def list(self, request, *args, **kwargs):
+        filters = self.get_filters()
+        selected = facets.parse_facets(request.query_params)
+        data = catalogue_cache.get_or_build(
+            'list', (request.build_absolute_uri(), request.accepted_media_type),
+            lambda: super(CompetenceAll, self).list(request, *args, **kwargs).data
+        )
+        if selected is not None:
+            counts = facets.facet_counts(filters, selected)
+            data = {**data, 'facets': counts} if isinstance(data, dict) else {'results': data, 'facets': counts}
+        return Response(data)
 
 
 class CompetenceDetail(APIView):
     permission_classes = [permissions.IsAdminUser]
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (CachedJWTAuthentication,)
     requires_authentication = True
     required_headers = {
         'Authorization': 'Bearer <токен>',
@@ -123,9 +185,9 @@ class CompetenceDetail(APIView):
 
     # permission_classes = [permissions.IsAdminUser]
 
-    def get_object(self, name):
+    def get_object(self, name, fields=None, expand=None):
         try:
-            return Competence.objects.get(name=name)
+            return CompetenceSerializer.setup_eager_loading(Competence.objects.all(), fields, expand).get(name=name)
         except Competence.DoesNotExist:
             raise Http404
 
@@ -133,27 +195,35 @@ class CompetenceDetail(APIView):
         description="Получение одной компетенции",
         summary="компетенция"
     )
+    @conditional(competence_revision)
     def get(self, request, name, format=None):
-        competence = self.get_object(name)
-        serializer = CompetenceSerializer(competence)
-        return Response(serializer.data)
+        params = sparse_params(request)
+        data = catalogue_cache.get_or_build(
+            'competence', (name, request.META.get('QUERY_STRING', '')),
+            lambda: CompetenceSerializer(self.get_object(name, **params), **params).data
+        )
+        return Response(data)
 
     @extend_schema(
         description="Изменение одной компетенции",
         summary="компетенция"
     )
+    @conditional(competence_revision)
     def put(self, request, name, format=None):
         competence = self.get_object(name)
         serializer = CompetenceSerializer(competence, data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            # журнал изменений (сигналы) пишется в той же транзакции
+            with transaction.atomic():
+                serializer.save()
+            catalogue_cache.bump_version()
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 class CompetenceCreate(APIView):
     permission_classes = [permissions.IsAdminUser]
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (CachedJWTAuthentication,)
     requires_authentication = True
     required_headers = {
         'Authorization': 'Bearer <токен>',
@@ -168,14 +238,16 @@ class CompetenceCreate(APIView):
     def post(self, request, format=None):
         serializer = CompetenceSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            with transaction.atomic():
+                serializer.save()
+            catalogue_cache.bump_version()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 class CompetenceMaterialView(APIView):
     permission_classes = [permissions.IsAdminUser]
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (CachedJWTAuthentication,)
     requires_authentication = True
     required_headers = {
         'Authorization': 'Bearer <токен>',
@@ -196,14 +268,18 @@ class CompetenceMaterialView(APIView):
 
         serializer = MaterialSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save(competence=competence)
+            with transaction.atomic():
+                serializer.save(competence=competence)
+                competence.touch()
+                schedule_processing(serializer.instance)
+            catalogue_cache.bump_version()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 class MaterialDetailView(APIView):
     permission_classes = [permissions.IsAdminUser]
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (CachedJWTAuthentication,)
     requires_authentication = True
     required_headers = {
         'Authorization': 'Bearer <токен>',
@@ -215,20 +291,24 @@ class MaterialDetailView(APIView):
         description="Получение, обновление или удаление материала компетенции",
         summary="Материал"
     )
+    @conditional(material_revision)
     def get(self, request, competence_name, material_id, format=None):
+        params = sparse_params(request)
         try:
             competence = Competence.objects.get(name=competence_name)
-            material = Material.objects.get(id=material_id, competence=competence)
+            material = MaterialSerializer.narrow(Material.objects.all(), params['fields']).get(
+                id=material_id, competence=competence)
         except (Competence.DoesNotExist, Material.DoesNotExist):
             return Response({"error": "Competence or material not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        serializer = MaterialSerializer(material)
+        serializer = MaterialSerializer(material, **params)
         return Response(serializer.data)
 
     @extend_schema(
         description="Обновление материала компетенции",
         summary="Материал"
     )
+    @conditional(material_revision)
     def put(self, request, competence_name, material_id, format=None):
         try:
             competence = Competence.objects.get(name=competence_name)
@@ -238,7 +318,11 @@ class MaterialDetailView(APIView):
 
         serializer = MaterialSerializer(material, data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            with transaction.atomic():
+                serializer.save()
+                competence.touch()
+                schedule_processing(material)
+            catalogue_cache.bump_version()
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -253,7 +337,450 @@ class MaterialDetailView(APIView):
         except (Competence.DoesNotExist, Material.DoesNotExist):
             return Response({"error": "Competence or material not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        material.delete()
+        with transaction.atomic():
+            material.delete()
+            competence.touch()
+        catalogue_cache.bump_version()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class MaterialUploadStart(APIView):
+    permission_classes = [permissions.IsAdminUser]
+    authentication_classes = (CachedJWTAuthentication,)
+    requires_authentication = True
+    required_headers = {
+        'Authorization': 'Bearer <токен>',
+        'Content-Type': 'application/json'
+    }
+    serializer_class = MaterialUploadSerializer
+
+    @extend_schema(
+        description="Начало загрузки файла материала по частям: имя, размер и sha256 файла",
+        summary="Загрузка файла материала"
+    )
+    def post(self, request, competence_name, material_id, format=None):
+        try:
+            material = Material.objects.get(id=material_id, competence__name=competence_name)
+        except Material.DoesNotExist:
+            return Response({"error": "Competence or material not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        serializer = MaterialUploadSerializer(data=request.data)
+        if serializer.is_valid():
+            serializer.save(material=material)
+            return Response(serializer.data, status=status.HTTP_201_CREATED,
+                            headers={'Location': '/api/v1/admin/uploads/%s/' % serializer.instance.id})
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class MaterialUploadChunk(APIView):
+    permission_classes = [permissions.IsAdminUser]
+    authentication_classes = (CachedJWTAuthentication,)
+    requires_authentication = True
+    required_headers = {
+        'Authorization': 'Bearer <токен>',
+        'Upload-Offset': '<смещение части в байтах>',
+    }
+    serializer_class = MaterialUploadSerializer
+
+    def get_object(self, upload_id):
+        try:
+            return MaterialUpload.objects.select_related('material__competence').get(id=upload_id)
+        except MaterialUpload.DoesNotExist:
+            raise Http404
+
+    @extend_schema(
+        description="Текущее смещение загрузки, с которого её нужно продолжить",
+        summary="Загрузка файла материала"
+    )
+    def get(self, request, upload_id, format=None):
+        upload = self.get_object(upload_id)
+        return Response(MaterialUploadSerializer(upload).data, headers={'Upload-Offset': str(upload.offset)})
+
+    @extend_schema(
+        description="Очередная часть файла сырым телом запроса с заголовком Upload-Offset "
+                    "(и необязательным Upload-Checksum: sha256 <hex>)",
+        summary="Загрузка файла материала"
+    )
+    def put(self, request, upload_id, format=None):
+        try:
+            offset = int(request.headers['Upload-Offset'])
+            length = int(request.headers.get('Content-Length') or 0)
+        except (KeyError, ValueError):
+            return Response({"error": "Upload-Offset and Content-Length are required"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        checksum = request.headers.get('Upload-Checksum', '')
+        if checksum:
+            algorithm, _, checksum = checksum.partition(' ')
+            if algorithm.lower() != 'sha256':
+                return Response({"error": "Only sha256 chunk checksums are supported"},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+        # тело читается до блокировки сессии: под select_for_update только сверка и сдвиг смещения
+        upload = self.get_object(upload_id)
+        try:
+            chunk_path = receive_chunk(upload, request.stream, offset, length, checksum)
+        except UploadError as exc:
+            return Response({"error": str(exc)}, status=exc.status, headers={'Upload-Offset': str(upload.offset)})
+        try:
+            with transaction.atomic():
+                try:
+                    upload = MaterialUpload.objects.select_for_update().select_related(
+                        'material__competence').get(id=upload_id)
+                except MaterialUpload.DoesNotExist:
+                    raise Http404
+                try:
+                    append_chunk(upload, chunk_path, offset, length)
+                    if upload.offset < upload.size:
+                        return Response(status=status.HTTP_204_NO_CONTENT,
+                                        headers={'Upload-Offset': str(upload.offset)})
+                    material = complete_upload(upload, on_stored=schedule_processing)
+                except UploadError as exc:
+                    return Response({"error": str(exc)}, status=exc.status,
+                                    headers={'Upload-Offset': str(upload.offset)})
+        finally:
+            os.remove(chunk_path)
+        material.competence.touch()
+        catalogue_cache.bump_version()
+        return Response(MaterialSerializer(material).data, headers={'Upload-Offset': str(upload.size)})
+
+    @extend_schema(
+        description="Отмена загрузки",
+        summary="Загрузка файла материала"
+    )
+    def delete(self, request, upload_id, format=None):
+        upload = self.get_object(upload_id)
+        if os.path.exists(upload.part_path):
+            os.remove(upload.part_path)
+        upload.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+
+class MaterialDownload(ReplicaReadMixin, APIView):
+    permission_classes = [permissions.IsAdminUser]
+    authentication_classes = (CachedJWTAuthentication,)
+    requires_authentication = True
+    required_headers = {
+        'Authorization': 'Bearer <токен>',
+    }
+
+    @extend_schema(
+        description="Скачивание файла материала потоком, поддерживается заголовок Range",
+        summary="Материал"
+    )
+    def get(self, request, competence_name, material_id, format=None):
+        try:
+            material = Material.objects.get(id=material_id, competence__name=competence_name)
+        except Material.DoesNotExist:
+            return Response({"error": "Competence or material not found"}, status=status.HTTP_404_NOT_FOUND)
+        if not material.file:
+            return Response({"error": "Material has no file"}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            return file_response(request, material.file)
+        except UploadError as exc:
+            return Response({"error": str(exc)}, status=exc.status,
+                            headers={'Content-Range': 'bytes */%d' % material.file.size})
+
+
+class CompetenceBulk(APIView):
+    throttle_cost = 10
+    permission_classes = [permissions.IsAdminUser]
+    authentication_classes = (CachedJWTAuthentication,)
+    requires_authentication = True
+    required_headers = {
+        'Authorization': 'Bearer <токен>',
+        'Content-Type': 'application/json'
+    }
+    serializer_class = CompetenceBulkSerializer
+
+    @extend_schema(
+        description="Пакетное создание (без id) и изменение (с id) компетенций в одной транзакции",
+        summary="компетенции пачкой"
+    )
+    def post(self, request, format=None):
+        serializer = CompetenceBulkSerializer(data=request.data, many=True)
+        if serializer.is_valid():
+            try:
+                with transaction.atomic():
+                    serializer.save()
+                    search.index_competence_objects(serializer.instance)
+                    changes.record_bulk(CatalogueChange.COMPETENCE, serializer.instance, serializer.validated_data)
+            except IntegrityError:
+                # имя заняла параллельная запись после проверки validate_batch: повторная проверка
+                # видит её коммит и показывает ошибку у нужного элемента
+                serializer = CompetenceBulkSerializer(data=request.data, many=True)
+                if serializer.is_valid():
+                    return Response({"error": "Concurrent update, retry the request"},
+                                    status=status.HTTP_409_CONFLICT)
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            catalogue_cache.bump_version()
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class MaterialBulk(APIView):
+    throttle_cost = 10
+    permission_classes = [permissions.IsAdminUser]
+    authentication_classes = (CachedJWTAuthentication,)
+    requires_authentication = True
+    required_headers = {
+        'Authorization': 'Bearer <токен>',
+        'Content-Type': 'application/json'
+    }
+    serializer_class = MaterialBulkSerializer
+
+    @extend_schema(
+        description="Пакетное создание (без id) и изменение (с id) материалов компетенции в одной транзакции",
+        summary="Материалы пачкой"
+    )
+    def post(self, request, competence_name, format=None):
+        try:
+            competence = Competence.objects.get(name=competence_name)
+        except Competence.DoesNotExist:
+            return Response({"error": "Competence not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        serializer = MaterialBulkSerializer(data=request.data, many=True, context={'competence': competence})
+        if serializer.is_valid():
+            with transaction.atomic():
+                serializer.save()
+                competence.touch()
+                search.index_material_objects(serializer.instance)
+                changes.record_bulk(CatalogueChange.MATERIAL, serializer.instance, serializer.validated_data)
+            catalogue_cache.bump_version()
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class MarkedCompetenceBulk(APIView):
+    throttle_cost = 10
+    permission_classes = [permissions.IsAdminUser]
+    authentication_classes = (CachedJWTAuthentication,)
+    requires_authentication = True
+    required_headers = {
+        'Authorization': 'Bearer <токен>',
+        'Content-Type': 'application/json'
+    }
+    serializer_class = MarkedCompetenceBulkSerializer
+
+    @extend_schema(
+        description="Пакетная отметка компетенций пользователей в одной транзакции",
+        summary="Компетенции пользователей пачкой"
+    )
+    def post(self, request, format=None):
+        serializer = MarkedCompetenceBulkSerializer(data=request.data, many=True)
+        if serializer.is_valid():
+            with transaction.atomic():
+                marks = serializer.save()
+                # bulk_create не вызывает сигналы, матрицу совместных отметок обновляем сами
+                recommendations.record_marks((mark.user_id, mark.competence_id) for mark in marks)
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class UserRecommendations(ReplicaReadMixin, APIView):
+    permission_classes = [permissions.IsAdminUser]
+    authentication_classes = (CachedJWTAuthentication,)
+    requires_authentication = True
+    required_headers = {
+        'Authorization': 'Bearer <токен>',
+    }
+
+    @extend_schema(
+        description="Рекомендуемые пользователю компетенции по совместным отметкам других пользователей, "
+                    "профессии и рейтингу: ?limit= (по умолчанию 10)",
+        summary="Рекомендации компетенций"
+    )
+    def get(self, request, pk, format=None):
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), settings.RECOMMENDATION_MAX_RESULTS)
+        except ValueError:
+            return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            ranking = recommendations.recommend(pk, limit)
+        except User.DoesNotExist:
+            raise Http404
+        competences = Competence.objects.only(*CompetenceShortSerializer.Meta.fields).in_bulk(
+            [competence_id for competence_id, _ in ranking])
+        return Response([
+            {'competence': CompetenceShortSerializer(competences[competence_id]).data, 'score': score}
+            for competence_id, score in ranking if competence_id in competences
+        ])
+
+
+class CatalogueSearch(ReplicaReadMixin, APIView):
+    permission_classes = [permissions.IsAdminUser]
+    authentication_classes = (CachedJWTAuthentication,)
+    requires_authentication = True
+    required_headers = {
+        'Authorization': 'Bearer <токен>',
+    }
+
+    @extend_schema(
+        description="Полнотекстовый поиск по компетенциям (name, description) и материалам (title, content): "
+                    "?q=, ?kind=competence|material, ?page=, ?page_size=",
+        summary="Поиск"
+    )
+    def get(self, request, format=None):
+        text = request.query_params.get('q', '').strip()
+        kind = request.query_params.get('kind')
+        if kind not in (None, SearchDocument.COMPETENCE, SearchDocument.MATERIAL):
+            return Response({"error": "Unknown kind"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            page = max(int(request.query_params.get('page', 1)), 1)
+            page_size = min(max(int(request.query_params.get('page_size', 20)), 1), 100)
+        except ValueError:
+            return Response({"error": "page and page_size must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+        if not text:
+            return Response({'page': page, 'next': None, 'results': []})
+
+        # на одну запись больше страницы, чтобы узнать о следующей без COUNT(*)
+        results = search.search(text, kind=kind, limit=page_size + 1, offset=(page - 1) * page_size)
+        return Response({
+            'page': page,
+            'next': page + 1 if len(results) > page_size else None,
+            'results': results[:page_size],
+        })
+
+
+class CatalogueChanges(APIView):
+    # с основной базы: реплика может отставать, а sequence нумерует записи журнала
+    permission_classes = [permissions.IsAdminUser]
+    authentication_classes = (CachedJWTAuthentication,)
+    requires_authentication = True
+    required_headers = {
+        'Authorization': 'Bearer <токен>',
+    }
+
+    def get_since(self, request):
+        since = request.query_params.get('since', request.headers.get('Last-Event-ID', '0'))
+        return int(since) if since.isdigit() else None
+
+    @extend_schema(
+        description="Изменения компетенций и материалов после токена ?since= (0 — весь каталог): "
+                    "create/update с текущим состоянием объекта и delete. Токен следующего запроса — next, "
+                    "more — есть ли ещё записи. ?limit=, ?fields=, ?expand= как у списка компетенций",
+        summary="Журнал изменений каталога"
+    )
+    def get(self, request, format=None):
+        since = self.get_since(request)
+        if since is None:
+            return Response({"error": "since must be a token returned by this endpoint"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(max(int(request.query_params.get('limit', settings.CHANGES_PAGE_SIZE)), 1),
+                        settings.CHANGES_PAGE_SIZE)
+        except ValueError:
+            return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        page = changes.read(since, limit)
+        return Response({
+            'changes': changes.serialize(page.entries, **sparse_params(request)),
+            'next': str(page.next),
+            'more': page.more,
+        })
+
+
+class CatalogueCacheStats(APIView):
+    permission_classes = [permissions.IsAdminUser]
+    authentication_classes = (CachedJWTAuthentication,)
+
+    @extend_schema(
+        description="Счётчики попаданий и промахов кэша каталога компетенций",
+        summary="Статистика кэша"
+    )
+    def get(self, request, format=None):
+        return Response(catalogue_cache.stats())
+
+
+class MetricsView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+    authentication_classes = (CachedJWTAuthentication,)
+
+    @extend_schema(
+        description="Гистограммы времени запросов, числа SQL-запросов и размера ответов по маршрутам "
+                    "в формате Prometheus",
+        summary="Метрики"
+    )
+    def get(self, request, format=None):
+        return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class SchemaView(APIView):
+    # формат выбирается как у SpectacularAPIView: по Accept или ?format=yaml|json
+    renderer_classes = [OpenApiYamlRenderer, OpenApiYamlRenderer2, OpenApiJsonRenderer, OpenApiJsonRenderer2]
+    permission_classes = [AllowAny]
+    authentication_classes = ()
+
+    @extend_schema(
+        description="Схема OpenAPI, построенная один раз на версию кода: YAML или JSON (по Accept или "
+                    "?format=json), с ETag и сжатием gzip/br по Accept-Encoding",
+        summary="Схема API",
+        responses={200: OpenApiTypes.OBJECT}
+    )
+    def get(self, request, format=None):
+        artifact = schema.get(request.accepted_renderer.format)
+        encoding, body = artifact.negotiate(request.headers.get('Accept-Encoding', ''))
+        etag = artifact.etag(encoding)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(body, content_type=request.accepted_renderer.media_type)
+            if encoding:
+                response['Content-Encoding'] = encoding
+        response['ETag'] = etag
+        response['Cache-Control'] = 'public, no-cache'
+        patch_vary_headers(response, ('Accept', 'Accept-Encoding'))
+        return response
+
+
+class ExportView(ReplicaReadMixin, APIView):
+    throttle_cost = 20
+    permission_classes = [permissions.IsAdminUser]
+    authentication_classes = (CachedJWTAuthentication,)
+    requires_authentication = True
+    required_headers = {
+        'Authorization': 'Bearer <токен>',
+    }
+    chunk_size = getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+    # подклассы задают queryset (с порядком по pk) и serializer_class
+    queryset = None
+
+    def get_queryset(self, fields=None, expand=None):
+        # setup_eager_loading сужает колонки и подгружает связи, narrow — только колонки
+        queryset = self.queryset.all()
+        if hasattr(self.serializer_class, 'setup_eager_loading'):
+            return self.serializer_class.setup_eager_loading(queryset, fields, expand)
+        return self.serializer_class.narrow(queryset, fields)
+
+    def get(self, request, format=None):
+        params = sparse_params(request)
+        rows = serialize_rows(self.get_queryset(**params), self.serializer_class, self.chunk_size, **params)
+        if request.query_params.get('lines') in ('1', 'true'):
+            return StreamingHttpResponse(stream_json_lines(rows), content_type='application/x-ndjson')
+        return StreamingHttpResponse(stream_json_array(rows), content_type='application/json')
+
+
+@extend_schema(
+    description="Выгрузка всех пользователей потоком (JSON или JSON Lines при ?lines=1)",
+    summary="Выгрузка пользователей"
+)
+class UserExport(ExportView):
+    queryset = User.objects.order_by('pk')
+    serializer_class = UsersSerializer
+
+
+@extend_schema(
+    description="Выгрузка всех компетенций пользователей потоком (JSON или JSON Lines при ?lines=1)",
+    summary="Выгрузка компетенций пользователей"
+)
+class MarkedCompetenceExport(ExportView):
+    queryset = MarkedCompetence.objects.order_by('pk')
+    serializer_class = MarkedCompetenceSerializer
+
+
+@extend_schema(
+    description="Выгрузка всех компетенций с материалами потоком (JSON или JSON Lines при ?lines=1)",
+    summary="Выгрузка компетенций"
+)
+class CompetenceExport(ExportView):
+    queryset = Competence.objects.order_by('pk')
+    serializer_class = CompetenceSerializer
+
 ##### Для Администратора ^^^^^^^
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class UserApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'user_api'
+
+    def ready(self):
+        from . import signals  # noqa: F401
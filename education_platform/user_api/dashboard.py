@@ -0,0 +1,85 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from main import catalogue_cache, recommendations
+from main.models import User, Competence, MarkedCompetence, Review
+from main.serialaize import CompetenceSerializer
+
+from .serialaize import DashboardUserSerializer, DashboardReviewSerializer
+
+# Кабинет пользователя: профиль, отмеченные компетенции с материалами и рейтингом, его отзывы.
+# Собирается четырьмя запросами при любом числе отметок и кэшируется по пользователю. В ключе —
+# версии каталога (правки компетенций, материалов и рейтингов) и рекомендаций (пересборка отметок
+# импортом); профиль, собственные отметки и отзывы пользователя сбрасывают его ключ сигналами (user_api.signals).
+QUERIES = 4
+
+
+def get_cache():
+    return caches[settings.DASHBOARD_CACHE_ALIAS]
+
+
+def cache_key(user_id):
+    return 'dashboard:v%s.%s:user:%s' % (catalogue_cache.get_version(), recommendations.get_version(), user_id)
+
+
+def invalidate(user_ids):
+    keys = [cache_key(user_id) for user_id in user_ids]
+    get_cache().delete_many(keys)
+    # и ещё раз после коммита: параллельный запрос мог закэшировать состояние до него
+    transaction.on_commit(lambda: get_cache().delete_many(keys))
+
+
+def build(user_id):
+    user = User.objects.select_related('profession').get(pk=user_id)
+    competences = CompetenceSerializer.setup_eager_loading(
+        Competence.objects.filter(markedcompetence__user_id=user_id).order_by('pk'))
+    reviews = list(Review.objects.filter(user_id=user_id).select_related('competence')
+                   .only('rating', 'comment', 'competence__name').order_by('pk'))
+
+    # оценка пользователя у компетенции — по последнему его отзыву
+    ratings = {review.competence_id: review.rating for review in reviews}
+    marked = CompetenceSerializer(competences, many=True).data
+    for competence in marked:
+        competence['my_rating'] = ratings.get(competence['id'])
+    return {
+        'user': DashboardUserSerializer(user).data,
+        'competences': marked,
+        'reviews': DashboardReviewSerializer(reviews, many=True).data,
+        'stats': {
+            'competences': len(marked),
+            'materials': sum(len(competence['materials']) for competence in marked),
+            'reviews': len(reviews),
+        },
+    }
+
+
+def get(user_id):
+    cache = get_cache()
+    key = cache_key(user_id)
+    data = cache.get(key)
+    if data is None:
+        data = build(user_id)
+        cache.set(key, data, settings.DASHBOARD_CACHE_TIMEOUT)
+    return data
+
+
+def change_marks(user_id, mark, unmark):
+    """
+    Отмечает компетенции mark и снимает отметки с unmark одной транзакцией.
+    Возвращает (отмечено, снято) без уже отмеченных и неотмеченных.
+    """
+    with transaction.atomic():
+        # блокировка пользователя: повторная отправка ждёт первую и видит её отметки,
+        # а не получает IntegrityError на unique(user, competence)
+        User.objects.select_for_update().filter(pk=user_id).exists()
+        existing = set(MarkedCompetence.objects.filter(user_id=user_id).values_list('competence_id', flat=True))
+        created = MarkedCompetence.objects.bulk_create([
+            MarkedCompetence(user_id=user_id, competence_id=competence_id)
+            for competence_id in sorted(set(mark) - existing)
+        ])
+        # bulk_create не вызывает сигналы: матрицу рекомендаций и кабинет обновляет record_marks
+        recommendations.record_marks((user_id, marked.competence_id) for marked in created)
+        # удаление через queryset вызывает pre_delete/post_delete для каждой отметки
+        removed, _ = MarkedCompetence.objects.filter(user_id=user_id, competence_id__in=unmark).delete()
+    return len(created), removed
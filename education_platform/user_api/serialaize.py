@@ -0,0 +1,40 @@
+from django.conf import settings
+from rest_framework import serializers
+
+from main.models import User, Competence, Review
+
+
+class DashboardUserSerializer(serializers.ModelSerializer):
+    profession = serializers.SlugRelatedField(slug_field='name', read_only=True)
+
+    class Meta:
+        model = User
+        fields = ('id', 'email', 'username', 'profession')
+
+
+class DashboardReviewSerializer(serializers.ModelSerializer):
+    competence = serializers.IntegerField(source='competence_id')
+    competence_name = serializers.CharField(source='competence.name')
+
+    class Meta:
+        model = Review
+        fields = ('id', 'competence', 'competence_name', 'rating', 'comment')
+
+
+class MarkBatchSerializer(serializers.Serializer):
+    mark = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    unmark = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+
+    def validate(self, data):
+        if len(data['mark']) + len(data['unmark']) > settings.BULK_MAX_ITEMS:
+            raise serializers.ValidationError('Не больше %d компетенций за запрос.' % settings.BULK_MAX_ITEMS)
+        both = set(data['mark']) & set(data['unmark'])
+        if both:
+            raise serializers.ValidationError('Компетенции одновременно в mark и unmark: %s.'
+                                              % ', '.join(map(str, sorted(both))))
+        # отмечать можно только существующие активные компетенции
+        active = set(Competence.objects.filter(pk__in=data['mark'], is_active=True).values_list('pk', flat=True))
+        missing = sorted(set(data['mark']) - active)
+        if missing:
+            raise serializers.ValidationError({'mark': ['Компетенции не найдены: %s.' % ', '.join(map(str, missing))]})
+        return data
@@ -0,0 +1,32 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from main import recommendations
+from main.models import User, MarkedCompetence, Review
+
+from . import dashboard
+
+
+# новые отметки (и post_save, и bulk_create) приходят через record_marks
+@receiver(recommendations.marks_recorded)
+def drop_dashboards_on_marks(sender, user_ids, **kwargs):
+    dashboard.invalidate(user_ids)
+
+
+@receiver(post_delete, sender=MarkedCompetence)
+def drop_dashboard_on_unmark(sender, instance, **kwargs):
+    dashboard.invalidate([instance.user_id])
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def drop_dashboard_on_review(sender, instance, raw=False, **kwargs):
+    if not raw:
+        dashboard.invalidate([instance.user_id])
+
+
+# профиль в кабинете: правки пользователя, в том числе администратором через UserDetail
+@receiver(post_save, sender=User)
+def drop_dashboard_on_profile(sender, instance, raw=False, **kwargs):
+    if not raw:
+        dashboard.invalidate([instance.pk])
@@ -1,3 +1,113 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
 
-# Create your tests here.
+from main.models import User, Competence, Material, MarkedCompetence, Review, CompetenceCooccurrence
+
+from . import dashboard
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class DashboardTest(TestCase):
+    url = '/api/v1/dashboard/'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='learner@example.com', password='password', username='learner')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer %s' % AccessToken.for_user(self.user))
+        self.competences = []
+        for i in range(3):
+            competence = Competence.objects.create(name='competence-%d' % i, description='description',
+                                                   difficulty='easy', is_active=i < 2)
+            Material.objects.create(competence=competence, material_type='text', title='text', content='content')
+            self.competences.append(competence)
+        self.python, self.sql, self.inactive = self.competences
+        MarkedCompetence.objects.create(user=self.user, competence=self.python)
+        Review.objects.create(user=self.user, competence=self.python, rating=5, comment='Отлично')
+
+    def test_dashboard(self):
+        data = self.client.get(self.url).data
+        self.assertEqual(data['user']['email'], 'learner@example.com')
+        self.assertEqual([competence['name'] for competence in data['competences']], ['competence-0'])
+        self.assertEqual(data['competences'][0]['my_rating'], 5)
+        self.assertEqual(data['reviews'][0]['competence_name'], 'competence-0')
+        self.assertEqual(data['stats'], {'competences': 1, 'materials': 1, 'reviews': 1})
+        self.assertEqual(APIClient().get(self.url).status_code, 401)
+
+    def test_fixed_queries_and_cache(self):
+        with self.assertNumQueries(dashboard.QUERIES):
+            dashboard.build(self.user.pk)
+        for competence in self.competences[1:]:
+            MarkedCompetence.objects.create(user=self.user, competence=competence)
+            Material.objects.create(competence=competence, material_type='video', title='video')
+            Review.objects.create(user=self.user, competence=competence, rating=3, comment='')
+        with self.assertNumQueries(dashboard.QUERIES):
+            dashboard.build(self.user.pk)
+
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url).data['stats']['competences'], 3)
+
+    def test_invalidated_by_own_changes(self):
+        self.client.get(self.url)
+        Review.objects.create(user=self.user, competence=self.sql, rating=2, comment='')
+        self.assertEqual(self.client.get(self.url).data['stats']['reviews'], 2)
+        MarkedCompetence.objects.filter(user=self.user).delete()
+        self.assertEqual(self.client.get(self.url).data['competences'], [])
+
+        admin = User.objects.create_superuser(email='admin@example.com', password='password')
+        admin_client = APIClient()
+        admin_client.force_authenticate(admin)
+        admin_client.post('/api/v1/admin/users/competence/bulk/', [
+            {'user': self.user.pk, 'competence': self.sql.pk},
+        ], format='json')
+        self.assertEqual([competence['id'] for competence in self.client.get(self.url).data['competences']],
+                         [self.sql.pk])
+
+        other = User.objects.create_user(email='other@example.com', password='password')
+        with self.assertNumQueries(0):
+            self.client.get(self.url)
+        MarkedCompetence.objects.create(user=other, competence=self.python)
+        with self.assertNumQueries(0):
+            self.client.get(self.url)
+
+    def test_invalidated_by_admin_profile_edit(self):
+        self.client.get(self.url)
+        admin = User.objects.create_superuser(email='admin@example.com', password='password')
+        admin_client = APIClient()
+        admin_client.force_authenticate(admin)
+        response = admin_client.put('/api/v1/admin/users/int:%d/' % self.user.pk, {
+            'email': self.user.email, 'username': 'renamed', 'is_active': True,
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(self.url).data['user']['username'], 'renamed')
+
+    def test_batch_marks(self):
+        response = self.client.post(self.url + 'competences/', {
+            'mark': [self.python.pk, self.sql.pk], 'unmark': [],
+        }, format='json')
+        self.assertEqual((response.data['marked'], response.data['unmarked']), (1, 0))
+        self.assertEqual(response.data['dashboard']['stats']['competences'], 2)
+        self.assertEqual(CompetenceCooccurrence.objects.get(competence=self.python, other=self.sql).count, 1)
+
+        response = self.client.post(self.url + 'competences/', {'unmark': [self.python.pk]}, format='json')
+        self.assertEqual(response.data['unmarked'], 1)
+        self.assertEqual([competence['id'] for competence in response.data['dashboard']['competences']],
+                         [self.sql.pk])
+        self.assertEqual(CompetenceCooccurrence.objects.get(competence=self.python, other=self.sql).count, 0)
+
+        for body in ({'mark': [self.inactive.pk]}, {'mark': [0]}, {'mark': [self.sql.pk], 'unmark': [self.sql.pk]}):
+            self.assertEqual(self.client.post(self.url + 'competences/', body, format='json').status_code, 400)
+        self.assertEqual(MarkedCompetence.objects.filter(user=self.user).count(), 1)
+
+    def test_marks_lock_user_row(self):
+        # повторная отправка сериализуется блокировкой пользователя, а не падает на unique
+        with CaptureQueriesContext(connection) as ctx:
+            dashboard.change_marks(self.user.pk, [self.sql.pk], [])
+        self.assertEqual(dashboard.change_marks(self.user.pk, [self.sql.pk], []), (0, 0))
+        if connection.features.has_select_for_update:
+            self.assertTrue(any('FOR UPDATE' in query['sql'] for query in ctx.captured_queries))
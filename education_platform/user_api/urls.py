@@ -0,0 +1,8 @@
+from django.urls import path
+
+from .views import Dashboard, DashboardMarks
+
+urlpatterns = [
+    path('dashboard/', Dashboard.as_view()),
+    path('dashboard/competences/', DashboardMarks.as_view()),
+]
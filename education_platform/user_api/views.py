@@ -1,3 +1,52 @@
-from django.shortcuts import render
+from drf_spectacular.utils import extend_schema
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-# Create your views here.
+from main.authentication import CachedJWTAuthentication
+
+from . import dashboard
+from .serialaize import MarkBatchSerializer
+
+
+class Dashboard(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    authentication_classes = (CachedJWTAuthentication,)
+    requires_authentication = True
+    required_headers = {
+        'Authorization': 'Bearer <токен>',
+    }
+
+    @extend_schema(
+        description="Кабинет текущего пользователя одним ответом: профиль, отмеченные компетенции "
+                    "с материалами, рейтингом и его оценкой, его отзывы и счётчики",
+        summary="Кабинет пользователя"
+    )
+    def get(self, request, format=None):
+        return Response(dashboard.get(request.user.pk))
+
+
+class DashboardMarks(APIView):
+    throttle_cost = 10
+    permission_classes = [permissions.IsAuthenticated]
+    authentication_classes = (CachedJWTAuthentication,)
+    requires_authentication = True
+    required_headers = {
+        'Authorization': 'Bearer <токен>',
+        'Content-Type': 'application/json'
+    }
+    serializer_class = MarkBatchSerializer
+
+    @extend_schema(
+        description="Пакетная отметка компетенций текущим пользователем и снятие отметок "
+                    "в одной транзакции: {\"mark\": [id...], \"unmark\": [id...]}; возвращает обновлённый кабинет",
+        summary="Отметки компетенций пачкой"
+    )
+    def post(self, request, format=None):
+        serializer = MarkBatchSerializer(data=request.data)
+        if serializer.is_valid():
+            marked, unmarked = dashboard.change_marks(request.user.pk, serializer.validated_data['mark'],
+                                                      serializer.validated_data['unmark'])
+            return Response({'marked': marked, 'unmarked': unmarked,
+                             'dashboard': dashboard.get(request.user.pk)})
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)